@@ -3,6 +3,10 @@ ASGI config for university_voting_system project.
 
 It exposes the ASGI callable as a module-level variable named ``application``.
 
+Serve it with an ASGI server (e.g. uvicorn) so /live/ can hold event streams
+open without a thread per client; under WSGI that endpoint answers once and
+the browser reconnects.
+
 For more information on this file, see
 https://docs.djangoproject.com/en/5.2/howto/deployment/asgi/
 """
@@ -86,6 +86,18 @@ DATABASES = {
 # Custom User Model
 AUTH_USER_MODEL = 'voting.Student'
 
+AUTHENTICATION_BACKENDS = ['voting.backends.StudentBackend']
+
+# Students log in with birth certificate numbers, so the first hasher's work
+# factor is set by VOTING_SETTINGS['STUDENT_HASH_ITERATIONS']
+PASSWORD_HASHERS = [
+    'voting.hashers.StudentPBKDF2PasswordHasher',
+    'django.contrib.auth.hashers.PBKDF2SHA1PasswordHasher',
+    'django.contrib.auth.hashers.Argon2PasswordHasher',
+    'django.contrib.auth.hashers.BCryptSHA256PasswordHasher',
+    'django.contrib.auth.hashers.ScryptPasswordHasher',
+]
+
 
 
 # Password validation
@@ -127,6 +139,23 @@ MEDIA_ROOT = BASE_DIR / 'media'
 # Default primary key field type
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
+# Cache configuration
+# Web workers, run_scheduler and reconcile_turnout coordinate through the cache,
+# so production needs one they all share; the local-memory fallback is per process
+if os.environ.get('REDIS_URL'):
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': os.environ['REDIS_URL'],
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        }
+    }
+
 # Session configuration
 SESSION_ENGINE = 'django.contrib.sessions.backends.cache'
 SESSION_CACHE_ALIAS = 'default'
@@ -254,12 +283,39 @@ LOGGING = {
 VOTING_SETTINGS = {
     'MAX_LOGIN_ATTEMPTS': 5,
     'LOGIN_LOCKOUT_TIME': 300,  # 5 minutes in seconds
+    'LOGIN_IP_MAX_ATTEMPTS': 500,  # Failures per lockout window from one IP; campus NAT shares addresses
     'MAX_DELEGATES_PER_PARTY': 15,
     'MAX_DELEGATES_PER_PARTY_PER_DEPT': 2,
     'VOTE_VERIFICATION_REQUIRED': True,
     'ENABLE_VOTE_AUDIT_TRAIL': True,
-    'ALLOWED_VOTING_IPS': os.environ.get('ALLOWED_VOTING_IPS', '').split(',') if os.environ.get('ALLOWED_VOTING_IPS') else [],
+    'ALLOWED_VOTING_IPS': os.environ.get('ALLOWED_VOTING_IPS', '').split(',') if os.environ.get('ALLOWED_VOTING_IPS') else [],  # Addresses or CIDR networks, e.g. 10.12.0.0/16
+    'TRUSTED_PROXIES': os.environ.get('TRUSTED_PROXIES', '').split(',') if os.environ.get('TRUSTED_PROXIES') else [],  # Load balancer addresses or networks; X-Forwarded-For is ignored from anyone else
+    'BLOCKED_IP_LOG_INTERVAL': 300,  # Seconds between audit entries for requests blocked from one address
     'ENABLE_TWO_FACTOR_AUTH': False,  # Can be enabled later
+    'ELECTION_CACHE_TTL': 5,  # Seconds a worker trusts its in-memory active election
+    'BALLOT_CACHE_TIMEOUT': 3600,  # Cached ballots are also dropped on every relevant change
+    'AUDIT_WRITER': 'async',  # 'async' batches non-vote audit entries, 'sync' writes each one inline
+    'AUDIT_QUEUE_SIZE': 10000,
+    'AUDIT_BATCH_SIZE': 500,
+    'AUDIT_FLUSH_INTERVAL': 0.5,  # Seconds the writer waits to fill a batch
+    'VOTE_COMMITTER': 'thread',  # 'thread' batches votes on one writer, 'inline' commits in the request
+    'VOTE_BATCH_SIZE': 200,
+    'VOTE_BATCH_WAIT': 0.005,  # Seconds the committer waits for more votes to share a transaction
+    'VOTE_COMMIT_TIMEOUT': 10,
+    'IDEMPOTENCY_KEY_TIMEOUT': 86400,  # Seconds a vote response is replayed for a retried key
+    'VOTE_RATE_LIMIT': (30, 60),  # Vote requests per student per sliding window of seconds
+    'LIVE_INTERVAL': 2,  # Seconds between the live broadcaster's reads of turnout and tallies
+    'LIVE_KEEPALIVE': 15,  # Seconds of silence before a keepalive comment on an event stream
+    'LIVE_RETRY': 5000,  # Milliseconds EventSource waits before reconnecting
+    'LIVE_POLL_RETRY': 300000,  # Milliseconds between reconnects where /live/ cannot stream (WSGI), the old five-minute poll
+    'PHASE_WARM_LEAD': 300,  # Seconds before voting opens that run_scheduler fills the ballot caches
+    'SCHEDULER_INTERVAL': 30,  # Longest sleep between run_scheduler checks
+    'TURNOUT_SHARDS': 8,  # Cache keys each department's turnout counter is spread over
+    'TURNOUT_PERSIST_INTERVAL': 60,  # Seconds between run_scheduler's copies of the turnout counters to the database
+    'ASYNC_VIEWS': os.environ.get('ASYNC_VIEWS') == '1',  # Route the vote and polling APIs to voting/async_views.py under ASGI
+    'STUDENT_HASH_ITERATIONS': 100000,  # PBKDF2 work factor; existing hashes follow on next login
+    'CREDENTIAL_CACHE_TTL': 300,  # Seconds a worker skips the hasher for a verified login, 0 disables
+    'CREDENTIAL_CACHE_SIZE': 50000,
 }
 
 # File upload settings
@@ -5,8 +5,9 @@ from django.utils.html import format_html
 from .models import (
     Student, Faculty, Department, Programme, Party, Position,
     Candidate, Delegate, Election, DelegateVote, MainVote,
-    VoteAuditLog, ElectionResult
+    VoteAuditLog, ElectionResult, DelegateResult, VoterRoll, DepartmentTurnout
 )
+from . import turnout
 
 @admin.register(Student)
 class StudentAdmin(UserAdmin):
@@ -110,4 +111,36 @@ class VoteAuditLogAdmin(admin.ModelAdmin):
 class ElectionResultAdmin(admin.ModelAdmin):
     list_display = ('candidate', 'election', 'vote_count', 'percentage', 'is_winner')
     list_filter = ('election', 'candidate__position', 'is_winner')
-    search_fields = ('candidate__student__registration_number',)
\ No newline at end of file
+    search_fields = ('candidate__student__registration_number',)
+
+@admin.register(DelegateResult)
+class DelegateResultAdmin(admin.ModelAdmin):
+    list_display = ('delegate', 'election', 'vote_count', 'percentage', 'is_winner')
+    list_filter = ('election', 'delegate__department', 'is_winner')
+    search_fields = ('delegate__student__registration_number',)
+
+@admin.register(VoterRoll)
+class VoterRollAdmin(admin.ModelAdmin):
+    list_display = ('student', 'election', 'department', 'is_eligible', 'has_voted_for_delegate', 'main_votes_cast')
+    list_filter = ('election', 'is_eligible', 'has_voted_for_delegate', 'department__faculty')
+    search_fields = ('student__registration_number',)
+    list_select_related = ('student', 'election', 'department')
+    raw_id_fields = ('student', 'delegate')
+
+@admin.register(DepartmentTurnout)
+class DepartmentTurnoutAdmin(admin.ModelAdmin):
+    list_display = ('department', 'election', 'eligible', 'delegate_votes', 'percentage', 'main_votes', 'last_updated')
+    list_filter = ('election', 'department__faculty')
+    list_select_related = ('department', 'election')
+    readonly_fields = ('election', 'department', 'eligible', 'delegate_votes', 'main_votes', 'last_updated')
+    actions = ['refresh_from_counters']
+    
+    def has_add_permission(self, request):
+        return False
+    
+    @admin.action(description='Refresh from the live turnout counters')
+    def refresh_from_counters(self, request, queryset):
+        elections = {row.election for row in queryset}
+        for election in elections:
+            turnout.persist(election)
+        self.message_user(request, f"Refreshed turnout for {len(elections)} election(s).")
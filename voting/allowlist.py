@@ -0,0 +1,91 @@
+# voting/allowlist.py
+import bisect
+import ipaddress
+import logging
+from django.conf import settings
+from django.core.signals import setting_changed
+from django.dispatch import receiver
+
+logger = logging.getLogger('voting')
+
+
+class AllowList:
+    """Allowed addresses and CIDR networks compiled into sorted integer ranges
+
+    Overlapping and adjacent networks are merged per IP version, so a lookup
+    is one binary search whatever the number of entries. A list is in force
+    whenever the setting has entries, even if none of them is valid, so a
+    mistyped network denies every address rather than allowing them all.
+    """
+
+    def __init__(self, entries, setting='ALLOWED_VOTING_IPS'):
+        entries = [entry.strip() for entry in entries if entry.strip()]
+        self.configured = bool(entries)
+        networks = {4: [], 6: []}
+        for entry in entries:
+            try:
+                network = ipaddress.ip_network(entry, strict=False)
+            except ValueError:
+                logger.error(f"Ignoring invalid {setting} entry: {entry!r}")
+                continue
+            networks[network.version].append(network)
+
+        # version: (range starts, range ends)
+        self.ranges = {}
+        for version, members in networks.items():
+            collapsed = list(ipaddress.collapse_addresses(members))
+            self.ranges[version] = (
+                [int(network.network_address) for network in collapsed],
+                [int(network.broadcast_address) for network in collapsed],
+            )
+        self.size = sum(len(members) for members in networks.values())
+        if self.configured and not self.size:
+            logger.error(f"{setting} has no valid entries; no address will match")
+
+    def __bool__(self):
+        return self.configured
+
+    def __contains__(self, ip):
+        try:
+            address = ipaddress.ip_address(ip)
+        except ValueError:
+            return False
+        if address.version == 6 and address.ipv4_mapped:
+            address = address.ipv4_mapped
+        starts, ends = self.ranges[address.version]
+        value = int(address)
+        index = bisect.bisect_right(starts, value) - 1
+        return index >= 0 and value <= ends[index]
+
+
+# setting name: AllowList
+_compiled = {}
+
+
+def compiled(setting):
+    """The AllowList for VOTING_SETTINGS[setting], compiled on first use"""
+    allow_list = _compiled.get(setting)
+    if allow_list is None:
+        allow_list = _compiled[setting] = AllowList(settings.VOTING_SETTINGS.get(setting) or [], setting)
+    return allow_list
+
+
+def allowed():
+    """Client addresses and networks allowed to use the system"""
+    return compiled('ALLOWED_VOTING_IPS')
+
+
+def trusted_proxies():
+    """Proxies and load balancers whose X-Forwarded-For entries are believed"""
+    return compiled('TRUSTED_PROXIES')
+
+
+def reload():
+    """Recompile from settings on the next request"""
+    _compiled.clear()
+
+
+@receiver(setting_changed)
+def voting_settings_changed(sender, setting, **kwargs):
+    if setting == 'VOTING_SETTINGS':
+        reload()
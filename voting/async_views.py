@@ -0,0 +1,119 @@
+# voting/async_views.py
+# Async versions of the polling and voting endpoints for the ASGI deployment;
+# voting/urls.py routes to them when VOTING_SETTINGS['ASYNC_VIEWS'] is on
+import json
+import logging
+from asgiref.sync import sync_to_async
+from django.contrib.auth.decorators import login_required
+from django.http import HttpResponse, JsonResponse
+from django.views.decorators.csrf import csrf_protect
+from django.views.decorators.http import require_POST
+
+from . import ballots, election_cache, ingest, ratelimit, roll
+from .models import Position
+from .views import (
+    ballot_response, duplicate_vote, idempotent_vote, prepare_candidate_vote, prepare_delegate_vote, vote_error
+)
+
+logger = logging.getLogger('voting')
+
+async def aget_current_election():
+    """Get the currently active election"""
+    return await election_cache.aget_active_election()
+
+async def ahandle_vote(prepare, request, kind):
+    """handle_vote() for async views; validation runs in a thread, the commit is awaited"""
+    user = await request.auser()
+    try:
+        vote = await sync_to_async(prepare)(request, user)
+        if isinstance(vote, HttpResponse):
+            return vote
+
+        try:
+            await ingest.acommit(vote.cast, committed=vote.saved)
+        except ingest.DuplicateVote:
+            # The unique constraint is the duplicate check; a retry of the same vote still succeeds
+            if not await sync_to_async(vote.saved)():
+                return duplicate_vote(vote.duplicate_error)
+
+        return vote.succeeded()
+
+    except json.JSONDecodeError:
+        return vote_error('Invalid JSON data.', 400)
+    except Exception as e:
+        logger.error(f"Error in {kind} voting: {str(e)}")
+        return vote_error('An error occurred while processing your vote.', 500)
+
+@login_required
+@require_POST
+@csrf_protect
+@ratelimit.rate_limited('vote', 'VOTE_RATE_LIMIT')
+@idempotent_vote
+async def vote_for_delegate(request):
+    """Students vote for delegates in their department"""
+    return await ahandle_vote(prepare_delegate_vote, request, 'delegate')
+
+@login_required
+@require_POST
+@csrf_protect
+@ratelimit.rate_limited('vote', 'VOTE_RATE_LIMIT')
+@idempotent_vote
+async def vote_for_candidate(request):
+    """Delegates vote for candidates in main positions"""
+    return await ahandle_vote(prepare_candidate_vote, request, 'candidate')
+
+@login_required
+async def voting_status_api(request):
+    """API endpoint to get current voting status"""
+    user = await request.auser()
+    current_election = await aget_current_election()
+
+    if not current_election:
+        return JsonResponse({'error': 'No active election'}, status=404)
+
+    # The voter roll holds the user's voting and delegate status
+    entry = await roll.aentry(current_election, user)
+    total_positions = await Position.objects.acount()
+
+    return JsonResponse({
+        'election': {
+            'name': current_election.name,
+            'current_phase': current_election.current_phase,
+            'delegate_voting_active': current_election.is_delegate_voting_active,
+            'main_voting_active': current_election.is_main_voting_active,
+        },
+        'user_status': {
+            'has_voted_for_delegate': entry.has_voted_for_delegate,
+            'is_delegate': entry.delegate_id is not None,
+            'main_votes_cast': entry.main_votes_cast,
+            'total_positions': total_positions,
+            'department': user.department.name,
+            'faculty': user.faculty.name,
+        }
+    })
+
+@login_required
+async def candidates_api(request):
+    """API endpoint to get candidates for a specific position"""
+    position_id = request.GET.get('position_id')
+
+    if not position_id:
+        return JsonResponse({'error': 'Position ID required'}, status=400)
+
+    try:
+        position_id = int(position_id)
+    except ValueError:
+        return JsonResponse({'error': 'Invalid position ID'}, status=400)
+
+    current_election = await aget_current_election()
+    ballot = await sync_to_async(ballots.candidate_ballot)(
+        current_election.id if current_election else None, position_id
+    )
+    return ballot_response(request, ballot)
+
+@login_required
+async def delegates_api(request):
+    """API endpoint to get delegates in user's department"""
+    user = await request.auser()
+    ballot = await sync_to_async(ballots.department_ballot)(user.department_id)
+    return ballot_response(request, ballot)
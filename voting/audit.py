@@ -0,0 +1,108 @@
+# voting/audit.py
+import atexit
+import logging
+import queue
+import threading
+from django.conf import settings
+from django.db import close_old_connections, connection
+
+from .models import VoteAuditLog
+
+logger = logging.getLogger('voting')
+
+_STOP = object()
+
+
+class AuditWriter:
+    """Background writer that bulk inserts VoteAuditLog entries off the request path"""
+
+    def __init__(self, max_queue=10000, batch_size=500, flush_interval=0.5):
+        self.queue = queue.Queue(maxsize=max_queue)
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def start(self):
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name='audit-writer', daemon=True)
+                self._thread.start()
+
+    def submit(self, entry):
+        """Queue an unsaved VoteAuditLog; writes inline when the queue is full"""
+        self.start()
+        try:
+            self.queue.put_nowait(entry)
+        except queue.Full:
+            # Back-pressure instead of dropping audit entries
+            self._write([entry])
+
+    def flush(self):
+        """Block until every queued entry has been written"""
+        if self._thread is not None:
+            self.queue.join()
+
+    def close(self, timeout=10):
+        """Write what is queued and stop the thread; registered with atexit"""
+        if self._thread is None or not self._thread.is_alive():
+            return
+        self.queue.put(_STOP)
+        self._thread.join(timeout)
+
+    def _run(self):
+        stopping = False
+        while not stopping:
+            item = self.queue.get()
+            batch = []
+            taken = 1
+            if item is _STOP:
+                stopping = True
+            else:
+                batch.append(item)
+
+            # Gather whatever arrives within the flush interval, up to one batch
+            while not stopping and len(batch) < self.batch_size:
+                try:
+                    item = self.queue.get(timeout=self.flush_interval)
+                except queue.Empty:
+                    break
+                taken += 1
+                if item is _STOP:
+                    stopping = True
+                else:
+                    batch.append(item)
+
+            if batch:
+                self._write(batch)
+            for _ in range(taken):
+                self.queue.task_done()
+        connection.close()
+
+    def _write(self, entries):
+        try:
+            close_old_connections()
+            VoteAuditLog.objects.bulk_create(entries, batch_size=self.batch_size)
+        except Exception as e:
+            logger.error(f"Failed to write {len(entries)} audit log entries: {str(e)}")
+
+
+def _build_writer():
+    options = settings.VOTING_SETTINGS
+    return AuditWriter(
+        max_queue=options.get('AUDIT_QUEUE_SIZE', 10000),
+        batch_size=options.get('AUDIT_BATCH_SIZE', 500),
+        flush_interval=options.get('AUDIT_FLUSH_INTERVAL', 0.5),
+    )
+
+
+writer = _build_writer()
+atexit.register(writer.close)
+
+
+def record(entry, durable=False):
+    """Persist an audit entry now when durable, otherwise hand it to the writer"""
+    if durable or settings.VOTING_SETTINGS.get('AUDIT_WRITER', 'async') != 'async':
+        entry.save()
+    else:
+        writer.submit(entry)
@@ -0,0 +1,106 @@
+# voting/backends.py
+import hashlib
+import hmac
+import secrets
+import threading
+import time
+from collections import OrderedDict
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.contrib.auth.backends import ModelBackend
+
+
+class VerifiedCredentialCache:
+    """Per-process memory of recently verified logins
+
+    Entries are HMAC digests under a key that never leaves the process,
+    bound to the stored password hash, so a password change or rehash
+    invalidates them. A failed login drops the student's entry.
+    """
+
+    def __init__(self):
+        self._key = secrets.token_bytes(32)
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _digest(self, username, password, encoded):
+        message = '\0'.join((username, password, encoded)).encode()
+        return hmac.new(self._key, message, hashlib.sha256).digest()
+
+    def verified(self, username, password, encoded):
+        with self._lock:
+            entry = self._entries.get(username)
+        if entry is None or entry[1] < time.monotonic():
+            return False
+        return hmac.compare_digest(entry[0], self._digest(username, password, encoded))
+
+    def remember(self, username, password, encoded):
+        options = settings.VOTING_SETTINGS
+        ttl = options.get('CREDENTIAL_CACHE_TTL', 300)
+        if ttl <= 0:
+            return
+        entry = (self._digest(username, password, encoded), time.monotonic() + ttl)
+        with self._lock:
+            self._entries[username] = entry
+            self._entries.move_to_end(username)
+            while len(self._entries) > options.get('CREDENTIAL_CACHE_SIZE', 50000):
+                self._entries.popitem(last=False)
+
+    def forget(self, username):
+        with self._lock:
+            self._entries.pop(username, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+credentials = VerifiedCredentialCache()
+
+
+class StudentBackend(ModelBackend):
+    """ModelBackend that skips the password hasher for recently verified logins
+
+    The session's student is loaded with their programme, department and
+    faculty in one query, since nearly every view reads them.
+    """
+
+    def _students(self):
+        return get_user_model()._default_manager.select_related('programme', 'department__faculty')
+
+    def authenticate(self, request, username=None, password=None, **kwargs):
+        UserModel = get_user_model()
+        if username is None:
+            username = kwargs.get(UserModel.USERNAME_FIELD)
+        if username is None or password is None:
+            return None
+        try:
+            user = UserModel._default_manager.get_by_natural_key(username)
+        except UserModel.DoesNotExist:
+            # Run the hasher anyway so unknown numbers take as long as wrong passwords
+            UserModel().set_password(password)
+            return None
+
+        if credentials.verified(username, password, user.password):
+            return user if self.user_can_authenticate(user) else None
+
+        # check_password rehashes to the configured work factor when needed
+        if user.check_password(password):
+            credentials.remember(username, password, user.password)
+            return user if self.user_can_authenticate(user) else None
+        credentials.forget(username)
+        return None
+
+    def get_user(self, user_id):
+        try:
+            user = self._students().get(pk=user_id)
+        except get_user_model().DoesNotExist:
+            return None
+        return user if self.user_can_authenticate(user) else None
+
+    async def aget_user(self, user_id):
+        try:
+            user = await self._students().aget(pk=user_id)
+        except get_user_model().DoesNotExist:
+            return None
+        return user if self.user_can_authenticate(user) else None
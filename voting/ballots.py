@@ -0,0 +1,204 @@
+# voting/ballots.py
+import hashlib
+import json
+import uuid
+from collections import defaultdict
+from django.conf import settings
+from django.core.cache import cache
+from django.core.serializers.json import DjangoJSONEncoder
+
+from .models import Candidate, Delegate, Department
+
+DELEGATE_GENERATION_KEY = 'delegate_ballot_generation'
+CANDIDATE_GENERATION_KEY = 'candidate_ballot_generation'
+
+DELEGATE_API_FIELDS = (
+    'id',
+    'student__first_name',
+    'student__last_name',
+    'student__registration_number',
+    'party__name',
+    'party__acronym',
+    'party__color_code',
+)
+
+CANDIDATE_API_FIELDS = DELEGATE_API_FIELDS + ('manifesto',)
+
+
+def _timeout():
+    return settings.VOTING_SETTINGS.get('BALLOT_CACHE_TIMEOUT', 3600)
+
+
+def _generation(key):
+    """Shared generation token; replacing it drops a whole family of ballots at once"""
+    generation = cache.get(key)
+    if generation is None:
+        cache.add(key, uuid.uuid4().hex, None)
+        generation = cache.get(key)
+    return generation
+
+
+def _department_key(department_id, generation=None):
+    return f"delegate_ballot_{generation or _generation(DELEGATE_GENERATION_KEY)}_{department_id}"
+
+
+def _position_key(generation, election_id, position_id):
+    return f"candidate_ballot_{generation}_{election_id}_{position_id}"
+
+
+def _snapshot(entries, payload):
+    """Bundle template entries with the pre-encoded API body and its ETag"""
+    body = json.dumps(payload, cls=DjangoJSONEncoder).encode()
+    return {
+        'entries': entries,
+        'json': body,
+        'etag': f'"{hashlib.md5(body).hexdigest()}"',
+    }
+
+
+def _delegate_entry(row):
+    """Nested dict the dashboard template can walk like a Delegate instance"""
+    return {
+        'id': row['id'],
+        'student': {
+            'first_name': row['student__first_name'],
+            'last_name': row['student__last_name'],
+            'full_name': f"{row['student__first_name']} {row['student__last_name']}",
+            'registration_number': row['student__registration_number'],
+        },
+        'party': {
+            'name': row['party__name'],
+            'acronym': row['party__acronym'],
+            'color_code': row['party__color_code'],
+        },
+        'department': {'name': row['department__name']},
+    }
+
+
+def _candidate_entry(row):
+    """Nested dict the dashboard template can walk like a Candidate instance"""
+    return {
+        'id': row['id'],
+        'position': {'id': row['position_id']},
+        'student': {
+            'first_name': row['student__first_name'],
+            'last_name': row['student__last_name'],
+            'full_name': f"{row['student__first_name']} {row['student__last_name']}",
+            'registration_number': row['student__registration_number'],
+            'department': {'name': row['student__department__name']},
+            'programme': {'department': {'name': row['student__programme__department__name']}},
+        },
+        'party': {
+            'name': row['party__name'],
+            'acronym': row['party__acronym'],
+            'color_code': row['party__color_code'],
+        },
+        'manifesto': row['manifesto'],
+    }
+
+
+def build_department_ballot(department_id):
+    """Query and cache the approved delegates standing in a department"""
+    rows = list(
+        Delegate.objects.filter(department_id=department_id, is_approved=True)
+        .order_by('id')
+        .values(*DELEGATE_API_FIELDS, 'department__name')
+    )
+    ballot = _snapshot(
+        [_delegate_entry(row) for row in rows],
+        {'delegates': [{field: row[field] for field in DELEGATE_API_FIELDS} for row in rows]},
+    )
+    cache.set(_department_key(department_id), ballot, _timeout())
+    return ballot
+
+
+def build_department_ballots():
+    """Query every approved delegate once and cache one ballot per department, empty ones included"""
+    rows_by_department = {department_id: [] for department_id in Department.objects.values_list('id', flat=True)}
+    for row in (
+        Delegate.objects.filter(is_approved=True)
+        .order_by('id')
+        .values(*DELEGATE_API_FIELDS, 'department_id', 'department__name')
+    ):
+        rows_by_department.setdefault(row['department_id'], []).append(row)
+
+    generation = _generation(DELEGATE_GENERATION_KEY)
+    ballots = {
+        department_id: _snapshot(
+            [_delegate_entry(row) for row in rows],
+            {'delegates': [{field: row[field] for field in DELEGATE_API_FIELDS} for row in rows]},
+        )
+        for department_id, rows in rows_by_department.items()
+    }
+    cache.set_many(
+        {_department_key(department_id, generation): ballot for department_id, ballot in ballots.items()},
+        _timeout()
+    )
+    return ballots
+
+
+def department_ballot(department_id):
+    """Return the cached delegate ballot for a department, building it on a miss"""
+    ballot = cache.get(_department_key(department_id))
+    if ballot is None:
+        ballot = build_department_ballot(department_id)
+    return ballot
+
+
+def build_candidate_ballots(election_id):
+    """Query every approved candidate once and cache one ballot per position"""
+    rows_by_position = defaultdict(list)
+    for row in (
+        Candidate.objects.filter(is_approved=True)
+        .order_by('position__order', 'id')
+        .values(
+            *CANDIDATE_API_FIELDS, 'position_id', 'student__department__name', 'student__programme__department__name'
+        )
+    ):
+        rows_by_position[row['position_id']].append(row)
+
+    generation = _generation(CANDIDATE_GENERATION_KEY)
+    ballots = {}
+    for position_id, rows in rows_by_position.items():
+        ballots[position_id] = _snapshot(
+            [_candidate_entry(row) for row in rows],
+            {'candidates': [{field: row[field] for field in CANDIDATE_API_FIELDS} for row in rows]},
+        )
+    cache.set_many(
+        {_position_key(generation, election_id, position_id): ballot for position_id, ballot in ballots.items()},
+        _timeout()
+    )
+    return ballots
+
+
+def candidate_ballots(election_id, position_ids):
+    """Return {position_id: ballot} for the requested positions, rebuilding on any miss"""
+    generation = _generation(CANDIDATE_GENERATION_KEY)
+    keys = {_position_key(generation, election_id, position_id): position_id for position_id in position_ids}
+    cached = cache.get_many(keys)
+    if len(cached) < len(keys):
+        built = build_candidate_ballots(election_id)
+        empty = {
+            key: _snapshot([], {'candidates': []})
+            for key, position_id in keys.items() if position_id not in built
+        }
+        # Positions without candidates are cached too so they stop missing
+        cache.set_many(empty, _timeout())
+        return {position_id: built.get(position_id) or empty[key] for key, position_id in keys.items()}
+    return {keys[key]: ballot for key, ballot in cached.items()}
+
+
+def candidate_ballot(election_id, position_id):
+    return candidate_ballots(election_id, [position_id])[position_id]
+
+
+def invalidate_department(department_id):
+    cache.delete(_department_key(department_id))
+
+
+def invalidate_delegates():
+    cache.set(DELEGATE_GENERATION_KEY, uuid.uuid4().hex, None)
+
+
+def invalidate_candidates():
+    cache.set(CANDIDATE_GENERATION_KEY, uuid.uuid4().hex, None)
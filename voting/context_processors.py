@@ -1,9 +1,9 @@
 # voting/context_processors.py
-from .models import Election
+from .election_cache import get_active_election
 
 def election_context(request):
     """Add current election to context"""
-    current_election = Election.objects.filter(is_active=True).first()
+    current_election = get_active_election()
     return {
         'current_election': current_election
     }
\ No newline at end of file
@@ -0,0 +1,52 @@
+# voting/election_cache.py
+import threading
+import time
+import uuid
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import cache
+
+from .models import Election
+
+VERSION_KEY = 'active_election_version'
+
+_lock = threading.Lock()
+_state = {'election': None, 'version': None, 'expires': 0.0}
+
+
+def _shared_version():
+    """Read the cluster-wide version, seeding it if the cache was flushed"""
+    version = cache.get(VERSION_KEY)
+    if version is None:
+        cache.add(VERSION_KEY, uuid.uuid4().hex, None)
+        version = cache.get(VERSION_KEY)
+    return version
+
+
+def get_active_election():
+    """Return the active Election, reloading only when stale or invalidated"""
+    version = _shared_version()
+    if _state['version'] == version and time.monotonic() < _state['expires']:
+        return _state['election']
+
+    with _lock:
+        if _state['version'] != version or time.monotonic() >= _state['expires']:
+            _state['election'] = Election.objects.filter(is_active=True).first()
+            _state['version'] = version
+            _state['expires'] = time.monotonic() + settings.VOTING_SETTINGS.get('ELECTION_CACHE_TTL', 5)
+        return _state['election']
+
+
+async def aget_active_election():
+    """get_active_election for async views; a fresh hit never leaves the event loop thread"""
+    version = await cache.aget(VERSION_KEY)
+    if version is not None and _state['version'] == version and time.monotonic() < _state['expires']:
+        return _state['election']
+    return await sync_to_async(get_active_election)()
+
+
+def invalidate():
+    """Make every worker reload the active Election on its next request"""
+    cache.set(VERSION_KEY, uuid.uuid4().hex, None)
+    with _lock:
+        _state['expires'] = 0.0
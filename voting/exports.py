@@ -0,0 +1,174 @@
+# voting/exports.py
+import csv
+import zlib
+from datetime import datetime, time
+from asgiref.sync import sync_to_async
+from django.core.serializers.json import DjangoJSONEncoder
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+
+from .models import DelegateVote, MainVote, VoteAuditLog
+
+# name: (model, date field, filterable by election, [(header, lookup), ...])
+EXPORTS = {
+    'delegate_votes': (DelegateVote, 'vote_time', True, [
+        ('id', 'id'),
+        ('election_id', 'election_id'),
+        ('voter', 'voter__registration_number'),
+        ('delegate_id', 'delegate_id'),
+        ('delegate', 'delegate__student__registration_number'),
+        ('party', 'delegate__party__acronym'),
+        ('department', 'delegate__department__name'),
+        ('vote_time', 'vote_time'),
+        ('voter_ip', 'voter_ip'),
+    ]),
+    'main_votes': (MainVote, 'vote_time', True, [
+        ('id', 'id'),
+        ('election_id', 'election_id'),
+        ('delegate', 'delegate__student__registration_number'),
+        ('position', 'position__name'),
+        ('candidate_id', 'candidate_id'),
+        ('candidate', 'candidate__student__registration_number'),
+        ('party', 'candidate__party__acronym'),
+        ('vote_time', 'vote_time'),
+        ('voter_ip', 'voter_ip'),
+    ]),
+    'audit_log': (VoteAuditLog, 'timestamp', False, [
+        ('id', 'id'),
+        ('timestamp', 'timestamp'),
+        ('action_type', 'action_type'),
+        ('student', 'student__registration_number'),
+        ('ip_address', 'ip_address'),
+        ('success', 'success'),
+        ('description', 'description'),
+        ('user_agent', 'user_agent'),
+    ]),
+}
+
+FORMATS = ('csv', 'ndjson')
+
+# Rows fetched per database round trip and bytes per yielded block
+CHUNK_SIZE = 2000
+BLOCK_SIZE = 64 * 1024
+
+
+def parse_bound(value, end=False):
+    """Parse an ISO date or datetime filter; a bare date covers the whole day"""
+    if not value:
+        return None
+    moment = parse_datetime(value)
+    if moment is None:
+        day = parse_date(value)
+        if day is None:
+            raise ValueError(f"Invalid date: {value}")
+        moment = datetime.combine(day, time.max if end else time.min)
+    if timezone.is_naive(moment):
+        moment = timezone.make_aware(moment)
+    return moment
+
+
+def export_rows(name, election_id=None, since=None, until=None, chunk_size=CHUNK_SIZE):
+    """Return (headers, row iterator) for an export, streamed from the database in chunks"""
+    if name not in EXPORTS:
+        raise ValueError(f"Unknown export: {name}")
+    model, date_field, by_election, columns = EXPORTS[name]
+
+    queryset = model.objects.all()
+    if election_id is not None:
+        if not by_election:
+            raise ValueError(f"{name} cannot be filtered by election")
+        queryset = queryset.filter(election_id=election_id)
+    if since is not None:
+        queryset = queryset.filter(**{f'{date_field}__gte': since})
+    if until is not None:
+        queryset = queryset.filter(**{f'{date_field}__lte': until})
+
+    rows = (
+        queryset.order_by('id')
+        .values_list(*[lookup for _, lookup in columns])
+        .iterator(chunk_size=chunk_size)
+    )
+    return [header for header, _ in columns], rows
+
+
+# Leading characters that make a spreadsheet read a cell as a formula
+FORMULA_PREFIXES = ('=', '+', '-', '@', '\t', '\r')
+
+
+class _Line:
+    """File-like target that hands back what csv.writer writes"""
+
+    def write(self, value):
+        return value
+
+
+def _cell(value):
+    """Quote text a spreadsheet would run as a formula; user agents and descriptions come from clients"""
+    if isinstance(value, str) and value.startswith(FORMULA_PREFIXES):
+        return f"'{value}"
+    return value
+
+
+def _csv_lines(headers, rows):
+    writer = csv.writer(_Line())
+    yield writer.writerow(headers)
+    for row in rows:
+        yield writer.writerow([_cell(value) for value in row])
+
+
+def _ndjson_lines(headers, rows):
+    encoder = DjangoJSONEncoder()
+    for row in rows:
+        yield encoder.encode(dict(zip(headers, row))) + '\n'
+
+
+def _blocks(lines):
+    """Join lines into blocks of about BLOCK_SIZE bytes"""
+    block, size = [], 0
+    for line in lines:
+        data = line.encode()
+        block.append(data)
+        size += len(data)
+        if size >= BLOCK_SIZE:
+            yield b''.join(block)
+            block, size = [], 0
+    if block:
+        yield b''.join(block)
+
+
+def _gzip(blocks):
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31)
+    for block in blocks:
+        data = compressor.compress(block)
+        if data:
+            yield data
+    yield compressor.flush()
+
+
+def stream(name, fmt='csv', compress=False, **filters):
+    """Iterate an export as encoded bytes; memory stays flat whatever the row count"""
+    if fmt not in FORMATS:
+        raise ValueError(f"Unknown format: {fmt}")
+    headers, rows = export_rows(name, **filters)
+    lines = _csv_lines(headers, rows) if fmt == 'csv' else _ndjson_lines(headers, rows)
+    blocks = _blocks(lines)
+    return _gzip(blocks) if compress else blocks
+
+
+async def aiterate(blocks):
+    """Hand a stream's blocks to an ASGI server one at a time
+
+    Django would otherwise read a sync iterator into memory before sending
+    it under ASGI. Every block is read on the same thread, so the database
+    cursor stays with its connection.
+    """
+    done = object()
+    while True:
+        block = await sync_to_async(next)(blocks, done)
+        if block is done:
+            return
+        yield block
+
+
+def filename(name, fmt, compress=False):
+    return f"{name}_{timezone.now():%Y%m%d_%H%M%S}.{fmt}{'.gz' if compress else ''}"
@@ -0,0 +1,16 @@
+# voting/hashers.py
+from django.conf import settings
+from django.contrib.auth.hashers import PBKDF2PasswordHasher
+
+
+class StudentPBKDF2PasswordHasher(PBKDF2PasswordHasher):
+    """PBKDF2 whose work factor comes from VOTING_SETTINGS['STUDENT_HASH_ITERATIONS']
+
+    It keeps the pbkdf2_sha256 algorithm name, so it verifies every existing
+    PBKDF2 hash and rehashes it to the configured work factor on the next
+    successful login, whether the factor was raised or lowered.
+    """
+
+    @property
+    def iterations(self):
+        return settings.VOTING_SETTINGS.get('STUDENT_HASH_ITERATIONS', PBKDF2PasswordHasher.iterations)
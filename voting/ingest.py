@@ -0,0 +1,197 @@
+# voting/ingest.py
+import asyncio
+import atexit
+import logging
+import queue
+import threading
+import time
+from concurrent.futures import Future, TimeoutError as FutureTimeoutError
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import IntegrityError, close_old_connections, connection, transaction
+
+logger = logging.getLogger('voting')
+
+_STOP = object()
+
+
+class DuplicateVote(Exception):
+    """A unique constraint on the vote tables rejected the vote"""
+
+
+def is_unique_violation(error):
+    """Whether an IntegrityError came from a unique constraint rather than NOT NULL or a foreign key"""
+    cause = error.__cause__
+    # PostgreSQL (psycopg2 pgcode, psycopg 3 sqlstate)
+    code = getattr(cause, 'pgcode', None) or getattr(cause, 'sqlstate', None)
+    if code:
+        return code == '23505'
+    # MySQL ER_DUP_ENTRY
+    if cause is not None and getattr(cause, 'args', None) and cause.args[0] == 1062:
+        return True
+    # SQLite reports constraint failures only in the message
+    message = str(error)
+    return 'UNIQUE constraint failed' in message or 'Duplicate entry' in message
+
+
+class VoteCommitter:
+    """Single writer that groups votes from many requests into one transaction
+
+    Each vote is a callable run inside its own savepoint, so a duplicate or
+    a bad row only rolls back that vote. Futures are resolved after the
+    surrounding transaction commits, so a handler never reports a vote that
+    was not saved.
+    """
+
+    def __init__(self, batch_size=200, max_wait=0.005):
+        self.queue = queue.Queue()
+        self.batch_size = batch_size
+        self.max_wait = max_wait
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def start(self):
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name='vote-committer', daemon=True)
+                self._thread.start()
+
+    def submit(self, apply, inline=False):
+        """Queue a callable that writes one vote and return a Future for its result"""
+        future = Future()
+        if inline:
+            self._commit([(apply, future)])
+        else:
+            self.start()
+            self.queue.put((apply, future))
+        return future
+
+    def close(self, timeout=10):
+        """Commit what is queued and stop the thread; registered with atexit"""
+        if self._thread is None or not self._thread.is_alive():
+            return
+        self.queue.put(_STOP)
+        self._thread.join(timeout)
+
+    def _run(self):
+        stopping = False
+        while not stopping:
+            item = self.queue.get()
+            if item is _STOP:
+                break
+            batch = [item]
+
+            # Keep collecting for a few milliseconds so concurrent voters share a commit
+            deadline = time.monotonic() + self.max_wait
+            while len(batch) < self.batch_size:
+                remaining = deadline - time.monotonic()
+                try:
+                    if remaining > 0:
+                        item = self.queue.get(timeout=remaining)
+                    else:
+                        # Past the deadline, but still take votes that are already waiting
+                        item = self.queue.get_nowait()
+                except queue.Empty:
+                    break
+                if item is _STOP:
+                    stopping = True
+                    break
+                batch.append(item)
+
+            self._commit(batch)
+        connection.close()
+
+    def _commit(self, batch):
+        # Drop votes whose request gave up waiting before they were written
+        batch = [(apply, future) for apply, future in batch if future.set_running_or_notify_cancel()]
+        if not batch:
+            return
+        outcomes = []
+        try:
+            close_old_connections()
+            with transaction.atomic():
+                for apply, future in batch:
+                    try:
+                        with transaction.atomic():
+                            outcomes.append((future, apply(), None))
+                    except IntegrityError as e:
+                        if is_unique_violation(e):
+                            e = DuplicateVote(str(e))
+                        outcomes.append((future, None, e))
+                    except Exception as e:
+                        outcomes.append((future, None, e))
+        except Exception as e:
+            logger.error(f"Failed to commit a batch of {len(batch)} votes: {str(e)}")
+            for _, future in batch:
+                future.set_exception(e)
+            return
+
+        for future, result, error in outcomes:
+            if error is not None:
+                future.set_exception(error)
+            else:
+                future.set_result(result)
+
+
+def _build_committer():
+    options = settings.VOTING_SETTINGS
+    return VoteCommitter(
+        batch_size=options.get('VOTE_BATCH_SIZE', 200),
+        max_wait=options.get('VOTE_BATCH_WAIT', 0.005),
+    )
+
+
+committer = _build_committer()
+atexit.register(committer.close)
+
+
+def _timed_out(future, committed, timeout):
+    """Settle a vote whose wait ran out; True if it was saved after all
+
+    A vote still in the queue is withdrawn, so it can never be written after
+    the voter was told it failed. One already being written gets a second
+    wait, then the database is asked.
+    """
+    if future.cancel():
+        return False
+    try:
+        # Re-raises DuplicateVote and other failures from the committer
+        future.result(timeout=timeout)
+        return True
+    except FutureTimeoutError:
+        logger.warning("Vote commit timed out after its transaction started")
+    return committed is not None and committed()
+
+
+def commit(apply, committed=None):
+    """Write a vote through the committer and wait for its transaction to commit
+
+    Raises DuplicateVote when the vote tables' unique constraints reject it.
+    On timeout, committed() is asked whether the vote was saved anyway
+    before TimeoutError is raised.
+    """
+    options = settings.VOTING_SETTINGS
+    inline = options.get('VOTE_COMMITTER', 'thread') != 'thread'
+    future = committer.submit(apply, inline=inline)
+    timeout = options.get('VOTE_COMMIT_TIMEOUT', 10)
+    try:
+        return future.result(timeout=timeout)
+    except FutureTimeoutError:
+        if _timed_out(future, committed, timeout):
+            return None
+        raise
+
+
+async def acommit(apply, committed=None):
+    """commit() for async views; awaits the committer without holding a thread"""
+    options = settings.VOTING_SETTINGS
+    if options.get('VOTE_COMMITTER', 'thread') != 'thread':
+        return await sync_to_async(commit)(apply, committed)
+    future = committer.submit(apply)
+    timeout = options.get('VOTE_COMMIT_TIMEOUT', 10)
+    done, _ = await asyncio.wait([asyncio.wrap_future(future)], timeout=timeout)
+    if done:
+        return done.pop().result()
+    if await sync_to_async(_timed_out)(future, committed, timeout):
+        return None
+    raise FutureTimeoutError()
@@ -0,0 +1,185 @@
+# voting/live.py
+import asyncio
+import json
+import logging
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import cache
+from django.db import close_old_connections
+
+from . import election_cache, turnout
+from .models import DelegateResult, ElectionResult
+
+logger = logging.getLogger('voting')
+
+SNAPSHOT_CACHE_KEY = 'live_snapshot'
+
+# Events a slow client may fall behind by before it is resynced with the full state
+QUEUE_SIZE = 32
+
+
+def _options():
+    options = settings.VOTING_SETTINGS
+    return (
+        options.get('LIVE_INTERVAL', 2),
+        options.get('LIVE_KEEPALIVE', 15),
+        options.get('LIVE_RETRY', 5000),
+    )
+
+
+def snapshot():
+    """Read turnout and, once results are out, every tally for the active election"""
+    close_old_connections()
+    election = election_cache.get_active_election()
+    if election is None:
+        return {'turnout': {'election': None}, 'tallies': None}
+
+    # Turnout comes from the cached counters, so a refresh never counts the vote tables
+    counts = turnout.totals(election)
+    students = counts['eligible']
+    summary = {
+        'election': {
+            'id': election.id,
+            'name': election.name,
+            'current_phase': election.current_phase,
+        },
+        'students': students,
+        'delegate_votes': counts['delegate_votes'],
+        'main_votes': counts['main_votes'],
+        'percentage': round(counts['delegate_votes'] * 100 / students, 2) if students else 0,
+    }
+
+    tallies = None
+    if election.current_phase in ('results', 'closed'):
+        tallies = {
+            'candidates': {
+                str(candidate_id): count for candidate_id, count in
+                ElectionResult.objects.filter(election=election).values_list('candidate_id', 'vote_count')
+            },
+            'delegates': {
+                str(delegate_id): count for delegate_id, count in
+                DelegateResult.objects.filter(election=election).values_list('delegate_id', 'vote_count')
+            },
+        }
+    return {'turnout': summary, 'tallies': tallies}
+
+
+def cached_snapshot():
+    """Snapshot shared across processes for one interval, for clients that cannot stream"""
+    state = cache.get(SNAPSHOT_CACHE_KEY)
+    if state is None:
+        state = snapshot()
+        cache.set(SNAPSHOT_CACHE_KEY, state, _options()[0])
+    return state
+
+
+def event(name, data):
+    return f"event: {name}\ndata: {json.dumps(data)}\n\n"
+
+
+def full_events(state):
+    events = [event('turnout', state['turnout'])]
+    if state['tallies'] is not None:
+        events.append(event('tally', state['tallies']))
+    return events
+
+
+def delta_events(previous, state):
+    """Events for what changed between two snapshots; tallies carry only changed counts"""
+    if previous is None:
+        return full_events(state)
+    events = []
+    if state['turnout'] != previous['turnout']:
+        events.append(event('turnout', state['turnout']))
+    if state['tallies'] is not None:
+        before = previous['tallies'] or {'candidates': {}, 'delegates': {}}
+        changes = {
+            kind: {key: count for key, count in counts.items() if before[kind].get(key) != count}
+            for kind, counts in state['tallies'].items()
+        }
+        if any(changes.values()):
+            events.append(event('tally', changes))
+    return events
+
+
+class Broadcaster:
+    """One producer per process that reads the tallies and fans events out to every client
+
+    The producer runs on the event loop while anyone is subscribed, so the
+    database sees one reader per interval however many clients are connected.
+    """
+
+    def __init__(self):
+        self.subscribers = set()
+        self.state = None
+        self._task = None
+        self._loop = None
+
+    def subscribe(self):
+        loop = asyncio.get_running_loop()
+        queue = asyncio.Queue(maxsize=QUEUE_SIZE)
+        if self.state is not None:
+            for item in full_events(self.state):
+                queue.put_nowait(item)
+        self.subscribers.add(queue)
+        if self._task is None or self._task.done() or self._loop is not loop:
+            self._loop = loop
+            self._task = loop.create_task(self._run())
+        return queue
+
+    def unsubscribe(self, queue):
+        self.subscribers.discard(queue)
+
+    def _offer(self, queue, events):
+        try:
+            for item in events:
+                queue.put_nowait(item)
+        except asyncio.QueueFull:
+            # The client is too slow for deltas; start it again from the full state
+            while not queue.empty():
+                queue.get_nowait()
+            for item in full_events(self.state):
+                queue.put_nowait(item)
+
+    async def _run(self):
+        interval = _options()[0]
+        while self.subscribers:
+            try:
+                state = await sync_to_async(snapshot)()
+            except Exception as e:
+                logger.error(f"Failed to read live results: {str(e)}")
+            else:
+                events = delta_events(self.state, state)
+                self.state = state
+                if events:
+                    for queue in list(self.subscribers):
+                        self._offer(queue, events)
+            await asyncio.sleep(interval)
+        # Nobody is listening; the next subscriber starts from a fresh read
+        self.state = None
+
+
+broadcaster = Broadcaster()
+
+
+async def stream():
+    """Server-sent events for one client, fed by the shared broadcaster"""
+    _, keepalive, retry = _options()
+    queue = broadcaster.subscribe()
+    try:
+        yield f"retry: {retry}\n\n"
+        while True:
+            try:
+                item = await asyncio.wait_for(queue.get(), timeout=keepalive)
+            except asyncio.TimeoutError:
+                yield ": keepalive\n\n"
+                continue
+            yield item
+    finally:
+        broadcaster.unsubscribe(queue)
+
+
+def single_response_body():
+    """One round of events for WSGI, where EventSource reconnects after LIVE_POLL_RETRY"""
+    retry = settings.VOTING_SETTINGS.get('LIVE_POLL_RETRY', 300000)
+    return f"retry: {retry}\n\n" + ''.join(full_events(cached_snapshot()))
@@ -0,0 +1,158 @@
+import asyncio
+import os
+import subprocess
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import close_old_connections
+from django.test import AsyncClient, Client
+from django.urls import reverse
+
+from voting.models import Election, Position, Student
+from .simulate_election import Recorder, percentile
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare polling throughput of the sync views behind Django's WSGI handler with "
+        "the async views behind its ASGI handler. Both run in this process on the same "
+        "hardware; --mode both starts one run per mode with ASYNC_VIEWS set to match."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--mode',
+            choices=['wsgi', 'asgi', 'both'],
+            default='both',
+            help='Handler to benchmark (default: both, one after the other)'
+        )
+        parser.add_argument(
+            '--clients',
+            type=int,
+            default=200,
+            help='Logged-in students polling the APIs (default: 200)'
+        )
+        parser.add_argument(
+            '--concurrency',
+            type=int,
+            default=32,
+            help='Requests in flight at once: threads for WSGI, tasks for ASGI (default: 32)'
+        )
+        parser.add_argument(
+            '--rounds',
+            type=int,
+            default=5,
+            help='Times each client polls status, delegates and candidates (default: 5)'
+        )
+
+    def handle(self, *args, **options):
+        if options['mode'] == 'both':
+            for mode in ('wsgi', 'asgi'):
+                self.run_mode(mode, options)
+            return
+
+        async_views = settings.VOTING_SETTINGS.get('ASYNC_VIEWS', False)
+        if async_views != (options['mode'] == 'asgi'):
+            raise CommandError(f"--mode {options['mode']} needs ASYNC_VIEWS={int(not async_views)} in the environment")
+
+        election = Election.objects.filter(is_active=True).first()
+        if not election:
+            raise CommandError('No active election; run seed_data first')
+        students = list(Student.objects.filter(is_active=True, programme__isnull=False)[:options['clients']])
+        if not students:
+            raise CommandError('No students; run seed_data first')
+        position_ids = list(Position.objects.values_list('id', flat=True))
+
+        self.recorder = Recorder()
+        self.stdout.write(
+            f"{options['mode'].upper()}: {len(students)} clients x {options['rounds']} rounds "
+            f"at concurrency {options['concurrency']}..."
+        )
+        started = time.perf_counter()
+        if options['mode'] == 'wsgi':
+            self.run_wsgi(students, position_ids, options)
+        else:
+            asyncio.run(self.run_asgi(students, position_ids, options))
+        self.report(time.perf_counter() - started)
+
+    def run_mode(self, mode, options):
+        """Run one mode in a child process so the URLconf picks the matching views"""
+        env = {**os.environ, 'ASYNC_VIEWS': '1' if mode == 'asgi' else '0'}
+        command = [
+            sys.executable, sys.argv[0], 'benchmark_api', '--mode', mode,
+            '--clients', str(options['clients']),
+            '--concurrency', str(options['concurrency']),
+            '--rounds', str(options['rounds']),
+        ]
+        if options.get('settings'):
+            command += ['--settings', options['settings']]
+        result = subprocess.run(command, env=env, capture_output=True, text=True)
+        self.stdout.write(result.stdout)
+        if result.returncode:
+            raise CommandError(result.stderr.strip().splitlines()[-1] if result.stderr.strip() else f'{mode} run failed')
+
+    def requests(self, position_ids):
+        yield 'GET status', reverse('voting_status'), None
+        yield 'GET delegates', reverse('delegates'), None
+        for position_id in position_ids:
+            yield 'GET candidates', reverse('candidates'), {'position_id': position_id}
+
+    def run_wsgi(self, students, position_ids, options):
+        def session(student):
+            try:
+                client = Client(raise_request_exception=False)
+                client.force_login(student)
+                for _ in range(options['rounds']):
+                    for endpoint, url, params in self.requests(position_ids):
+                        self.recorder.call(endpoint, client.get, url, params)
+            finally:
+                close_old_connections()
+
+        with ThreadPoolExecutor(max_workers=options['concurrency']) as pool:
+            list(pool.map(session, students))
+
+    async def run_asgi(self, students, position_ids, options):
+        slots = asyncio.Semaphore(options['concurrency'])
+
+        async def call(endpoint, client, url, params):
+            started = time.perf_counter()
+            try:
+                response = await client.get(url, params)
+                failed = response.status_code >= 400
+            except Exception:
+                failed = True
+            elapsed = time.perf_counter() - started
+            self.recorder.samples[endpoint].append(elapsed)
+            if failed:
+                self.recorder.errors[endpoint] += 1
+
+        async def session(student):
+            async with slots:
+                client = AsyncClient(raise_request_exception=False)
+                await client.aforce_login(student)
+                for _ in range(options['rounds']):
+                    for endpoint, url, params in self.requests(position_ids):
+                        await call(endpoint, client, url, params)
+
+        await asyncio.gather(*(session(student) for student in students))
+
+    def report(self, elapsed):
+        header = f"{'endpoint':<20}{'requests':>10}{'errors':>8}{'req/s':>10}{'p50 ms':>10}{'p95 ms':>10}"
+        self.stdout.write(header)
+        self.stdout.write('-' * len(header))
+        total = 0
+        for endpoint in sorted(self.recorder.samples):
+            ordered = sorted(self.recorder.samples[endpoint])
+            total += len(ordered)
+            self.stdout.write(
+                f"{endpoint:<20}{len(ordered):>10}{self.recorder.errors[endpoint]:>8}"
+                f"{len(ordered) / elapsed:>10.1f}"
+                f"{percentile(ordered, 50) * 1000:>10.1f}"
+                f"{percentile(ordered, 95) * 1000:>10.1f}"
+            )
+        errors = sum(self.recorder.errors.values())
+        self.stdout.write('-' * len(header))
+        style = self.style.SUCCESS if not errors else self.style.WARNING
+        self.stdout.write(style(f'{total} requests in {elapsed:.1f}s ({total / elapsed:.1f} req/s), {errors} errors'))
@@ -0,0 +1,79 @@
+import time
+from django.contrib.auth import authenticate
+from django.contrib.auth.hashers import get_hasher
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from voting.backends import credentials
+from voting.models import Student
+
+
+class Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = (
+        "Measure birth-certificate logins per second per core through authenticate(), "
+        "first with the hasher (cold) and then from the verified-credential cache (warm). "
+        "Rehashes made during the run are rolled back."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--students',
+            type=int,
+            default=200,
+            help='Students to log in per round (default: 200)'
+        )
+        parser.add_argument(
+            '--rounds',
+            type=int,
+            default=3,
+            help='Warm rounds after the cold one (default: 3)'
+        )
+
+    def handle(self, *args, **options):
+        students = list(
+            Student.objects.filter(is_active=True)
+            .values_list('registration_number', 'birth_certificate_number')[:options['students']]
+        )
+        if not students:
+            raise CommandError('No students to log in; run seed_data or import_students first')
+
+        hasher = get_hasher()
+        self.stdout.write(
+            f"Hasher: {hasher.algorithm} with {getattr(hasher, 'iterations', 'n/a')} iterations, "
+            f"{len(students)} students"
+        )
+
+        try:
+            with transaction.atomic():
+                credentials.clear()
+                # The first pass also rehashes students stored with another work factor
+                self.run('Rehash', students)
+                credentials.clear()
+                self.run('Cold', students)
+                for round_number in range(options['rounds']):
+                    self.run(f'Warm {round_number + 1}', students)
+                raise Rollback
+        except Rollback:
+            pass
+        finally:
+            credentials.clear()
+
+    def run(self, label, students):
+        failures = 0
+        cpu = time.process_time()
+        wall = time.perf_counter()
+        for registration_number, birth_certificate_number in students:
+            if authenticate(username=registration_number, password=birth_certificate_number) is None:
+                failures += 1
+        cpu = time.process_time() - cpu
+        wall = time.perf_counter() - wall
+        self.stdout.write(
+            f"{label:<8} {len(students) / cpu if cpu else 0:>10.1f} logins/s per core"
+            f"{len(students) / wall if wall else 0:>10.1f} logins/s wall"
+            f"{wall / len(students) * 1000:>8.2f} ms each"
+            f"{failures:>6} failures"
+        )
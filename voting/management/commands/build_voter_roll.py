@@ -0,0 +1,43 @@
+import time
+from django.core.management.base import BaseCommand, CommandError
+
+from voting import roll
+from voting.models import Election
+
+
+class Command(BaseCommand):
+    help = (
+        "Build or refresh the voter roll (eligibility, delegate and voting status per student) "
+        "for an election. run_scheduler does this before delegate voting opens; run it by hand "
+        "after bulk changes to students or delegates. Safe to repeat while voting is open."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--election-id',
+            type=int,
+            help='Election to build the roll for (default: every active election)'
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=roll.BATCH_SIZE,
+            help=f'Roll entries per insert (default: {roll.BATCH_SIZE})'
+        )
+
+    def handle(self, *args, **options):
+        if options['election_id']:
+            elections = Election.objects.filter(id=options['election_id'])
+            if not elections.exists():
+                raise CommandError(f"Election {options['election_id']} does not exist")
+        else:
+            elections = Election.objects.filter(is_active=True)
+
+        for election in elections:
+            started = time.perf_counter()
+            students = roll.build(election, batch_size=options['batch_size'])
+            figures = roll.turnout(election)
+            self.stdout.write(self.style.SUCCESS(
+                f"Built the voter roll for {election.name} in {time.perf_counter() - started:.2f}s: "
+                f"{students} students, {figures['eligible']} eligible, {figures['voted']} voted"
+            ))
@@ -0,0 +1,51 @@
+import sys
+from django.core.management.base import BaseCommand, CommandError
+
+from voting import exports
+
+
+class Command(BaseCommand):
+    help = 'Stream delegate votes, main votes or the audit log to CSV or NDJSON with flat memory use'
+
+    def add_arguments(self, parser):
+        parser.add_argument('name', choices=sorted(exports.EXPORTS), help='What to export')
+        parser.add_argument(
+            '--format',
+            choices=exports.FORMATS,
+            default='csv',
+            help='Output format (default: csv)'
+        )
+        parser.add_argument('--gzip', action='store_true', help='Compress the output with gzip')
+        parser.add_argument('--election-id', type=int, help='Only rows for this election')
+        parser.add_argument('--since', help='Only rows on or after this ISO date or datetime')
+        parser.add_argument('--until', help='Only rows on or before this ISO date or datetime')
+        parser.add_argument(
+            '--output', '-o',
+            help='File to write (default: stdout)'
+        )
+
+    def handle(self, *args, **options):
+        try:
+            chunks = exports.stream(
+                options['name'], options['format'], options['gzip'],
+                election_id=options['election_id'],
+                since=exports.parse_bound(options['since']),
+                until=exports.parse_bound(options['until'], end=True),
+            )
+        except ValueError as e:
+            raise CommandError(str(e))
+
+        output = open(options['output'], 'wb') if options['output'] else sys.stdout.buffer
+        written = 0
+        try:
+            for chunk in chunks:
+                output.write(chunk)
+                written += len(chunk)
+        finally:
+            if options['output']:
+                output.close()
+            else:
+                output.flush()
+
+        if options['output']:
+            self.stderr.write(self.style.SUCCESS(f"Wrote {written} bytes to {options['output']}"))
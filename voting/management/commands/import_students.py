@@ -0,0 +1,209 @@
+import csv
+import time
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand, CommandError
+from django.core.validators import RegexValidator
+
+from voting import ballots, roll
+from voting.models import Programme, Student
+from voting.utils import hash_passwords, password_pool
+
+REQUIRED_COLUMNS = ('registration_number', 'birth_certificate_number', 'programme_code')
+
+# Columns refreshed on students that already exist; the password only
+# changes when the birth certificate number does
+UPDATE_FIELDS = [
+    'birth_certificate_number', 'first_name', 'last_name', 'email',
+    'phone_number', 'programme', 'department', 'year_of_study',
+]
+
+YEARS_OF_STUDY = {str(year) for year, _ in Student._meta.get_field('year_of_study').choices}
+
+
+def registration_pattern():
+    """The compiled regex from Student.registration_number's validator"""
+    for validator in Student._meta.get_field('registration_number').validators:
+        if isinstance(validator, RegexValidator):
+            return validator.regex
+    raise CommandError('Student.registration_number has no RegexValidator')
+
+
+class Command(BaseCommand):
+    help = (
+        "Import or update students from the registrar's roster CSV. Columns: "
+        "registration_number, birth_certificate_number, programme_code and optionally "
+        "first_name, last_name, email, phone_number, year_of_study."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('csv_file', help='Path to the roster CSV')
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=2000,
+            help='Rows validated, hashed and upserted per batch (default: 2000)'
+        )
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=None,
+            help='Processes used to hash passwords (default: one per CPU)'
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Validate the file and report errors without writing'
+        )
+
+    def handle(self, *args, **options):
+        self.pattern = registration_pattern()
+        self.max_lengths = {
+            name: Student._meta.get_field(name).max_length
+            for name in ('registration_number', 'birth_certificate_number', 'first_name',
+                         'last_name', 'email', 'phone_number')
+        }
+        self.programmes = self.programme_index()
+        self.dry_run = options['dry_run']
+        self.created = self.updated = self.rehashed = self.errors = 0
+        started = time.perf_counter()
+
+        try:
+            roster = open(options['csv_file'], newline='', encoding='utf-8-sig')
+        except OSError as e:
+            raise CommandError(f"Cannot open {options['csv_file']}: {e}")
+
+        pool = None if self.dry_run else password_pool(options['workers'])
+        try:
+            with roster:
+                reader = csv.DictReader(roster)
+                missing = [column for column in REQUIRED_COLUMNS if column not in (reader.fieldnames or [])]
+                if missing:
+                    raise CommandError(f"Missing columns: {', '.join(missing)}")
+
+                batch = {}
+                rows = 0
+                for rows, row in enumerate(reader, 1):
+                    student = self.validate(reader.line_num, row)
+                    if student is None:
+                        continue
+                    if student.registration_number in batch:
+                        self.error(reader.line_num, f'{student.registration_number} repeats an earlier row; the later row wins')
+                    batch[student.registration_number] = student
+                    if len(batch) >= options['batch_size']:
+                        self.upsert(batch, pool)
+                        batch = {}
+                        self.progress(rows, started)
+                if batch:
+                    self.upsert(batch, pool)
+                self.progress(rows, started)
+        finally:
+            if pool is not None:
+                pool.shutdown()
+
+        if (self.created or self.updated) and not self.dry_run:
+            # bulk_create skips the Student signals that keep cached ballots fresh
+            ballots.invalidate_delegates()
+            ballots.invalidate_candidates()
+
+        style = self.style.SUCCESS if not self.errors else self.style.WARNING
+        self.stdout.write(style(
+            f"{'Validated' if self.dry_run else 'Imported'} roster in {time.perf_counter() - started:.1f}s: "
+            f"{self.created} created, {self.updated} updated, {self.rehashed} passwords hashed, "
+            f"{self.errors} rows with errors"
+        ))
+
+    def programme_index(self):
+        """(programme id, department id) by code; codes shared by several programmes map to None"""
+        index = {}
+        for programme_id, department_id, code in Programme.objects.values_list('id', 'department_id', 'code'):
+            index[code] = None if code in index else (programme_id, department_id)
+        return index
+
+    def error(self, line, message):
+        self.errors += 1
+        self.stderr.write(f'line {line}: {message}')
+
+    def validate(self, line, row):
+        """Check one CSV row and return an unsaved Student, or None after reporting why"""
+        values = {key: (value or '').strip() for key, value in row.items() if key}
+
+        registration_number = values['registration_number']
+        if not self.pattern.match(registration_number):
+            self.error(line, f'invalid registration number {registration_number!r}')
+            return None
+        if not values['birth_certificate_number']:
+            self.error(line, f'{registration_number} has no birth certificate number')
+            return None
+        for name, max_length in self.max_lengths.items():
+            if len(values.get(name, '')) > max_length:
+                self.error(line, f'{registration_number}: {name} is longer than {max_length} characters')
+                return None
+
+        code = values['programme_code']
+        programme = self.programmes.get(code)
+        if programme is None:
+            reason = 'is ambiguous' if code in self.programmes else 'does not exist'
+            self.error(line, f'{registration_number}: programme code {code!r} {reason}')
+            return None
+
+        year_of_study = values.get('year_of_study', '')
+        if year_of_study and year_of_study not in YEARS_OF_STUDY:
+            self.error(line, f'{registration_number}: invalid year of study {year_of_study!r}')
+            return None
+
+        return Student(
+            registration_number=registration_number,
+            birth_certificate_number=values['birth_certificate_number'],
+            first_name=values.get('first_name') or None,
+            last_name=values.get('last_name') or None,
+            email=values.get('email') or None,
+            phone_number=values.get('phone_number') or None,
+            programme_id=programme[0],
+            department_id=programme[1],
+            year_of_study=int(year_of_study) if year_of_study else None,
+        )
+
+    def upsert(self, batch, pool):
+        """Hash new or changed passwords and upsert one batch"""
+        existing = dict(
+            Student.objects.filter(registration_number__in=batch.keys())
+            .values_list('registration_number', 'birth_certificate_number')
+        )
+        rehash, unchanged = [], []
+        for number, student in batch.items():
+            if existing.get(number) == student.birth_certificate_number:
+                unchanged.append(student)
+            else:
+                rehash.append(student)
+
+        self.created += len(batch) - len(existing)
+        self.updated += len(existing)
+        self.rehashed += len(rehash)
+        if self.dry_run:
+            return
+
+        for student, password in zip(
+            rehash, hash_passwords((s.birth_certificate_number for s in rehash), executor=pool)
+        ):
+            student.password = password
+        # Existing students keep their hash; the placeholder is never stored
+        for student in unchanged:
+            student.password = make_password(None)
+
+        if rehash:
+            Student.objects.bulk_create(
+                rehash, update_conflicts=True,
+                unique_fields=['registration_number'], update_fields=UPDATE_FIELDS + ['password'],
+            )
+        if unchanged:
+            Student.objects.bulk_create(
+                unchanged, update_conflicts=True,
+                unique_fields=['registration_number'], update_fields=UPDATE_FIELDS,
+            )
+        if existing:
+            # bulk_create skips the Student signal that moves roll entries with their programme
+            roll.sync_students(Student.objects.filter(registration_number__in=existing.keys()))
+
+    def progress(self, rows, started):
+        elapsed = time.perf_counter() - started
+        self.stdout.write(f'Processed {rows} rows ({rows / elapsed if elapsed else 0:.0f} rows/s)...')
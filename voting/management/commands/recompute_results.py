@@ -0,0 +1,21 @@
+from django.core.management import call_command
+from django.core.management.base import BaseCommand
+
+
+class Command(BaseCommand):
+    help = "Rebuild the cached ElectionResult and DelegateResult tallies from the vote tables (alias of compute_results)"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--election-id',
+            type=int,
+            help='Election to rebuild (default: every active election)'
+        )
+
+    def handle(self, *args, **options):
+        call_command(
+            'compute_results',
+            election_id=options['election_id'],
+            stdout=self.stdout,
+            stderr=self.stderr,
+        )
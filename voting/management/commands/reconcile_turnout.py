@@ -0,0 +1,46 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from voting import turnout
+from voting.models import Department, Election
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare the live turnout counters with the vote tables, correct any drift and save the "
+        "result to DepartmentTurnout. Run after a cache restart or failover; safe while voting "
+        "is open, though a vote committed mid-run may need a second run to settle. Without a "
+        "shared cache (REDIS_URL) there are no counters, and the exact counts are saved instead."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--election-id',
+            type=int,
+            help='Election to reconcile (default: every active election)'
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Report drift without correcting it'
+        )
+
+    def handle(self, *args, **options):
+        if options['election_id']:
+            elections = Election.objects.filter(id=options['election_id'])
+            if not elections.exists():
+                raise CommandError(f"Election {options['election_id']} does not exist")
+        else:
+            elections = Election.objects.filter(is_active=True)
+
+        names = dict(Department.objects.values_list('id', 'name'))
+        for election in elections:
+            drift = turnout.reconcile(election, apply=not options['dry_run'])
+            for department_id, kind, counted, actual in drift:
+                self.stdout.write(
+                    f"  {names.get(department_id, department_id)}: {kind.replace('_', ' ')} "
+                    f"counted {counted}, actually {actual}"
+                )
+            verb = 'found' if options['dry_run'] else 'corrected'
+            self.stdout.write(self.style.SUCCESS(
+                f"{election.name}: {verb} {len(drift)} drifting turnout counters"
+            ))
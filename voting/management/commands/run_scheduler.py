@@ -0,0 +1,50 @@
+import time
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import close_old_connections
+
+from voting import scheduler, sharedcache
+
+
+class Command(BaseCommand):
+    help = (
+        "Move active elections through their phases at delegate_voting_start, main_voting_start "
+        "and main_voting_end. Ballots are cached PHASE_WARM_LEAD seconds before voting opens "
+        "and results are recounted as main voting closes. Phases only ever move forward, so "
+        "a phase set by hand is never undone; 'closed' is always set by hand. Needs a cache "
+        "shared with the web workers (REDIS_URL); warm-ups and invalidations written to the "
+        "per-process local-memory cache would never reach them."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--once',
+            action='store_true',
+            help='Apply what is due now and exit, e.g. from cron'
+        )
+        parser.add_argument(
+            '--interval',
+            type=int,
+            default=settings.VOTING_SETTINGS.get('SCHEDULER_INTERVAL', 30),
+            help='Longest sleep between checks in seconds (default: SCHEDULER_INTERVAL)'
+        )
+
+    def handle(self, *args, **options):
+        if not sharedcache.is_shared():
+            raise CommandError(
+                "run_scheduler needs a cache shared with the web workers; set REDIS_URL"
+            )
+        while True:
+            close_old_connections()
+            for election, message in scheduler.tick():
+                self.stdout.write(self.style.SUCCESS(f'{election.name}: {message}'))
+            if options['once']:
+                return
+
+            # Wake up early for a transition or warm-up that falls inside the interval
+            remaining = scheduler.seconds_until_next()
+            delay = options['interval'] if remaining is None else min(options['interval'], max(remaining, 0) + 0.5)
+            try:
+                time.sleep(delay)
+            except KeyboardInterrupt:
+                return
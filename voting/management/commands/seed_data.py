@@ -5,14 +5,17 @@ from django.core.management.base import BaseCommand
 from django.utils import timezone
 from faker import Faker
 import random
+from collections import defaultdict
 from datetime import datetime, timedelta
 
 
 from voting.models import (
     Faculty, Department, Programme, Student, Party, Position, 
     Candidate, Delegate, Election, DelegateVote, MainVote, 
-    VoteAuditLog, ElectionResult
+    VoteAuditLog, ElectionResult, VoterRoll, DepartmentTurnout
 )
+from voting import roll, tally, turnout
+from voting.utils import hash_passwords
 
 fake = Faker()
 
@@ -68,6 +71,12 @@ KENYAN_LAST_NAMES = [
     'Wakaba', 'Wambua', 'Wamukoya', 'Wanjala', 'Wanjiku', 'Wanjiru', 'Warega', 'Waweru'
 ]
 
+PHONE_PREFIXES = [
+    '0701', '0702', '0703', '0704', '0705', '0706', '0707', '0708', '0709',
+    '0710', '0711', '0712', '0713', '0714', '0715', '0716', '0717', '0718', '0719',
+    '0720', '0721', '0722', '0723', '0724', '0725', '0726', '0727', '0728', '0729'
+]
+
 class Command(BaseCommand):
     help = 'Seed the database with sample data for the voting app'
 
@@ -83,6 +92,45 @@ class Command(BaseCommand):
             action='store_true',
             help='Clear existing data before seeding'
         )
+        parser.add_argument(
+            '--bulk',
+            action='store_true',
+            help='Insert students with bulk_create in chunks and hash passwords in parallel'
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=1000,
+            help='Rows per INSERT in bulk mode (default: 1000)'
+        )
+        parser.add_argument(
+            '--chunk-size',
+            type=int,
+            default=10000,
+            help='Students generated and hashed per chunk in bulk mode (default: 10000)'
+        )
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=None,
+            help='Processes used to hash passwords in bulk mode (default: one per CPU)'
+        )
+        parser.add_argument(
+            '--fast-hashing',
+            action='store_true',
+            help='Use a cheap test-only work factor; hashes are upgraded when a student logs in'
+        )
+        parser.add_argument(
+            '--votes',
+            action='store_true',
+            help='Also cast delegate and main votes and rebuild the results tallies'
+        )
+        parser.add_argument(
+            '--turnout',
+            type=float,
+            default=0.75,
+            help='Share of students and delegates who vote with --votes (default: 0.75)'
+        )
 
     def handle(self, *args, **options):
         if options['clear']:
@@ -97,7 +145,10 @@ class Command(BaseCommand):
         programmes_data = self.create_programmes(departments_data)
         
         # Create students
-        students = self.create_students(programmes_data, options['students'])
+        if options['bulk']:
+            students = self.bulk_create_students(programmes_data, options['students'], options)
+        else:
+            students = self.create_students(programmes_data, options['students'])
         
         # Create parties
         parties = self.create_parties()
@@ -108,11 +159,31 @@ class Command(BaseCommand):
         # Create election
         election = self.create_election()
         
+        # Bulk datasets only offer a sample of students for nomination, since
+        # picking delegates and candidates is quadratic in the pool size
+        delegate_pool = self.department_sample(students) if options['bulk'] else students
+        candidate_pool = (
+            random.sample(students, min(len(students), 2 * len(parties) * len(positions)))
+            if options['bulk'] else students
+        )
+
         # Create delegates
-        delegates = self.create_delegates(students, parties, departments_data)
+        delegates = self.create_delegates(delegate_pool, parties, departments_data)
         
         # Create candidates
-        candidates = self.create_candidates(students, parties, positions)
+        candidates = self.create_candidates(candidate_pool, parties, positions)
+
+        # Cast votes
+        delegate_votes = main_votes = 0
+        if options['votes']:
+            delegate_votes, main_votes = self.create_votes(
+                election, students, options['turnout'], options['batch_size']
+            )
+        
+        # Build the voter roll last so it records the votes just cast
+        roll_entries = roll.build(election, batch_size=options['batch_size'])
+        # Start the turnout counters from the votes just cast
+        turnout.reconcile(election)
         
         self.stdout.write(
             self.style.SUCCESS(
@@ -125,6 +196,9 @@ class Command(BaseCommand):
                 f'- {len(positions)} positions\n'
                 f'- {len(delegates)} delegates\n'
                 f'- {len(candidates)} candidates\n'
+                f'- {delegate_votes} delegate votes\n'
+                f'- {main_votes} main votes\n'
+                f'- {roll_entries} voter roll entries\n'
                 f'- 1 election'
             )
         )
@@ -132,7 +206,7 @@ class Command(BaseCommand):
     def clear_data(self):
         """Clear existing data"""
         models_to_clear = [
-            VoteAuditLog, ElectionResult, MainVote, DelegateVote,
+            VoteAuditLog, ElectionResult, VoterRoll, DepartmentTurnout, MainVote, DelegateVote,
             Delegate, Candidate, Election, Position, Party,
             Student, Programme, Department, Faculty
         ]
@@ -258,57 +332,60 @@ class Command(BaseCommand):
         
         return programmes
 
+    def build_student(self, programmes, used_reg_numbers):
+        """Generate an unsaved student with Kenyan names; returns it with its birth certificate number"""
+        # Generate unique registration number
+        while True:
+            # Format: SC211/0530/2022 (Faculty Code + Department + Sequential/Year)
+            year = random.choice([2020, 2021, 2022, 2023, 2024])
+            dept_code = random.choice(['SC', 'BA', 'ED', 'LW', 'MD', 'AS', 'EN', 'AG'])
+            sequential = random.randint(100, 999)
+            student_num = random.randint(1000, 9999)
+            reg_number = f"{dept_code}{sequential}/{student_num:04d}/{year}"
+            
+            if reg_number not in used_reg_numbers:
+                used_reg_numbers.add(reg_number)
+                break
+        
+        # Generate birth certificate number
+        birth_cert = f"{random.randint(10000000, 99999999)}"
+        
+        # Select random Kenyan names
+        first_name = random.choice(KENYAN_FIRST_NAMES)
+        last_name = random.choice(KENYAN_LAST_NAMES)
+        
+        # Generate email
+        email = f"{first_name.lower()}.{last_name.lower()}@student.university.ac.ke"
+        
+        # Generate phone number (Kenyan format)
+        phone = f"{random.choice(PHONE_PREFIXES)}{random.randint(100000, 999999)}"
+        
+        # Select random programme and year
+        programme = random.choice(programmes)
+        year_of_study = random.randint(1, 4)
+        
+        student = Student(
+            registration_number=reg_number,
+            birth_certificate_number=birth_cert,
+            first_name=first_name,
+            last_name=last_name,
+            email=email,
+            phone_number=phone,
+            programme=programme,
+            department_id=programme.department_id,
+            year_of_study=year_of_study,
+            is_active=True,
+            date_joined=fake.date_time_between(start_date='-2y', end_date='now', tzinfo=timezone.get_current_timezone())
+        )
+        return student, birth_cert
+
     def create_students(self, programmes, num_students):
         """Create students with Kenyan names"""
         students = []
         used_reg_numbers = set()
         
         for i in range(num_students):
-            # Generate unique registration number
-            while True:
-                # Format: SC211/0530/2022 (Faculty Code + Department + Sequential/Year)
-                year = random.choice([2020, 2021, 2022, 2023, 2024])
-                dept_code = random.choice(['SC', 'BA', 'ED', 'LW', 'MD', 'AS', 'EN', 'AG'])
-                sequential = random.randint(100, 999)
-                student_num = random.randint(1000, 9999)
-                reg_number = f"{dept_code}{sequential}/{student_num:04d}/{year}"
-                
-                if reg_number not in used_reg_numbers:
-                    used_reg_numbers.add(reg_number)
-                    break
-            
-            # Generate birth certificate number
-            birth_cert = f"{random.randint(10000000, 99999999)}"
-            
-            # Select random Kenyan names
-            first_name = random.choice(KENYAN_FIRST_NAMES)
-            last_name = random.choice(KENYAN_LAST_NAMES)
-            
-            # Generate email
-            email = f"{first_name.lower()}.{last_name.lower()}@student.university.ac.ke"
-            
-            # Generate phone number (Kenyan format)
-            phone_prefixes = ['0701', '0702', '0703', '0704', '0705', '0706', '0707', '0708', '0709',
-                            '0710', '0711', '0712', '0713', '0714', '0715', '0716', '0717', '0718', '0719',
-                            '0720', '0721', '0722', '0723', '0724', '0725', '0726', '0727', '0728', '0729']
-            phone = f"{random.choice(phone_prefixes)}{random.randint(100000, 999999)}"
-            
-            # Select random programme and year
-            programme = random.choice(programmes)
-            year_of_study = random.randint(1, 4)
-            
-            student = Student(
-                registration_number=reg_number,
-                birth_certificate_number=birth_cert,
-                first_name=first_name,
-                last_name=last_name,
-                email=email,
-                phone_number=phone,
-                programme=programme,
-                year_of_study=year_of_study,
-                is_active=True,
-                date_joined=fake.date_time_between(start_date='-2y', end_date='now', tzinfo=timezone.get_current_timezone())
-            )
+            student, birth_cert = self.build_student(programmes, used_reg_numbers)
             
             # Set password to birth certificate number
             student.set_password(birth_cert)
@@ -320,6 +397,41 @@ class Command(BaseCommand):
         
         return students
 
+    def bulk_create_students(self, programmes, num_students, options):
+        """Create students chunk by chunk with bulk_create and batched password hashing"""
+        students = []
+        used_reg_numbers = set(Student.objects.values_list('registration_number', flat=True))
+        chunk_size = max(1, options['chunk_size'])
+        
+        for start in range(0, num_students, chunk_size):
+            chunk = [
+                self.build_student(programmes, used_reg_numbers)
+                for _ in range(min(chunk_size, num_students - start))
+            ]
+            hashes = hash_passwords(
+                (birth_cert for _, birth_cert in chunk),
+                workers=options['workers'],
+                fast=options['fast_hashing'],
+            )
+            for (student, _), password in zip(chunk, hashes):
+                student.password = password
+            students.extend(Student.objects.bulk_create(
+                [student for student, _ in chunk], batch_size=options['batch_size']
+            ))
+            self.stdout.write(f'Created {len(students)} students...')
+        
+        return students
+
+    def department_sample(self, students, per_department=12):
+        """A few students from each department to nominate delegates from"""
+        by_department = defaultdict(list)
+        for student in students:
+            by_department[student.department_id].append(student)
+        pool = []
+        for dept_students in by_department.values():
+            pool.extend(random.sample(dept_students, min(per_department, len(dept_students))))
+        return pool
+
     def create_parties(self):
         """Create political parties"""
         parties_data = [
@@ -403,7 +515,7 @@ class Command(BaseCommand):
                     break
                 
                 # Get students from this department
-                dept_students = [s for s in students if s.programme.department == department]
+                dept_students = [s for s in students if s.department_id == department.id]
                 
                 if len(dept_students) < 2:
                     continue
@@ -454,6 +566,52 @@ class Command(BaseCommand):
         return candidates
 
 
+    def create_votes(self, election, students, rate, batch_size):
+        """Cast delegate and main votes with bulk_create, then rebuild the tallies"""
+        delegates_by_department = defaultdict(list)
+        for delegate in Delegate.objects.filter(is_approved=True):
+            delegates_by_department[delegate.department_id].append(delegate)
+
+        delegate_votes = [
+            DelegateVote(
+                election=election,
+                voter=student,
+                delegate=random.choice(delegates_by_department[student.department_id]),
+                voter_ip=self.random_ip()
+            )
+            for student in students
+            if delegates_by_department[student.department_id] and random.random() < rate
+        ]
+        for start in range(0, len(delegate_votes), batch_size):
+            DelegateVote.objects.bulk_create(delegate_votes[start:start + batch_size])
+            self.stdout.write(f'Cast {min(start + batch_size, len(delegate_votes))} delegate votes...')
+
+        candidates_by_position = defaultdict(list)
+        for candidate in Candidate.objects.filter(is_approved=True):
+            candidates_by_position[candidate.position_id].append(candidate)
+
+        main_votes = [
+            MainVote(
+                election=election,
+                delegate=delegate,
+                candidate=random.choice(candidates),
+                position_id=position_id,
+                voter_ip=self.random_ip()
+            )
+            for department_delegates in delegates_by_department.values()
+            for delegate in department_delegates
+            if random.random() < rate
+            for position_id, candidates in candidates_by_position.items()
+        ]
+        MainVote.objects.bulk_create(main_votes, batch_size=batch_size)
+
+        tally.rebuild_results(election)
+        return len(delegate_votes), len(main_votes)
+
+    def random_ip(self):
+        return f"10.{random.randint(0, 255)}.{random.randint(0, 255)}.{random.randint(1, 254)}"
+
+
 if __name__ == '__main__':
     # You can also run this script directly
     import sys
@@ -0,0 +1,199 @@
+import random
+import threading
+import time
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import close_old_connections
+from django.test import Client
+from django.urls import reverse
+from django.utils import timezone
+
+from voting.models import Delegate, Election, Position, Student
+
+
+class Recorder:
+    """Thread-safe collection of per-endpoint latencies and status codes"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.samples = defaultdict(list)
+        self.errors = defaultdict(int)
+
+    def call(self, endpoint, send, *args, **kwargs):
+        started = time.perf_counter()
+        try:
+            response = send(*args, **kwargs)
+            failed = response.status_code >= 400
+        except Exception:
+            response, failed = None, True
+        elapsed = time.perf_counter() - started
+        with self.lock:
+            self.samples[endpoint].append(elapsed)
+            if failed:
+                self.errors[endpoint] += 1
+        return response
+
+
+def percentile(ordered, pct):
+    if not ordered:
+        return 0.0
+    return ordered[min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))]
+
+
+class Command(BaseCommand):
+    help = (
+        "Replay a full election (logins, dashboards, delegate votes, main votes and results "
+        "polling) against the configured database and report latency per endpoint. "
+        "This writes votes and moves the active election through its phases, so run it "
+        "against a disposable database."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--students',
+            type=int,
+            default=0,
+            help='Seed this many students first with seed_data --clear --bulk --fast-hashing (default: use existing data)'
+        )
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=16,
+            help='Concurrent simulated clients (default: 16)'
+        )
+        parser.add_argument(
+            '--voters',
+            type=int,
+            default=0,
+            help='Limit the number of students who vote (default: all)'
+        )
+        parser.add_argument(
+            '--polls',
+            type=int,
+            default=2,
+            help='Results page loads per voter in the results phase (default: 2)'
+        )
+
+    def handle(self, *args, **options):
+        if options['students']:
+            # Fast hashes are upgraded on each student's first login, which the replay measures
+            call_command(
+                'seed_data', students=options['students'], clear=True, bulk=True, fast_hashing=True,
+                stdout=self.stdout
+            )
+
+        election = Election.objects.filter(is_active=True).first()
+        if not election:
+            raise CommandError('No active election; run seed_data first')
+
+        students = list(Student.objects.filter(is_active=True, programme__isnull=False).order_by('?'))
+        if options['voters']:
+            students = students[:options['voters']]
+        delegates = list(Delegate.objects.filter(is_approved=True).select_related('student'))
+        position_ids = list(Position.objects.values_list('id', flat=True))
+
+        self.recorder = Recorder()
+        self.workers = options['workers']
+        started = time.perf_counter()
+
+        self.set_phase(election, 'delegate_voting')
+        self.run_phase('Delegate voting', students, self.delegate_voter)
+
+        self.set_phase(election, 'main_voting')
+        self.run_phase('Main voting', [d.student for d in delegates], lambda s: self.main_voter(s, position_ids))
+
+        self.set_phase(election, 'results')
+        self.run_phase('Results', students, lambda s: self.results_poller(s, options['polls']))
+
+        self.report(time.perf_counter() - started)
+
+    def set_phase(self, election, phase):
+        now = timezone.now()
+        election.current_phase = phase
+        election.delegate_voting_start = min(election.delegate_voting_start, now - timedelta(minutes=1))
+        election.delegate_voting_end = max(election.delegate_voting_end, now + timedelta(hours=2))
+        election.main_voting_start = min(election.main_voting_start, now - timedelta(minutes=1))
+        election.main_voting_end = max(election.main_voting_end, now + timedelta(hours=2))
+        election.save()
+
+    def run_phase(self, label, students, session):
+        self.stdout.write(f'{label}: {len(students)} clients on {self.workers} workers...')
+        started = time.perf_counter()
+
+        def run(student):
+            try:
+                session(student)
+            finally:
+                close_old_connections()
+
+        with ThreadPoolExecutor(max_workers=self.workers) as pool:
+            list(pool.map(run, students))
+        self.stdout.write(f'{label} finished in {time.perf_counter() - started:.1f}s')
+
+    def login(self, student):
+        client = Client(raise_request_exception=False)
+        self.recorder.call('POST login', client.post, reverse('login'), {
+            'registration_number': student.registration_number,
+            'birth_certificate_number': student.birth_certificate_number,
+        })
+        return client
+
+    def delegate_voter(self, student):
+        client = self.login(student)
+        self.recorder.call('GET dashboard', client.get, reverse('dashboard'))
+        response = self.recorder.call('GET delegates', client.get, reverse('delegates'))
+        if response is not None and response.status_code == 200:
+            choices = response.json()['delegates']
+            if choices:
+                self.recorder.call(
+                    'POST vote_delegate', client.post, reverse('vote_delegate'),
+                    {'delegate_id': random.choice(choices)['id']}, content_type='application/json'
+                )
+        self.recorder.call('GET status', client.get, reverse('voting_status'))
+
+    def main_voter(self, student, position_ids):
+        client = self.login(student)
+        self.recorder.call('GET dashboard', client.get, reverse('dashboard'))
+        for position_id in position_ids:
+            response = self.recorder.call(
+                'GET candidates', client.get, reverse('candidates'), {'position_id': position_id}
+            )
+            if response is not None and response.status_code == 200:
+                choices = response.json()['candidates']
+                if choices:
+                    self.recorder.call(
+                        'POST vote_candidate', client.post, reverse('vote_candidate'),
+                        {'candidate_id': random.choice(choices)['id']}, content_type='application/json'
+                    )
+
+    def results_poller(self, student, polls):
+        client = self.login(student)
+        for _ in range(polls):
+            self.recorder.call('GET results', client.get, reverse('results'))
+
+    def report(self, elapsed):
+        header = f"{'endpoint':<20}{'requests':>10}{'errors':>8}{'req/s':>10}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}"
+        self.stdout.write('')
+        self.stdout.write(header)
+        self.stdout.write('-' * len(header))
+        total = 0
+        for endpoint in sorted(self.recorder.samples):
+            ordered = sorted(self.recorder.samples[endpoint])
+            total += len(ordered)
+            self.stdout.write(
+                f"{endpoint:<20}{len(ordered):>10}{self.recorder.errors[endpoint]:>8}"
+                f"{len(ordered) / elapsed:>10.1f}"
+                f"{percentile(ordered, 50) * 1000:>10.1f}"
+                f"{percentile(ordered, 95) * 1000:>10.1f}"
+                f"{percentile(ordered, 99) * 1000:>10.1f}"
+            )
+        errors = sum(self.recorder.errors.values())
+        self.stdout.write('-' * len(header))
+        style = self.style.SUCCESS if not errors else self.style.WARNING
+        self.stdout.write(style(
+            f'{total} requests in {elapsed:.1f}s ({total / elapsed:.1f} req/s), '
+            f'{errors} errors ({(errors / total * 100) if total else 0:.2f}%)'
+        ))
@@ -1,27 +1,47 @@
 # voting/middleware.py
+import logging
 from django.http import HttpResponseForbidden
 from django.conf import settings
+from django.core.cache import cache
 from django.utils.deprecation import MiddlewareMixin
+from . import allowlist
 from .utils import get_client_ip, create_audit_log
 
+security_logger = logging.getLogger('security')
+
 class VotingSecurityMiddleware(MiddlewareMixin):
     """Custom middleware for additional security checks"""
     
+    def __init__(self, get_response):
+        super().__init__(get_response)
+        # Compile the address lists at startup rather than on the first request
+        allowlist.allowed()
+        allowlist.trusted_proxies()
+    
     def process_request(self, request):
+        # Resolved once here and kept on request.client_ip for views, rate limits and audit entries
         ip_address = get_client_ip(request)
         
-        # If IP restrictions are enabled, check allowed IPs
-        allowed_ips = settings.VOTING_SETTINGS.get('ALLOWED_VOTING_IPS', [])
-        if allowed_ips and ip_address not in allowed_ips:
-            create_audit_log(
-                action_type='security_violation',
-                description=f"Access attempt from unauthorized IP: {ip_address}",
-                ip_address=ip_address,
-                success=False
-            )
+        # If IP restrictions are enabled, check allowed IPs and networks
+        allowed = allowlist.allowed()
+        if allowed and ip_address not in allowed:
+            self.log_rejection(request, ip_address)
             return HttpResponseForbidden("Access denied from this IP address")
         
-        # Add request info to request object for easy access
-        request.client_ip = ip_address
-        
         return None
+    
+    def log_rejection(self, request, ip_address):
+        """Audit the first rejection per address per interval; a scan must not flood the audit log"""
+        interval = settings.VOTING_SETTINGS.get('BLOCKED_IP_LOG_INTERVAL', 300)
+        if not cache.add(f"blocked_ip_logged_{ip_address}", True, interval):
+            return
+        security_logger.warning(f"Blocked request to {request.path} from unauthorized IP {ip_address}")
+        create_audit_log(
+            action_type='security_violation',
+            description=(
+                f"Access attempt from unauthorized IP: {ip_address} "
+                f"(further attempts from this address are not logged for {interval}s)"
+            ),
+            ip_address=ip_address,
+            success=False
+        )
@@ -0,0 +1,30 @@
+# Generated by Django 5.2.18 on 2026-10-17 19:57
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('voting', '0002_alter_student_first_name_alter_student_last_name_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DelegateResult',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('vote_count', models.IntegerField(default=0)),
+                ('percentage', models.DecimalField(decimal_places=2, default=0, max_digits=5)),
+                ('is_winner', models.BooleanField(default=False)),
+                ('last_updated', models.DateTimeField(auto_now=True)),
+                ('delegate', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='election_results', to='voting.delegate')),
+                ('election', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='cached_delegate_results', to='voting.election')),
+            ],
+            options={
+                'ordering': ['-vote_count'],
+                'unique_together': {('election', 'delegate')},
+            },
+        ),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 5.2.18 on 2026-10-17 20:00
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('voting', '0003_delegateresult'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='voteauditlog',
+            name='timestamp',
+            field=models.DateTimeField(default=django.utils.timezone.now),
+        ),
+    ]
@@ -0,0 +1,42 @@
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def copy_candidate_positions(apps, schema_editor):
+    MainVote = apps.get_model('voting', 'MainVote')
+    Candidate = apps.get_model('voting', 'Candidate')
+    for candidate_id, position_id in Candidate.objects.values_list('id', 'position_id'):
+        MainVote.objects.filter(candidate_id=candidate_id).update(position_id=position_id)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('voting', '0004_alter_voteauditlog_timestamp'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='mainvote',
+            name='position',
+            field=models.ForeignKey(null=True, on_delete=django.db.models.deletion.CASCADE, related_name='main_votes', to='voting.position'),
+        ),
+        migrations.RunPython(copy_candidate_positions, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='mainvote',
+            name='position',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='main_votes', to='voting.position'),
+        ),
+        migrations.RemoveConstraint(
+            model_name='mainvote',
+            name='unique_vote_per_candidate',
+        ),
+        migrations.RemoveConstraint(
+            model_name='mainvote',
+            name='unique_vote_per_position',
+        ),
+        migrations.AddConstraint(
+            model_name='mainvote',
+            constraint=models.UniqueConstraint(fields=('election', 'delegate', 'position'), name='unique_vote_per_position'),
+        ),
+    ]
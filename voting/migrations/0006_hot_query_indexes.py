@@ -0,0 +1,41 @@
+# Generated by Django 5.2.18 on 2026-10-17 20:03
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('voting', '0005_mainvote_position'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='candidate',
+            index=models.Index(condition=models.Q(('is_approved', True)), fields=['position'], name='candidate_approved_pos_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='delegate',
+            index=models.Index(condition=models.Q(('is_approved', True)), fields=['department'], name='delegate_approved_dept_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='delegatevote',
+            index=models.Index(fields=['election', 'delegate'], name='delegatevote_elec_deleg_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='mainvote',
+            index=models.Index(fields=['election', 'candidate'], name='mainvote_elec_cand_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='voteauditlog',
+            index=models.Index(fields=['-timestamp'], name='auditlog_timestamp_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='voteauditlog',
+            index=models.Index(fields=['action_type', '-timestamp'], name='auditlog_action_time_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='voteauditlog',
+            index=models.Index(condition=models.Q(('success', False)), fields=['-timestamp'], name='auditlog_failures_idx'),
+        ),
+    ]
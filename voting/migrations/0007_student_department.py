@@ -0,0 +1,29 @@
+# Generated by Django 5.2.18 on 2026-10-17 20:27
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import OuterRef, Subquery
+
+
+def copy_programme_departments(apps, schema_editor):
+    Student = apps.get_model('voting', 'Student')
+    Programme = apps.get_model('voting', 'Programme')
+    Student.objects.filter(programme__isnull=False).update(
+        department_id=Subquery(Programme.objects.filter(pk=OuterRef('programme_id')).values('department_id')[:1])
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('voting', '0006_hot_query_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='student',
+            name='department',
+            field=models.ForeignKey(blank=True, editable=False, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='students', to='voting.department'),
+        ),
+        migrations.RunPython(copy_programme_departments, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,32 @@
+# Generated by Django 5.2.18 on 2026-10-17 20:32
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('voting', '0007_student_department'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='VoterRoll',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('is_eligible', models.BooleanField(default=True)),
+                ('has_voted_for_delegate', models.BooleanField(default=False)),
+                ('main_votes_cast', models.PositiveSmallIntegerField(default=0)),
+                ('delegate', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='voter_roll_entries', to='voting.delegate')),
+                ('department', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='voter_roll_entries', to='voting.department')),
+                ('election', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='voter_roll', to='voting.election')),
+                ('student', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='voter_roll_entries', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['election', 'department'], name='voterroll_elec_dept_idx')],
+                'unique_together': {('election', 'student')},
+            },
+        ),
+    ]
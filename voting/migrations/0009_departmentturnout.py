@@ -0,0 +1,30 @@
+# Generated by Django 5.2.18 on 2026-10-17 20:35
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('voting', '0008_voterroll'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DepartmentTurnout',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('eligible', models.IntegerField(default=0)),
+                ('delegate_votes', models.IntegerField(default=0)),
+                ('main_votes', models.IntegerField(default=0)),
+                ('last_updated', models.DateTimeField(auto_now=True)),
+                ('department', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='turnout', to='voting.department')),
+                ('election', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='department_turnout', to='voting.election')),
+            ],
+            options={
+                'ordering': ['department__faculty__name', 'department__name'],
+                'unique_together': {('election', 'department')},
+            },
+        ),
+    ]
@@ -78,6 +78,8 @@ class Student(AbstractBaseUser, PermissionsMixin):
     email = models.EmailField(blank=True, null=True)
     phone_number = models.CharField(max_length=15, blank=True, null=True)
     programme = models.ForeignKey(Programme, on_delete=models.CASCADE, related_name='students',null=True, blank=True)
+    # Copy of programme.department, kept in sync by save() and the Programme post_save signal
+    department = models.ForeignKey(Department, on_delete=models.CASCADE, related_name='students', null=True, blank=True, editable=False)
     year_of_study = models.IntegerField(choices=[(1, '1st Year'), (2, '2nd Year'), (3, '3rd Year'), (4, '4th Year'), (5, '5th Year')],null=True, blank=True)
     is_active = models.BooleanField(default=True)
     is_staff = models.BooleanField(default=False)
@@ -99,13 +101,17 @@ class Student(AbstractBaseUser, PermissionsMixin):
     def full_name(self):
         return f"{self.first_name} {self.last_name}"
     
-    @property
-    def department(self):
-        return self.programme.department
-    
     @property
     def faculty(self):
-        return self.programme.department.faculty
+        return self.department.faculty
+    
+    def save(self, *args, **kwargs):
+        update_fields = kwargs.get('update_fields')
+        if update_fields is None or 'programme' in update_fields:
+            self.department_id = self.programme.department_id if self.programme_id else None
+            if update_fields is not None:
+                kwargs['update_fields'] = {*update_fields, 'department'}
+        super().save(*args, **kwargs)
 
 class Party(models.Model):
     name = models.CharField(max_length=200, unique=True)
@@ -155,6 +161,9 @@ class Candidate(models.Model):
     
     class Meta:
         unique_together = ['party', 'position']  # One candidate per position per party
+        indexes = [
+            models.Index(fields=['position'], condition=models.Q(is_approved=True), name='candidate_approved_pos_idx'),
+        ]
     
     def __str__(self):
         return f"{self.student.full_name} - {self.position.name} ({self.party.acronym})"
@@ -168,10 +177,13 @@ class Delegate(models.Model):
     
     class Meta:
         unique_together = ['student', 'department']  # Student can only be delegate in their department
+        indexes = [
+            models.Index(fields=['department'], condition=models.Q(is_approved=True), name='delegate_approved_dept_idx'),
+        ]
     
     def clean(self):
         # Ensure delegate belongs to the correct department
-        if self.student.department != self.department:
+        if self.student.department_id != self.department_id:
             raise ValidationError("Delegate must belong to their own department")
         
         # Check party delegate limit per department (max 2 per department)
@@ -239,10 +251,13 @@ class DelegateVote(models.Model):
     
     class Meta:
         unique_together = ['election', 'voter']  # One vote per student per election
+        indexes = [
+            models.Index(fields=['election', 'delegate'], name='delegatevote_elec_deleg_idx'),
+        ]
     
     def clean(self):
         # Ensure voter is from same department as delegate
-        if self.voter.department != self.delegate.department:
+        if self.voter.department_id != self.delegate.department_id:
             raise ValidationError("Can only vote for delegates in your own department")
     
     def save(self, *args, **kwargs):
@@ -256,21 +271,27 @@ class MainVote(models.Model):
     election = models.ForeignKey(Election, on_delete=models.CASCADE, related_name='main_votes')
     delegate = models.ForeignKey(Delegate, on_delete=models.CASCADE, related_name='main_votes_cast')
     candidate = models.ForeignKey(Candidate, on_delete=models.CASCADE, related_name='votes_received')
+    # Copied from candidate.position so the database can enforce one vote per position
+    position = models.ForeignKey(Position, on_delete=models.CASCADE, related_name='main_votes')
     vote_time = models.DateTimeField(auto_now_add=True)
     voter_ip = models.GenericIPAddressField()
 
     class Meta:
         constraints = [
             UniqueConstraint(
-                fields=['election', 'delegate', 'candidate'],
-                name='unique_vote_per_candidate'
-            ),
-            UniqueConstraint(
-                fields=['election', 'delegate', 'candidate'],
-                condition=models.Q(),  # Add condition if needed
+                fields=['election', 'delegate', 'position'],
                 name='unique_vote_per_position'
             ),
         ]
+        indexes = [
+            models.Index(fields=['election', 'candidate'], name='mainvote_elec_cand_idx'),
+        ]
+    
+    def save(self, *args, **kwargs):
+        if self.position_id is None:
+            self.position_id = self.candidate.position_id
+        super().save(*args, **kwargs)
+
 class VoteAuditLog(models.Model):
     """Audit trail for all voting activities"""
     ACTION_TYPES = [
@@ -286,10 +307,16 @@ class VoteAuditLog(models.Model):
     ip_address = models.GenericIPAddressField()
     user_agent = models.TextField(blank=True)
     success = models.BooleanField(default=True)
-    timestamp = models.DateTimeField(auto_now_add=True)
+    # Stamped when the event happens, not when the batched writer inserts it
+    timestamp = models.DateTimeField(default=timezone.now)
     
     class Meta:
         ordering = ['-timestamp']
+        indexes = [
+            models.Index(fields=['-timestamp'], name='auditlog_timestamp_idx'),
+            models.Index(fields=['action_type', '-timestamp'], name='auditlog_action_time_idx'),
+            models.Index(fields=['-timestamp'], condition=models.Q(success=False), name='auditlog_failures_idx'),
+        ]
     
     def __str__(self):
         return f"{self.get_action_type_display()} - {self.timestamp}"
@@ -308,4 +335,69 @@ class ElectionResult(models.Model):
         ordering = ['-vote_count']
     
     def __str__(self):
-        return f"{self.candidate} - {self.vote_count} votes ({self.percentage}%)"
\ No newline at end of file
+        return f"{self.candidate} - {self.vote_count} votes ({self.percentage}%)"
+
+
+class DelegateResult(models.Model):
+    """Cache delegate election results for performance"""
+    election = models.ForeignKey(Election, on_delete=models.CASCADE, related_name='cached_delegate_results')
+    delegate = models.ForeignKey(Delegate, on_delete=models.CASCADE, related_name='election_results')
+    vote_count = models.IntegerField(default=0)
+    percentage = models.DecimalField(max_digits=5, decimal_places=2, default=0)
+    is_winner = models.BooleanField(default=False)
+    last_updated = models.DateTimeField(auto_now=True)
+    
+    class Meta:
+        unique_together = ['election', 'delegate']
+        ordering = ['-vote_count']
+    
+    def __str__(self):
+        return f"{self.delegate} - {self.vote_count} votes ({self.percentage}%)"
+
+class VoterRoll(models.Model):
+    """Per-election eligibility and voting status, one row per student
+
+    Built in bulk when an election opens and updated in the vote
+    transaction, so status checks and turnout never count the vote tables.
+    """
+    election = models.ForeignKey(Election, on_delete=models.CASCADE, related_name='voter_roll')
+    student = models.ForeignKey(Student, on_delete=models.CASCADE, related_name='voter_roll_entries')
+    department = models.ForeignKey(Department, on_delete=models.CASCADE, related_name='voter_roll_entries', null=True, blank=True)
+    # Set only for approved delegates
+    delegate = models.ForeignKey(Delegate, on_delete=models.SET_NULL, related_name='voter_roll_entries', null=True, blank=True)
+    is_eligible = models.BooleanField(default=True)
+    has_voted_for_delegate = models.BooleanField(default=False)
+    main_votes_cast = models.PositiveSmallIntegerField(default=0)
+    
+    class Meta:
+        unique_together = ['election', 'student']
+        indexes = [
+            models.Index(fields=['election', 'department'], name='voterroll_elec_dept_idx'),
+        ]
+    
+    def __str__(self):
+        return f"{self.student.registration_number} - {self.election.name}"
+
+class DepartmentTurnout(models.Model):
+    """Persisted copy of the live per-department turnout counters
+
+    The counters live in the cache; run_scheduler writes them here
+    periodically and they are read back if the cache is lost.
+    """
+    election = models.ForeignKey(Election, on_delete=models.CASCADE, related_name='department_turnout')
+    department = models.ForeignKey(Department, on_delete=models.CASCADE, related_name='turnout')
+    eligible = models.IntegerField(default=0)
+    delegate_votes = models.IntegerField(default=0)
+    main_votes = models.IntegerField(default=0)
+    last_updated = models.DateTimeField(auto_now=True)
+    
+    class Meta:
+        unique_together = ['election', 'department']
+        ordering = ['department__faculty__name', 'department__name']
+    
+    @property
+    def percentage(self):
+        return round(self.delegate_votes * 100 / self.eligible, 2) if self.eligible else 0
+    
+    def __str__(self):
+        return f"{self.department.name} - {self.delegate_votes}/{self.eligible} voted"
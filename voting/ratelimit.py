@@ -0,0 +1,145 @@
+# voting/ratelimit.py
+import logging
+import time
+from functools import wraps
+from asgiref.sync import iscoroutinefunction
+from django.conf import settings
+from django.core.cache import cache
+from django.http import JsonResponse
+
+from .utils import get_client_ip
+
+security_logger = logging.getLogger('security')
+
+
+class SlidingWindow:
+    """Sliding-window counter built from two fixed windows in the shared cache
+
+    The estimate is the current window's count plus the previous window's
+    count weighted by how much of it still overlaps the sliding window.
+    Increments use cache.add and cache.incr, which are atomic on LocMem,
+    Memcached and Redis, so concurrent hits are never lost.
+    """
+
+    def __init__(self, scope, limit, window):
+        self.scope = scope
+        self.limit = limit
+        self.window = window
+
+    def _keys(self, ident, now):
+        index = int(now // self.window)
+        weight = 1 - (now % self.window) / self.window
+        prefix = f"ratelimit_{self.scope}_{ident}"
+        return f"{prefix}_{index}", f"{prefix}_{index - 1}", weight
+
+    def count(self, ident):
+        """Current estimate without recording a hit"""
+        current, previous, weight = self._keys(ident, time.time())
+        counts = cache.get_many([current, previous])
+        return counts.get(current, 0) + counts.get(previous, 0) * weight
+
+    def exceeded(self, ident):
+        return self.count(ident) >= self.limit
+
+    def hit(self, ident):
+        """Record a hit and return the estimate including it"""
+        current, previous, weight = self._keys(ident, time.time())
+        # A window's key is read until the end of the next window
+        cache.add(current, 0, self.window * 2)
+        try:
+            count = cache.incr(current)
+        except ValueError:
+            # Evicted between add and incr
+            cache.set(current, 1, self.window * 2)
+            count = 1
+        return count + cache.get(previous, 0) * weight
+
+    async def ahit(self, ident):
+        """hit() for async views"""
+        current, previous, weight = self._keys(ident, time.time())
+        await cache.aadd(current, 0, self.window * 2)
+        try:
+            count = await cache.aincr(current)
+        except ValueError:
+            await cache.aset(current, 1, self.window * 2)
+            count = 1
+        return count + (await cache.aget(previous, 0)) * weight
+
+    def release(self, ident):
+        """Take back a hit that turned out not to count, e.g. an attempt that was refused or succeeded"""
+        current, _, _ = self._keys(ident, time.time())
+        try:
+            if cache.decr(current) < 0:
+                cache.set(current, 0, self.window * 2)
+        except ValueError:
+            # Expired or evicted; there is nothing left to take back
+            pass
+
+    def reset(self, ident):
+        current, previous, _ = self._keys(ident, time.time())
+        cache.delete_many([current, previous])
+
+
+def limiter(scope, setting):
+    """SlidingWindow configured from VOTING_SETTINGS[setting] = (limit, window seconds)"""
+    limit, window = settings.VOTING_SETTINGS[setting]
+    return SlidingWindow(scope, limit, window)
+
+
+def login_limiters():
+    """Failed-login limiters keyed by client IP and by registration number
+
+    The IP limit is generous because a whole campus can share one NAT
+    address; the registration number limit is what protects an account.
+    """
+    options = settings.VOTING_SETTINGS
+    lockout = options['LOGIN_LOCKOUT_TIME']
+    return (
+        SlidingWindow('login_ip', options.get('LOGIN_IP_MAX_ATTEMPTS', 500), lockout),
+        SlidingWindow('login_student', options['MAX_LOGIN_ATTEMPTS'], lockout),
+    )
+
+
+def _rejection(scope, ident, window):
+    security_logger.warning(f"Rate limit {scope} exceeded by {ident}")
+    response = JsonResponse(
+        {'success': False, 'message': 'Too many requests. Please slow down.'},
+        status=429
+    )
+    response['Retry-After'] = str(window.window)
+    return response
+
+
+def rate_limited(scope, setting, key=None):
+    """Reject a view with 429 once a student exceeds VOTING_SETTINGS[setting]
+
+    Requests are keyed by the logged-in student, or by client IP when
+    anonymous, unless a key function is given. Works on sync and async views.
+    """
+    def identify(request, user):
+        if key is not None:
+            return key(request)
+        if user.is_authenticated:
+            return f"user{user.pk}"
+        return get_client_ip(request)
+
+    def decorator(view_func):
+        if iscoroutinefunction(view_func):
+            @wraps(view_func)
+            async def async_wrapper(request, *args, **kwargs):
+                ident = identify(request, await request.auser())
+                window = limiter(scope, setting)
+                if await window.ahit(ident) > window.limit:
+                    return _rejection(scope, ident, window)
+                return await view_func(request, *args, **kwargs)
+            return async_wrapper
+
+        @wraps(view_func)
+        def wrapper(request, *args, **kwargs):
+            ident = identify(request, request.user)
+            window = limiter(scope, setting)
+            if window.hit(ident) > window.limit:
+                return _rejection(scope, ident, window)
+            return view_func(request, *args, **kwargs)
+        return wrapper
+    return decorator
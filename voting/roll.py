@@ -0,0 +1,148 @@
+# voting/roll.py
+import logging
+from collections import defaultdict
+from asgiref.sync import sync_to_async
+from django.db.models import Count, F, Q
+
+from .models import Delegate, DelegateVote, MainVote, Student, VoterRoll
+
+logger = logging.getLogger('voting')
+
+BATCH_SIZE = 2000
+
+
+def _eligible(is_active, department_id):
+    # Add further eligibility rules here, e.g. fees cleared or academic standing
+    return bool(is_active and department_id)
+
+
+def build(election, batch_size=BATCH_SIZE):
+    """Create or refresh every student's roll entry for an election in bulk
+
+    Safe to repeat: voting status is recomputed from the vote tables, so a
+    roll built after voting started is still correct.
+    """
+    delegates = dict(Delegate.objects.filter(is_approved=True).values_list('student_id', 'id'))
+    voted = set(DelegateVote.objects.filter(election=election).values_list('voter_id', flat=True))
+    main_votes = dict(
+        MainVote.objects.filter(election=election)
+        .values('delegate__student_id')
+        .annotate(count=Count('id'))
+        .values_list('delegate__student_id', 'count')
+    )
+
+    students = (
+        Student.objects.filter(is_staff=False)
+        .order_by('id')
+        .values_list('id', 'department_id', 'is_active')
+        .iterator(chunk_size=batch_size)
+    )
+    batch, total = [], 0
+    for student_id, department_id, is_active in students:
+        batch.append(VoterRoll(
+            election=election,
+            student_id=student_id,
+            department_id=department_id,
+            delegate_id=delegates.get(student_id),
+            is_eligible=_eligible(is_active, department_id),
+            has_voted_for_delegate=student_id in voted,
+            main_votes_cast=main_votes.get(student_id, 0),
+        ))
+        if len(batch) >= batch_size:
+            total += _write(batch)
+            batch = []
+    if batch:
+        total += _write(batch)
+    logger.info(f"Built the voter roll for {election.name}: {total} students")
+    return total
+
+
+def _write(entries):
+    VoterRoll.objects.bulk_create(
+        entries,
+        update_conflicts=True,
+        unique_fields=['election', 'student'],
+        update_fields=['department', 'delegate', 'is_eligible', 'has_voted_for_delegate', 'main_votes_cast'],
+    )
+    return len(entries)
+
+
+def entry(election, student):
+    """A student's roll entry; students registered after the roll was built are added on first use"""
+    try:
+        return VoterRoll.objects.get(election=election, student=student)
+    except VoterRoll.DoesNotExist:
+        pass
+    delegate_id = Delegate.objects.filter(student=student, is_approved=True).values_list('id', flat=True).first()
+    roll_entry, _ = VoterRoll.objects.get_or_create(
+        election=election,
+        student=student,
+        defaults={
+            'department_id': student.department_id,
+            'delegate_id': delegate_id,
+            'is_eligible': _eligible(student.is_active, student.department_id),
+            'has_voted_for_delegate': DelegateVote.objects.filter(election=election, voter=student).exists(),
+            'main_votes_cast': MainVote.objects.filter(election=election, delegate_id=delegate_id).count() if delegate_id else 0,
+        }
+    )
+    return roll_entry
+
+
+async def aentry(election, student):
+    """entry() for async views"""
+    try:
+        return await VoterRoll.objects.aget(election=election, student=student)
+    except VoterRoll.DoesNotExist:
+        return await sync_to_async(entry)(election, student)
+
+
+def record_delegate_vote(election, student):
+    """Mark a delegate vote on the roll; call inside the transaction that saves the vote"""
+    if not VoterRoll.objects.filter(election=election, student=student).update(has_voted_for_delegate=True):
+        # A new entry reads the vote just saved
+        entry(election, student)
+
+
+def record_main_votes(election, student, count=1):
+    """Add main votes to the roll; call inside the transaction that saves them"""
+    if not VoterRoll.objects.filter(election=election, student=student).update(
+        main_votes_cast=F('main_votes_cast') + count
+    ):
+        entry(election, student)
+
+
+def turnout(election):
+    """Eligible students and how many have voted, read from the roll alone"""
+    return VoterRoll.objects.filter(election=election).aggregate(
+        eligible=Count('id', filter=Q(is_eligible=True)),
+        voted=Count('id', filter=Q(is_eligible=True, has_voted_for_delegate=True)),
+        delegates=Count('id', filter=Q(delegate__isnull=False)),
+        delegates_voted=Count('id', filter=Q(delegate__isnull=False, main_votes_cast__gt=0)),
+    )
+
+
+def sync_student(student):
+    """Carry a student's department and eligibility onto their roll entries"""
+    VoterRoll.objects.filter(student=student, election__is_active=True).update(
+        department_id=student.department_id,
+        is_eligible=_eligible(student.is_active, student.department_id),
+    )
+
+
+def sync_students(students):
+    """sync_student for many students at once, e.g. after a bulk upsert that skipped the signals"""
+    groups = defaultdict(list)
+    for student_id, department_id, is_active in students.values_list('id', 'department_id', 'is_active'):
+        groups[(department_id, _eligible(is_active, department_id))].append(student_id)
+    for (department_id, is_eligible), student_ids in groups.items():
+        VoterRoll.objects.filter(student_id__in=student_ids, election__is_active=True).update(
+            department_id=department_id,
+            is_eligible=is_eligible,
+        )
+
+
+def sync_delegate(delegate):
+    """Point the student's roll entries at their delegate profile while it is approved"""
+    VoterRoll.objects.filter(student_id=delegate.student_id, election__is_active=True).update(
+        delegate_id=delegate.id if delegate.is_approved else None
+    )
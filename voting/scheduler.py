@@ -0,0 +1,145 @@
+# voting/scheduler.py
+import logging
+from django.conf import settings
+from django.core.cache import cache
+from django.db import router
+from django.db.models.signals import post_save
+from django.utils import timezone
+
+from . import ballots, live, roll, tally, turnout
+from .models import Election
+
+logger = logging.getLogger('voting')
+
+PHASE_ORDER = [phase for phase, _ in Election.ELECTION_PHASES]
+
+
+def _lead():
+    return settings.VOTING_SETTINGS.get('PHASE_WARM_LEAD', 300)
+
+
+def due_phase(election, now):
+    """The phase an election's schedule puts it in at now; 'closed' is only ever set by hand"""
+    if now >= election.main_voting_end:
+        return 'results'
+    if now >= election.main_voting_start:
+        return 'main_voting'
+    if now >= election.delegate_voting_start:
+        return 'delegate_voting'
+    return 'registration'
+
+
+def boundaries(election):
+    """(moment, phase it starts) for every scheduled transition, in order"""
+    return [
+        (election.delegate_voting_start, 'delegate_voting'),
+        (election.main_voting_start, 'main_voting'),
+        (election.main_voting_end, 'results'),
+    ]
+
+
+def next_boundary(election, now):
+    """The next scheduled transition after now, or None"""
+    return next(((moment, phase) for moment, phase in boundaries(election) if moment > now), None)
+
+
+def warm(election, phase):
+    """Fill the caches the phase's first requests will need"""
+    if phase == 'delegate_voting':
+        built = ballots.build_department_ballots()
+        students = roll.build(election)
+        return f'warmed {len(built)} department ballots and a voter roll of {students} students'
+    if phase == 'main_voting':
+        built = ballots.build_candidate_ballots(election.id)
+        return f'warmed {len(built)} candidate ballots'
+    # Results can only be counted once voting has closed; see close_voting
+    return None
+
+
+def _warm_once(election, phase):
+    """Warm a phase at most once per lead window, however often the scheduler ticks"""
+    if not cache.add(f"phase_warmed_{election.id}_{phase}", True, _lead() * 2):
+        return None
+    return warm(election, phase)
+
+
+def advance(election, phase):
+    """Move an election forward to phase; returns False if it was already moved or moved past it"""
+    if PHASE_ORDER.index(phase) <= PHASE_ORDER.index(election.current_phase):
+        return False
+    # Compare-and-set, so two schedulers never both run a transition
+    moved = Election.objects.filter(pk=election.pk, current_phase=election.current_phase).update(current_phase=phase)
+    if not moved:
+        return False
+    previous, election.current_phase = election.current_phase, phase
+    # tick() warms and recounts itself, so the phase receivers have nothing to do
+    election._previous_phase = phase
+    # update() skips post_save; send it so the election cache and ballot receivers see the move
+    post_save.send(
+        sender=Election, instance=election, created=False, raw=False,
+        using=router.db_for_write(Election, instance=election), update_fields=frozenset({'current_phase'}),
+    )
+    cache.delete(live.SNAPSHOT_CACHE_KEY)
+    logger.info(f"Scheduler moved {election.name} from {previous} to {phase}")
+    return True
+
+
+def persist_turnout(election):
+    """Copy the turnout counters to the database at most once per TURNOUT_PERSIST_INTERVAL"""
+    interval = settings.VOTING_SETTINGS.get('TURNOUT_PERSIST_INTERVAL', 60)
+    if not cache.add(f"turnout_persisted_{election.id}", True, interval):
+        return False
+    turnout.persist(election)
+    return True
+
+
+def close_voting(election):
+    """Final recount when main voting ends, so the results page never rebuilds under load"""
+    tally.rebuild_results(election)
+    turnout.reconcile(election)
+
+
+def tick(now=None):
+    """Warm upcoming phases and apply due transitions for every active election
+
+    Returns a list of (election, message) describing what was done.
+    """
+    now = now or timezone.now()
+    lead = _lead()
+    actions = []
+    for election in Election.objects.filter(is_active=True):
+        upcoming = next_boundary(election, now)
+        if upcoming is not None and (upcoming[0] - now).total_seconds() <= lead:
+            message = _warm_once(election, upcoming[1])
+            if message:
+                actions.append((election, f'{message} ahead of {upcoming[1]}'))
+
+        if election.current_phase in ('delegate_voting', 'main_voting'):
+            persist_turnout(election)
+
+        phase = due_phase(election, now)
+        if PHASE_ORDER.index(phase) <= PHASE_ORDER.index(election.current_phase):
+            continue
+        # Make sure the caches are warm before the phase opens, e.g. if the scheduler started late
+        message = _warm_once(election, phase)
+        if message:
+            actions.append((election, message))
+        if advance(election, phase):
+            if phase == 'results':
+                close_voting(election)
+            actions.append((election, f'moved to {phase}'))
+    return actions
+
+
+def seconds_until_next(now=None):
+    """Seconds until the next warm-up or transition of any active election, or None"""
+    now = now or timezone.now()
+    lead = _lead()
+    moments = []
+    for election in Election.objects.filter(is_active=True):
+        upcoming = next_boundary(election, now)
+        if upcoming is not None:
+            moments.append((upcoming[0] - now).total_seconds())
+            if moments[-1] > lead:
+                moments.append(moments[-1] - lead)
+    return min(moments) if moments else None
@@ -0,0 +1,104 @@
+# voting/signals.py
+from django.db.models.signals import pre_save, post_save, post_delete
+from django.dispatch import receiver
+
+from .models import Election, Candidate, Delegate, Party, Position, Programme, Student
+from . import ballots, election_cache, roll, tally
+
+# Saves that happen on every login and never change what a ballot shows
+LOGIN_FIELDS = {'last_login', 'last_login_ip', 'password'}
+
+
+@receiver(pre_save, sender=Election)
+def election_phase_before(sender, instance, **kwargs):
+    instance._previous_phase = (
+        Election.objects.filter(pk=instance.pk).values_list('current_phase', flat=True).first()
+        if instance.pk else None
+    )
+
+
+@receiver([post_save, post_delete], sender=Election)
+def election_changed(sender, instance, **kwargs):
+    election_cache.invalidate()
+
+
+@receiver(post_save, sender=Election)
+def count_results(sender, instance, **kwargs):
+    # Recount once as results open, so the results page only ever reads the tallies
+    previous = getattr(instance, '_previous_phase', instance.current_phase)
+    if instance.current_phase in ('results', 'closed') and previous not in ('results', 'closed'):
+        tally.rebuild_results(instance)
+
+
+@receiver(post_save, sender=Election)
+def warm_candidate_ballots(sender, instance, **kwargs):
+    # Candidates are frozen once main voting opens; build their ballots before delegates arrive,
+    # once as the phase opens rather than on every later save
+    previous = getattr(instance, '_previous_phase', instance.current_phase)
+    if instance.is_active and instance.current_phase == 'main_voting' and previous != 'main_voting':
+        ballots.build_candidate_ballots(instance.id)
+
+
+@receiver(pre_save, sender=Delegate)
+def delegate_moving(sender, instance, **kwargs):
+    if instance.pk:
+        previous = Delegate.objects.filter(pk=instance.pk).values_list('department_id', flat=True).first()
+        if previous and previous != instance.department_id:
+            ballots.invalidate_department(previous)
+
+
+@receiver([post_save, post_delete], sender=Delegate)
+def delegate_changed(sender, instance, **kwargs):
+    ballots.invalidate_department(instance.department_id)
+
+
+@receiver(post_save, sender=Delegate)
+def delegate_roll_changed(sender, instance, **kwargs):
+    roll.sync_delegate(instance)
+
+
+@receiver([post_save, post_delete], sender=Party)
+def party_changed(sender, instance, **kwargs):
+    ballots.invalidate_delegates()
+    ballots.invalidate_candidates()
+
+
+@receiver([post_save, post_delete], sender=Candidate)
+@receiver([post_save, post_delete], sender=Position)
+def candidate_ballot_changed(sender, instance, **kwargs):
+    ballots.invalidate_candidates()
+
+
+@receiver(post_save, sender=Student)
+def student_changed(sender, instance, created, update_fields=None, **kwargs):
+    if created or (update_fields and set(update_fields) <= LOGIN_FIELDS):
+        return
+    roll.sync_student(instance)
+    department_id = Delegate.objects.filter(student_id=instance.pk).values_list('department_id', flat=True).first()
+    if department_id:
+        ballots.invalidate_department(department_id)
+    if Candidate.objects.filter(student_id=instance.pk).exists():
+        ballots.invalidate_candidates()
+
+
+@receiver(post_save, sender=Programme)
+def programme_moved(sender, instance, created, **kwargs):
+    # Keep the students' copy of their department in step with the programme
+    if created:
+        return
+    moved = dict(
+        Student.objects.filter(programme=instance).exclude(department_id=instance.department_id)
+        .values_list('id', 'department_id')
+    )
+    if not moved:
+        return
+    students = Student.objects.filter(id__in=moved)
+    # update() skips student_changed, so do its work for the whole programme here
+    students.update(department_id=instance.department_id)
+    roll.sync_students(students)
+    departments = {instance.department_id, *moved.values()}
+    departments.update(Delegate.objects.filter(student_id__in=moved).values_list('department_id', flat=True))
+    for department_id in departments - {None}:
+        ballots.invalidate_department(department_id)
+    if Candidate.objects.filter(student_id__in=moved).exists():
+        ballots.invalidate_candidates()
@@ -0,0 +1,252 @@
+# voting/tally.py
+import logging
+from collections import defaultdict
+from datetime import timedelta
+from decimal import Decimal
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, FilteredRelation, Min, Q
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from .models import (
+    Candidate, Delegate, DelegateVote, MainVote, ElectionResult, DelegateResult
+)
+
+logger = logging.getLogger('voting')
+
+
+def _increment(model, **lookup):
+    """Add one vote to a tally row, creating the row on first use"""
+    rows = model.objects.filter(**lookup)
+    if rows.update(vote_count=F('vote_count') + 1, last_updated=timezone.now()):
+        return
+    try:
+        with transaction.atomic():
+            model.objects.create(vote_count=1, **lookup)
+    except IntegrityError:
+        # A concurrent vote created the row between our update and insert
+        rows.update(vote_count=F('vote_count') + 1, last_updated=timezone.now())
+
+
+def record_delegate_vote(election, delegate):
+    """Count a delegate vote; call inside the transaction that saves the vote"""
+    _increment(DelegateResult, election=election, delegate=delegate)
+
+
+def record_main_vote(election, candidate):
+    """Count a main vote; call inside the transaction that saves the vote"""
+    _increment(ElectionResult, election=election, candidate=candidate)
+
+
+def record_main_votes(election, candidates):
+    """Count one main vote for each of several candidates; call inside the transaction that saves them"""
+    # Make sure every row exists, then add the votes with one update
+    ElectionResult.objects.bulk_create(
+        [ElectionResult(election=election, candidate=candidate, vote_count=0) for candidate in candidates],
+        ignore_conflicts=True
+    )
+    ElectionResult.objects.filter(election=election, candidate__in=candidates).update(
+        vote_count=F('vote_count') + 1, last_updated=timezone.now()
+    )
+
+
+def _percentage(count, total):
+    if not total:
+        return Decimal('0.00')
+    return (Decimal(count) * 100 / total).quantize(Decimal('0.01'))
+
+
+def _write_tally(model, field, election, groups, scope_lookup=None, scope=None):
+    """Upsert one tally row per contestant and drop rows for withdrawn ones
+
+    With a scope, only rows whose scope_lookup is in it are considered stale.
+    """
+    now = timezone.now()
+    rows = []
+    for contestants in groups.values():
+        total = sum(count for _, count in contestants)
+        top = max((count for _, count in contestants), default=0)
+        for contestant_id, count in contestants:
+            rows.append(model(
+                election=election,
+                vote_count=count,
+                percentage=_percentage(count, total),
+                is_winner=top > 0 and count == top,
+                last_updated=now,
+                **{f'{field}_id': contestant_id}
+            ))
+
+    model.objects.bulk_create(
+        rows,
+        batch_size=500,
+        update_conflicts=True,
+        unique_fields=['election', field],
+        update_fields=['vote_count', 'percentage', 'is_winner', 'last_updated'],
+    )
+    stale = model.objects.filter(election=election)
+    if scope is not None:
+        stale = stale.filter(**{f'{scope_lookup}__in': scope})
+    stale.exclude(
+        **{f'{field}_id__in': [getattr(row, f'{field}_id') for row in rows]}
+    ).delete()
+    return len(rows)
+
+
+def position_counts(election, position_ids=None):
+    """{position_id: [(candidate_id, votes), ...]} from one grouped aggregate over MainVote"""
+    votes = MainVote.objects.filter(election=election)
+    candidates = Candidate.objects.filter(is_approved=True)
+    if position_ids is not None:
+        votes = votes.filter(position_id__in=position_ids)
+        candidates = candidates.filter(position_id__in=position_ids)
+
+    candidate_votes = dict(votes.values_list('candidate').annotate(total=Count('id')))
+    by_position = defaultdict(list)
+    for candidate_id, position_id in candidates.values_list('id', 'position_id'):
+        by_position[position_id].append((candidate_id, candidate_votes.get(candidate_id, 0)))
+    return by_position
+
+
+def department_counts(election, department_ids=None):
+    """{department_id: [(delegate_id, votes), ...]} from one grouped aggregate over DelegateVote"""
+    votes = DelegateVote.objects.filter(election=election)
+    delegates = Delegate.objects.filter(is_approved=True)
+    if department_ids is not None:
+        votes = votes.filter(delegate__department_id__in=department_ids)
+        delegates = delegates.filter(department_id__in=department_ids)
+
+    delegate_votes = dict(votes.values_list('delegate').annotate(total=Count('id')))
+    by_department = defaultdict(list)
+    for delegate_id, department_id in delegates.values_list('id', 'department_id'):
+        by_department[department_id].append((delegate_id, delegate_votes.get(delegate_id, 0)))
+    return by_department
+
+
+def recount_positions(election, position_ids=None, counts=None):
+    """Write candidate tallies for every position or only those given
+
+    Counts are absolute, so a recount can be repeated at any time. Pass
+    counts already read with position_counts to skip the aggregate.
+    """
+    if counts is None:
+        counts = position_counts(election, position_ids)
+    return _write_tally(ElectionResult, 'candidate', election, counts, 'candidate__position_id', position_ids)
+
+
+def recount_departments(election, department_ids=None, counts=None):
+    """Write delegate tallies for every department or only those given"""
+    if counts is None:
+        counts = department_counts(election, department_ids)
+    return _write_tally(DelegateResult, 'delegate', election, counts, 'delegate__department_id', department_ids)
+
+
+@transaction.atomic
+def rebuild_results(election):
+    """Recount every tally for an election from the vote tables"""
+    candidates = recount_positions(election)
+    delegates = recount_departments(election)
+    logger.info(f"Rebuilt results for {election.name}: {candidates} candidates, {delegates} delegates")
+    return candidates, delegates
+
+
+def _watermark(model, election):
+    """Oldest last_updated of an election's tally rows; every vote before it is counted"""
+    return model.objects.filter(election=election).aggregate(oldest=Min('last_updated'))['oldest']
+
+
+def _margin():
+    # Votes are stamped before their transaction commits, so look back past the slowest commit
+    return timedelta(seconds=settings.VOTING_SETTINGS.get('VOTE_COMMIT_TIMEOUT', 10))
+
+
+def stale_positions(election):
+    """Positions with votes newer than the candidate tally watermark, or None when never tallied"""
+    watermark = _watermark(ElectionResult, election)
+    if watermark is None:
+        return None
+    changed = set(
+        MainVote.objects.filter(election=election, vote_time__gt=watermark - _margin())
+        .values_list('position_id', flat=True).distinct()
+    )
+    # Newly approved candidates have no tally row yet
+    changed.update(
+        Candidate.objects.filter(is_approved=True)
+        .exclude(election_results__election=election)
+        .values_list('position_id', flat=True)
+    )
+    return changed
+
+
+def stale_departments(election):
+    """Departments with votes newer than the delegate tally watermark, or None when never tallied"""
+    watermark = _watermark(DelegateResult, election)
+    if watermark is None:
+        return None
+    changed = set(
+        DelegateVote.objects.filter(election=election, vote_time__gt=watermark - _margin())
+        .values_list('delegate__department_id', flat=True).distinct()
+    )
+    changed.update(
+        Delegate.objects.filter(is_approved=True)
+        .exclude(election_results__election=election)
+        .values_list('department_id', flat=True)
+    )
+    return changed
+
+
+def advance_watermark(election, started):
+    """Mark every tally row as current up to the start of a completed recount"""
+    for model in (ElectionResult, DelegateResult):
+        model.objects.filter(election=election, last_updated__lt=started).update(last_updated=started)
+
+
+def _with_live_percentages(contestants):
+    total = sum(contestant.vote_count for contestant in contestants)
+    for contestant in contestants:
+        contestant.percentage = (contestant.vote_count / total) * 100 if total else 0
+    return {'total_votes': total}
+
+
+def _with_tallies(contestants, election):
+    """Annotate contestants with their tally row's vote_count, 0 when they have none yet"""
+    return contestants.annotate(
+        tally=FilteredRelation('election_results', condition=Q(election_results__election=election)),
+        vote_count=Coalesce(F('tally__vote_count'), 0),
+    ).order_by('-vote_count', 'id')
+
+
+def candidate_results(election, positions):
+    """Group approved candidates by position with their tallies, ordered by votes"""
+    candidates = _with_tallies(
+        Candidate.objects.filter(is_approved=True).select_related('student', 'party'), election
+    )
+
+    by_position = defaultdict(list)
+    for candidate in candidates:
+        by_position[candidate.position_id].append(candidate)
+
+    results = {}
+    for position in positions:
+        candidates = by_position.get(position.id, [])
+        results[position] = {'candidates': candidates, **_with_live_percentages(candidates)}
+    return results
+
+
+def delegate_results(election, departments):
+    """Group approved delegates by department with their tallies, ordered by votes"""
+    departments = list(departments)
+    delegates = _with_tallies(
+        Delegate.objects.filter(is_approved=True, department__in=departments).select_related('student', 'party'),
+        election
+    )
+
+    by_department = defaultdict(list)
+    for delegate in delegates:
+        by_department[delegate.department_id].append(delegate)
+
+    results = {}
+    for department in departments:
+        delegates = by_department.get(department.id, [])
+        results[department] = {'delegates': delegates, **_with_live_percentages(delegates)}
+    return results
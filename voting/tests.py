@@ -1,3 +1,1387 @@
-from django.test import TestCase
+import csv
+import json
+import random
+import tempfile
+import threading
+import time
+from concurrent.futures import Future, TimeoutError as FutureTimeoutError
+from datetime import timedelta
+from io import StringIO
+from unittest import mock, skipUnless
 
-# Create your tests here.
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.auth import authenticate
+from django.contrib.messages import get_messages
+from django.core.cache import cache
+from django.core.management import CommandError, call_command
+from django.db import DatabaseError, IntegrityError, connection, transaction
+from django.db.models import Count, F
+from django.test import AsyncRequestFactory, Client, SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from django.utils.html import escape
+
+from . import (
+    allowlist, async_views, audit, ballots, election_cache, exports, ingest, ratelimit, roll, scheduler, tally, turnout
+)
+from .backends import credentials
+from .models import (
+    Student, Position, Candidate, Delegate, Election, DelegateVote, MainVote, VoteAuditLog, VoterRoll,
+    Department, DepartmentTurnout, ElectionResult, DelegateResult, Party, Programme
+)
+from .utils import create_audit_log, resolve_client_ip
+
+
+FAST_HASHERS = ['django.contrib.auth.hashers.MD5PasswordHasher']
+
+
+def inline_voting(**voting_settings):
+    """Cheap hashing, inline vote commits and synchronous audit writes, plus any VOTING_SETTINGS overrides"""
+    return override_settings(
+        PASSWORD_HASHERS=FAST_HASHERS,
+        VOTING_SETTINGS={
+            **settings.VOTING_SETTINGS, 'VOTE_COMMITTER': 'inline', 'AUDIT_WRITER': 'sync', **voting_settings
+        },
+    )
+
+
+@skipUnless(connection.vendor == 'sqlite', 'EXPLAIN QUERY PLAN is SQLite specific')
+class HotQueryIndexTests(TestCase):
+    """Each hot query must be answered from an index, never a table scan"""
+
+    def query_plan(self, queryset):
+        sql, params = queryset.query.sql_with_params()
+        with connection.cursor() as cursor:
+            cursor.execute(f'EXPLAIN QUERY PLAN {sql}', params)
+            return ' | '.join(row[-1] for row in cursor.fetchall())
+
+    def assertUsesIndex(self, queryset, index_name):
+        plan = self.query_plan(queryset)
+        self.assertIn(f'INDEX {index_name}', plan)
+
+    def assertSearchesIndex(self, queryset, condition):
+        """For unique constraints, whose SQLite index names are generated"""
+        plan = self.query_plan(queryset)
+        self.assertRegex(plan, r'SEARCH \w+ USING (COVERING )?INDEX')
+        self.assertIn(condition, plan)
+
+    def test_delegate_vote_by_voter(self):
+        # dashboard_view / voting_status_api: has this student voted?
+        self.assertSearchesIndex(
+            DelegateVote.objects.filter(election_id=1, voter_id=1),
+            '(election_id=? AND voter_id=?)'
+        )
+
+    def test_delegate_vote_by_delegate(self):
+        # rebuild_results: votes per delegate
+        self.assertUsesIndex(
+            DelegateVote.objects.filter(election_id=1, delegate_id=1),
+            'delegatevote_elec_deleg_idx'
+        )
+
+    def test_main_vote_by_delegate(self):
+        # dashboard_view / voting_status_api: positions this delegate has voted
+        self.assertSearchesIndex(
+            MainVote.objects.filter(election_id=1, delegate_id=1),
+            '(election_id=? AND delegate_id=?)'
+        )
+
+    def test_main_vote_by_candidate(self):
+        # rebuild_results: votes per candidate
+        self.assertUsesIndex(
+            MainVote.objects.filter(election_id=1, candidate_id=1),
+            'mainvote_elec_cand_idx'
+        )
+
+    def test_approved_delegates_in_department(self):
+        # build_department_ballot
+        self.assertUsesIndex(
+            Delegate.objects.filter(department_id=1, is_approved=True),
+            'delegate_approved_dept_idx'
+        )
+
+    def test_approved_candidates_for_position(self):
+        # MainVoteForm / per-position candidate lookups
+        self.assertUsesIndex(
+            Candidate.objects.filter(position_id=1, is_approved=True),
+            'candidate_approved_pos_idx'
+        )
+
+    def test_audit_log_changelist(self):
+        # VoteAuditLogAdmin: default ordering and its list filters
+        self.assertUsesIndex(VoteAuditLog.objects.all()[:100], 'auditlog_timestamp_idx')
+        self.assertUsesIndex(
+            VoteAuditLog.objects.filter(action_type='main_vote')[:100],
+            'auditlog_action_time_idx'
+        )
+        self.assertUsesIndex(
+            VoteAuditLog.objects.filter(success=False)[:100],
+            'auditlog_failures_idx'
+        )
+
+
+class SeededElectionMixin:
+    """A seeded election with a delegate, a voter in their department and a returning officer"""
+    STUDENTS = 150
+    VOTES = False
+
+    @classmethod
+    def setUpTestData(cls):
+        random.seed(2024)
+        call_command('seed_data', students=cls.STUDENTS, votes=cls.VOTES, stdout=StringIO())
+        cls.election = Election.objects.get()
+        cls.student = Student.objects.filter(
+            delegate_profile__isnull=True,
+            department__delegates__is_approved=True,
+        ).first()
+        cls.delegate = Delegate.objects.filter(
+            department=cls.student.department, is_approved=True
+        ).select_related('student').first()
+        cls.admin = Student.objects.create_superuser(
+            registration_number='AD100/0001/2020',
+            birth_certificate_number='12345678',
+            first_name='Returning',
+            last_name='Officer',
+            programme=cls.student.programme,
+        )
+        cls.position = Position.objects.first()
+        cls.candidate = Candidate.objects.filter(position=cls.position, is_approved=True).first()
+
+    def setUp(self):
+        cache.clear()
+
+    def set_phase(self, phase):
+        now = timezone.now()
+        self.election.current_phase = phase
+        self.election.delegate_voting_start = now - timedelta(hours=1)
+        self.election.delegate_voting_end = now + timedelta(hours=1)
+        self.election.main_voting_start = now - timedelta(hours=1)
+        self.election.main_voting_end = now + timedelta(hours=1)
+        self.election.save()
+
+    def post_json(self, user, name, data, **headers):
+        self.client.force_login(user)
+        return self.client.post(reverse(name), data, content_type='application/json', headers=headers)
+
+
+@inline_voting()
+class EndpointBudgetTests(SeededElectionMixin, TestCase):
+    """Hard query-count and wall-time budgets for every voting endpoint
+
+    Budgets are per request and independent of the size of the seeded
+    dataset, so an N+1 on a hot path fails here before it reaches an
+    election.
+    """
+    MAX_SECONDS = 0.5
+
+    def request(self, user, method, url, data=None, content_type='application/json'):
+        if user is not None:
+            self.client.force_login(user)
+        kwargs = {'content_type': content_type} if data is not None and content_type else {}
+        with CaptureQueriesContext(connection) as queries:
+            started = time.perf_counter()
+            response = getattr(self.client, method)(url, data, **kwargs)
+            if response.streaming:
+                # Streamed bodies run their queries as they are read
+                response.body = b''.join(response.streaming_content)
+            elapsed = time.perf_counter() - started
+        return response, len(queries), elapsed
+
+    def assertWithinBudget(self, user, method, url, max_queries, data=None, status=200):
+        response, queries, elapsed = self.request(user, method, url, data)
+        self.assertEqual(response.status_code, status, f"{method.upper()} {url}")
+        self.assertLessEqual(queries, max_queries, f"{method.upper()} {url} ran {queries} queries")
+        self.assertLess(elapsed, self.MAX_SECONDS, f"{method.upper()} {url} took {elapsed:.3f}s")
+        return response
+
+    def test_login_page(self):
+        self.assertWithinBudget(None, 'get', reverse('login'), 0)
+
+    def test_login_submit(self):
+        response, queries, elapsed = self.request(None, 'post', reverse('login'), {
+            'registration_number': self.student.registration_number,
+            'birth_certificate_number': self.student.birth_certificate_number,
+        }, content_type=None)
+        self.assertRedirects(response, reverse('dashboard'), fetch_redirect_response=False)
+        self.assertLessEqual(queries, 4)
+        self.assertLess(elapsed, self.MAX_SECONDS)
+
+    def test_logout(self):
+        self.assertWithinBudget(self.student, 'get', reverse('logout'), 2, status=302)
+
+    def test_health_check(self):
+        self.assertWithinBudget(None, 'get', reverse('health_check'), 0)
+
+    def test_student_dashboard(self):
+        self.set_phase('delegate_voting')
+        self.assertWithinBudget(self.student, 'get', reverse('dashboard'), 5)
+        self.assertWithinBudget(self.student, 'get', reverse('dashboard'), 3)
+
+    def test_admin_dashboard(self):
+        self.set_phase('delegate_voting')
+        self.request(self.admin, 'get', reverse('dashboard'))
+        self.assertWithinBudget(self.admin, 'get', reverse('dashboard'), 3)
+
+    def test_delegate_dashboard_in_main_voting(self):
+        self.set_phase('main_voting')
+        self.assertWithinBudget(self.delegate.student, 'get', reverse('dashboard'), 8)
+        response = self.assertWithinBudget(self.delegate.student, 'get', reverse('dashboard'), 6)
+        candidate = Candidate.objects.filter(is_approved=True).select_related('student__department').first()
+        self.assertContains(response, f"<div>{escape(candidate.student.department.name)}</div>")
+
+    def test_voting_status(self):
+        self.set_phase('main_voting')
+        self.assertWithinBudget(self.student, 'get', reverse('voting_status'), 5)
+        self.assertWithinBudget(self.delegate.student, 'get', reverse('voting_status'), 5)
+
+    def test_delegates_api(self):
+        self.set_phase('delegate_voting')
+        self.assertWithinBudget(self.student, 'get', reverse('delegates'), 2)
+        self.assertWithinBudget(self.student, 'get', reverse('delegates'), 1)
+
+    def test_candidates_api(self):
+        self.set_phase('main_voting')
+        url = f"{reverse('candidates')}?position_id={self.position.id}"
+        response = self.assertWithinBudget(self.delegate.student, 'get', url, 2)
+        self.assertWithinBudget(self.delegate.student, 'get', url, 1)
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=response['ETag']).status_code, 304)
+
+    def test_ballot(self):
+        self.set_phase('main_voting')
+        url = reverse('ballot')
+        self.assertWithinBudget(self.student, 'get', url, 6)
+        response = self.assertWithinBudget(self.delegate.student, 'get', url, 5)
+        self.assertEqual(len(response.json()['positions']), Position.objects.count())
+        self.assertWithinBudget(self.delegate.student, 'get', url, 5)
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=response['ETag']).status_code, 304)
+
+    def test_submit_ballot(self):
+        self.set_phase('main_voting')
+        candidate_ids = [
+            Candidate.objects.filter(position=position, is_approved=True).values_list('id', flat=True).first()
+            for position in Position.objects.all()
+        ]
+        # One request and one transaction for every position, however many there are
+        self.assertWithinBudget(
+            self.delegate.student, 'post', reverse('ballot'), 14 + len(candidate_ids),
+            data={'candidate_ids': candidate_ids}
+        )
+        self.assertEqual(MainVote.objects.filter(delegate=self.delegate).count(), len(candidate_ids))
+
+    def test_vote_for_delegate(self):
+        self.set_phase('delegate_voting')
+        self.assertWithinBudget(
+            self.student, 'post', reverse('vote_delegate'), 15,
+            data={'delegate_id': self.delegate.id}
+        )
+        self.assertEqual(DelegateVote.objects.filter(voter=self.student).count(), 1)
+        self.assertTrue(VoterRoll.objects.get(election=self.election, student=self.student).has_voted_for_delegate)
+
+    def test_vote_rejected_off_the_voter_roll(self):
+        self.set_phase('delegate_voting')
+        VoterRoll.objects.filter(election=self.election, student=self.student).update(is_eligible=False)
+        response, _, _ = self.request(self.student, 'post', reverse('vote_delegate'), {'delegate_id': self.delegate.id})
+        self.assertEqual(response.status_code, 403)
+        self.assertFalse(DelegateVote.objects.filter(voter=self.student).exists())
+
+    def test_vote_for_candidate(self):
+        self.set_phase('main_voting')
+        self.assertWithinBudget(
+            self.delegate.student, 'post', reverse('vote_candidate'), 16,
+            data={'candidate_id': self.candidate.id}
+        )
+        self.assertEqual(MainVote.objects.filter(delegate=self.delegate).count(), 1)
+
+    @mock.patch('voting.sharedcache.is_shared', return_value=True)
+    def test_turnout(self, is_shared):
+        self.set_phase('delegate_voting')
+        department = self.student.department_id
+        before = self.assertWithinBudget(self.student, 'get', reverse('turnout'), 5).json()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.request(self.student, 'post', reverse('vote_delegate'), {'delegate_id': self.delegate.id})
+        # The board is served from the cached counters alone
+        after = self.assertWithinBudget(self.student, 'get', reverse('turnout'), 1).json()
+        self.assertEqual(after['delegate_votes'], before['delegate_votes'] + 1)
+        self.assertEqual(after['delegate_votes'], DelegateVote.objects.filter(election=self.election).count())
+        rows = {row['id']: row for faculty in after['faculties'] for row in faculty['departments']}
+        self.assertEqual(rows[department]['delegate_votes'], DelegateVote.objects.filter(
+            election=self.election, voter__department_id=department
+        ).count())
+
+        # Lost counters are put back from the vote tables
+        cache.clear()
+        DepartmentTurnout.objects.all().delete()
+        out = StringIO()
+        call_command('reconcile_turnout', stdout=out)
+        self.assertIn('corrected', out.getvalue())
+        self.assertEqual(self.request(self.student, 'get', reverse('turnout'))[0].json(), after)
+
+    def test_export(self):
+        self.set_phase('results')
+        response = self.assertWithinBudget(self.admin, 'get', f"{reverse('export', args=['main_votes'])}?format=csv", 2)
+        lines = response.body.decode().splitlines()
+        self.assertEqual(len(lines), MainVote.objects.count() + 1)
+        response = self.assertWithinBudget(self.admin, 'get', f"{reverse('export', args=['audit_log'])}?format=ndjson", 2)
+        self.assertEqual(len(response.body.splitlines()), VoteAuditLog.objects.count())
+        self.assertWithinBudget(self.student, 'get', reverse('export', args=['main_votes']), 1, status=302)
+
+    @mock.patch('voting.sharedcache.is_shared', return_value=True)
+    def test_live_events(self, is_shared):
+        self.set_phase('results')
+        response = self.assertWithinBudget(self.student, 'get', reverse('live_events'), 7)
+        body = response.content.decode()
+        # Under WSGI clients come back no more often than the old five-minute poll
+        self.assertTrue(body.startswith('retry: 300000\n\n'))
+        self.assertIn('event: turnout', body)
+        self.assertIn('event: tally', body)
+        # Every worker shares the snapshot for one interval
+        self.assertWithinBudget(self.student, 'get', reverse('live_events'), 1)
+
+    def test_results(self):
+        # Entering the results phase recounts; the page itself only reads
+        self.set_phase('results')
+        self.assertTrue(ElectionResult.objects.filter(election=self.election).exists())
+        response = self.assertWithinBudget(self.student, 'get', reverse('results'), 6)
+        self.assertFalse(response.context['live_stream'])
+        self.assertWithinBudget(self.student, 'get', reverse('results'), 5)
+        self.assertWithinBudget(self.admin, 'get', reverse('results'), 5)
+
+    def test_results_list_contestants_without_tally_rows(self):
+        self.set_phase('results')
+        ElectionResult.objects.all().delete()
+        DelegateResult.objects.all().delete()
+        self.client.force_login(self.student)
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse('results'))
+        self.assertFalse(any(query['sql'].startswith(('INSERT', 'UPDATE', 'DELETE')) for query in queries))
+        listed = response.context['results'][self.position]['candidates']
+        self.assertEqual(
+            {candidate.id for candidate in listed},
+            set(Candidate.objects.filter(position=self.position, is_approved=True).values_list('id', flat=True)),
+        )
+        self.assertTrue(all(candidate.vote_count == 0 for candidate in listed))
+        delegates = response.context['delegate_results'][self.student.department]['delegates']
+        self.assertIn(self.delegate.id, {delegate.id for delegate in delegates})
+
+
+@inline_voting()
+class VoteCommitterTests(SeededElectionMixin, TestCase):
+    """The committer reports duplicates, other failures and timeouts truthfully"""
+    STUDENTS = 80
+
+    def delegate_vote(self, **fields):
+        return lambda: DelegateVote.objects.create(**{
+            'election': self.election, 'voter': self.student, 'delegate': self.delegate,
+            'voter_ip': '127.0.0.1', **fields
+        })
+
+    def test_only_unique_violations_are_duplicates(self):
+        ingest.commit(self.delegate_vote())
+        with self.assertRaises(ingest.DuplicateVote):
+            ingest.commit(self.delegate_vote())
+        with self.assertRaises(IntegrityError) as raised:
+            ingest.commit(self.delegate_vote(voter=self.admin, voter_ip=None))
+        self.assertNotIsInstance(raised.exception, ingest.DuplicateVote)
+
+    def test_failed_vote_rolls_back_alone(self):
+        def failing():
+            self.delegate_vote()()
+            raise RuntimeError('audit entry could not be written')
+        future = ingest.committer.submit(failing, inline=True)
+        self.assertIsInstance(future.exception(), RuntimeError)
+        self.assertFalse(DelegateVote.objects.filter(voter=self.student).exists())
+
+    def test_votes_are_batched_in_one_transaction(self):
+        committer = ingest.VoteCommitter()
+        futures = [Future(), Future()]
+        committer._commit([(self.delegate_vote(), futures[0]), (self.delegate_vote(), futures[1])])
+        futures[0].result()
+        self.assertIsInstance(futures[1].exception(), ingest.DuplicateVote)
+        self.assertEqual(DelegateVote.objects.filter(voter=self.student).count(), 1)
+
+    @override_settings(VOTING_SETTINGS={**settings.VOTING_SETTINGS, 'VOTE_COMMIT_TIMEOUT': 0.01})
+    def test_queued_vote_is_withdrawn_on_timeout(self):
+        committer = ingest.VoteCommitter()
+        # Never drained, as if the writer were stuck on a long batch
+        committer.start = lambda: None
+        apply = self.delegate_vote()
+        with mock.patch.object(ingest, 'committer', committer):
+            with self.assertRaises(FutureTimeoutError):
+                ingest.commit(apply, committed=lambda: False)
+        committer._commit([committer.queue.get_nowait()])
+        self.assertFalse(DelegateVote.objects.filter(voter=self.student).exists())
+
+    @override_settings(VOTING_SETTINGS={**settings.VOTING_SETTINGS, 'VOTE_COMMIT_TIMEOUT': 0.01})
+    def test_started_vote_is_checked_on_timeout(self):
+        committer = ingest.VoteCommitter()
+
+        def submit(apply, inline=False):
+            # Taken by the writer, which has not finished its transaction yet
+            future = Future()
+            future.set_running_or_notify_cancel()
+            return future
+        committer.submit = submit
+        with mock.patch.object(ingest, 'committer', committer):
+            self.assertIsNone(ingest.commit(self.delegate_vote(), committed=lambda: True))
+            with self.assertRaises(FutureTimeoutError):
+                ingest.commit(self.delegate_vote(), committed=lambda: False)
+
+
+@inline_voting()
+class TallyTests(SeededElectionMixin, TestCase):
+    """Tallies follow every vote and a recount always agrees with the vote tables"""
+    STUDENTS = 80
+    VOTES = True
+
+    def assertTalliesMatchVotes(self):
+        delegate_votes = dict(
+            DelegateVote.objects.filter(election=self.election).values_list('delegate').annotate(total=Count('id'))
+        )
+        for result in DelegateResult.objects.filter(election=self.election):
+            self.assertEqual(result.vote_count, delegate_votes.get(result.delegate_id, 0))
+        candidate_votes = dict(
+            MainVote.objects.filter(election=self.election).values_list('candidate').annotate(total=Count('id'))
+        )
+        results = ElectionResult.objects.filter(election=self.election)
+        self.assertEqual(
+            set(results.values_list('candidate_id', flat=True)),
+            set(Candidate.objects.filter(is_approved=True).values_list('id', flat=True))
+        )
+        for result in results:
+            self.assertEqual(result.vote_count, candidate_votes.get(result.candidate_id, 0))
+
+    def vote_count(self, model, **lookup):
+        return model.objects.filter(election=self.election, **lookup).values_list('vote_count', flat=True).first() or 0
+
+    def test_votes_update_tallies(self):
+        DelegateVote.objects.filter(voter=self.student).delete()
+        MainVote.objects.filter(delegate=self.delegate, position=self.position).delete()
+        roll.build(self.election)
+        call_command('recompute_results', stdout=StringIO())
+        self.set_phase('delegate_voting')
+        before = self.vote_count(DelegateResult, delegate=self.delegate)
+        self.assertEqual(self.post_json(self.student, 'vote_delegate', {'delegate_id': self.delegate.id}).status_code, 200)
+        self.assertEqual(self.vote_count(DelegateResult, delegate=self.delegate), before + 1)
+
+        self.set_phase('main_voting')
+        before = self.vote_count(ElectionResult, candidate=self.candidate)
+        self.assertEqual(self.post_json(self.delegate.student, 'vote_candidate', {'candidate_id': self.candidate.id}).status_code, 200)
+        self.assertEqual(self.vote_count(ElectionResult, candidate=self.candidate), before + 1)
+        self.assertTalliesMatchVotes()
+
+    def test_recompute_repairs_drifted_tallies(self):
+        call_command('recompute_results', stdout=StringIO())
+        DelegateResult.objects.filter(election=self.election).update(vote_count=999)
+        ElectionResult.objects.filter(candidate=self.candidate).delete()
+        call_command('recompute_results', stdout=StringIO())
+        self.assertTalliesMatchVotes()
+
+        # Every position has exactly its leaders marked as winners
+        for position in Position.objects.all():
+            results = ElectionResult.objects.filter(election=self.election, candidate__position=position)
+            top = max(results.values_list('vote_count', flat=True), default=0)
+            for result in results:
+                self.assertEqual(result.is_winner, top > 0 and result.vote_count == top)
+
+
+class ElectionCacheTests(TestCase):
+    """The active election is read once per worker and reloaded on every change"""
+
+    @classmethod
+    def setUpTestData(cls):
+        now = timezone.now()
+        cls.election = Election.objects.create(
+            name='Cache Test Election',
+            delegate_voting_start=now,
+            delegate_voting_end=now + timedelta(days=1),
+            main_voting_start=now + timedelta(days=2),
+            main_voting_end=now + timedelta(days=3),
+        )
+
+    def setUp(self):
+        cache.clear()
+        election_cache.invalidate()
+
+    def test_cached_between_requests(self):
+        self.assertEqual(election_cache.get_active_election(), self.election)
+        with self.assertNumQueries(0):
+            self.assertEqual(election_cache.get_active_election(), self.election)
+
+    def test_save_and_delete_invalidate(self):
+        election_cache.get_active_election()
+        self.election.current_phase = 'delegate_voting'
+        self.election.save()
+        self.assertEqual(election_cache.get_active_election().current_phase, 'delegate_voting')
+
+        self.election.is_active = False
+        self.election.save()
+        self.assertIsNone(election_cache.get_active_election())
+
+    def test_change_in_another_worker_is_seen(self):
+        election_cache.get_active_election()
+        # Another process saved the election and replaced the shared version
+        Election.objects.filter(pk=self.election.pk).update(current_phase='main_voting')
+        cache.set(election_cache.VERSION_KEY, 'bumped elsewhere', None)
+        with self.assertNumQueries(1):
+            self.assertEqual(election_cache.get_active_election().current_phase, 'main_voting')
+
+
+@override_settings(PASSWORD_HASHERS=FAST_HASHERS)
+class DelegateBallotCacheTests(SeededElectionMixin, TestCase):
+    """Department ballots are served from the cache and dropped on every change they show"""
+    STUDENTS = 80
+
+    def setUp(self):
+        cache.clear()
+
+    def delegate_ids(self):
+        return [row['id'] for row in json.loads(ballots.department_ballot(self.delegate.department_id)['json'])['delegates']]
+
+    def test_served_from_cache(self):
+        ballot = ballots.department_ballot(self.delegate.department_id)
+        with self.assertNumQueries(0):
+            self.assertEqual(ballots.department_ballot(self.delegate.department_id), ballot)
+
+    def test_delegate_changes_invalidate(self):
+        self.assertIn(self.delegate.id, self.delegate_ids())
+        self.delegate.is_approved = False
+        self.delegate.save()
+        self.assertNotIn(self.delegate.id, self.delegate_ids())
+
+    def test_student_and_party_changes_invalidate(self):
+        self.delegate_ids()
+        self.delegate.student.first_name = 'Renamed'
+        self.delegate.student.save()
+        ballot = ballots.department_ballot(self.delegate.department_id)
+        self.assertIn('Renamed', [entry['student']['first_name'] for entry in ballot['entries']])
+
+        party = self.delegate.party
+        party.acronym = 'NEW'
+        party.save()
+        ballot = ballots.department_ballot(self.delegate.department_id)
+        self.assertIn('NEW', [entry['party']['acronym'] for entry in ballot['entries']])
+
+    def test_programme_move_updates_roll_and_ballots(self):
+        roll.build(self.election)
+        ballots.department_ballot(self.delegate.department_id)
+        programme = self.delegate.student.programme
+        old_department = programme.department_id
+        programme.department = Department.objects.exclude(pk=old_department).first()
+        programme.save()
+
+        self.assertIsNone(cache.get(ballots._department_key(old_department)))
+        moved = VoterRoll.objects.filter(election=self.election, student__programme=programme)
+        self.assertTrue(moved.exists())
+        self.assertFalse(moved.exclude(department_id=programme.department_id).exists())
+
+
+@override_settings(PASSWORD_HASHERS=FAST_HASHERS)
+class CandidateBallotCacheTests(SeededElectionMixin, TestCase):
+    """Candidate ballots carry an ETag that changes exactly when the ballot does"""
+    STUDENTS = 80
+
+    def setUp(self):
+        cache.clear()
+        self.client.force_login(self.delegate.student)
+        self.url = f"{reverse('candidates')}?position_id={self.position.id}"
+
+    def test_etag_revalidation(self):
+        response = self.client.get(self.url)
+        self.assertIn(self.candidate.id, [row['id'] for row in response.json()['candidates']])
+        self.assertEqual(self.client.get(self.url, HTTP_IF_NONE_MATCH=response['ETag']).status_code, 304)
+
+        self.candidate.manifesto = 'A new manifesto'
+        self.candidate.save()
+        changed = self.client.get(self.url, HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(changed.status_code, 200)
+        self.assertNotEqual(changed['ETag'], response['ETag'])
+        self.assertIn('A new manifesto', [row['manifesto'] for row in changed.json()['candidates']])
+
+    def test_empty_positions_are_cached(self):
+        empty = Position.objects.last()
+        Candidate.objects.filter(position=empty).update(is_approved=False)
+        ballots.invalidate_candidates()
+        ballots.candidate_ballot(self.election.id, empty.id)
+        with self.assertNumQueries(0):
+            self.assertEqual(json.loads(ballots.candidate_ballot(self.election.id, empty.id)['json']), {'candidates': []})
+
+    def test_ballots_are_warmed_once_as_main_voting_opens(self):
+        self.set_phase('delegate_voting')
+        with mock.patch('voting.signals.ballots.build_candidate_ballots') as build:
+            self.set_phase('main_voting')
+            self.set_phase('main_voting')
+            build.assert_called_once_with(self.election.id)
+            # The scheduler warms the ballots itself before moving the phase
+            Election.objects.filter(pk=self.election.pk).update(current_phase='delegate_voting')
+            scheduler.advance(Election.objects.get(), 'main_voting')
+            build.assert_called_once_with(self.election.id)
+
+
+@inline_voting(AUDIT_WRITER='async')
+class AuditWriterTests(SeededElectionMixin, TestCase):
+    """Routine audit entries are batched off the request; vote entries are never lost"""
+    STUDENTS = 80
+
+    def entry(self, description='login'):
+        return VoteAuditLog(action_type='login', description=description, ip_address='127.0.0.1', student=self.student)
+
+    def test_durable_entries_are_written_immediately(self):
+        audit.record(self.entry('durable'), durable=True)
+        self.assertTrue(VoteAuditLog.objects.filter(description='durable').exists())
+
+    def test_full_queue_writes_inline(self):
+        writer = audit.AuditWriter(max_queue=1)
+        # Not draining, so the second entry finds the queue full
+        writer.start = lambda: None
+        writer.submit(self.entry('queued'))
+        writer.submit(self.entry('overflow'))
+        self.assertTrue(VoteAuditLog.objects.filter(description='overflow').exists())
+        self.assertFalse(VoteAuditLog.objects.filter(description='queued').exists())
+
+    def test_durable_audit_failure_rolls_back_the_vote(self):
+        def cast_vote():
+            DelegateVote.objects.create(
+                election=self.election, voter=self.student, delegate=self.delegate, voter_ip='127.0.0.1'
+            )
+            create_audit_log('delegate_vote', 'x', '127.0.0.1', student=self.student, durable=True)
+        with mock.patch.object(audit, 'record', side_effect=DatabaseError('audit table unavailable')):
+            with self.assertRaises(DatabaseError):
+                ingest.commit(cast_vote)
+        self.assertFalse(DelegateVote.objects.filter(voter=self.student).exists())
+
+
+class AuditWriterThreadTests(TransactionTestCase):
+    """The background writer bulk inserts what it is given in batches"""
+
+    def test_entries_are_batched(self):
+        writer = audit.AuditWriter(batch_size=3, flush_interval=0.05)
+        with mock.patch.object(VoteAuditLog.objects, 'bulk_create', wraps=VoteAuditLog.objects.bulk_create) as bulk_create:
+            for number in range(7):
+                writer.submit(VoteAuditLog(action_type='login', description=f'entry {number}', ip_address='127.0.0.1'))
+            writer.flush()
+            writer.close()
+        self.assertEqual(VoteAuditLog.objects.count(), 7)
+        self.assertLessEqual(bulk_create.call_count, 3)
+
+
+@inline_voting()
+class VoteIntegrityTests(SeededElectionMixin, TestCase):
+    """One vote per position, retries that succeed, and idempotent replays"""
+    STUDENTS = 80
+
+    def setUp(self):
+        cache.clear()
+        self.rival = Candidate.objects.filter(position=self.position, is_approved=True).exclude(id=self.candidate.id).first()
+
+    def test_one_main_vote_per_position_in_the_database(self):
+        MainVote.objects.create(
+            election=self.election, delegate=self.delegate, candidate=self.candidate,
+            position=self.position, voter_ip='127.0.0.1'
+        )
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            MainVote.objects.create(
+                election=self.election, delegate=self.delegate, candidate=self.rival,
+                position=self.position, voter_ip='127.0.0.1'
+            )
+
+    def test_repeated_main_vote_succeeds_and_changed_vote_is_rejected(self):
+        self.set_phase('main_voting')
+        for _ in range(2):
+            response = self.post_json(self.delegate.student, 'vote_candidate', {'candidate_id': self.candidate.id})
+            self.assertEqual(response.status_code, 200)
+            self.assertTrue(response.json()['success'])
+        response = self.post_json(self.delegate.student, 'vote_candidate', {'candidate_id': self.rival.id})
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(
+            list(MainVote.objects.filter(delegate=self.delegate, position=self.position).values_list('candidate_id', flat=True)),
+            [self.candidate.id]
+        )
+        self.assertEqual(ElectionResult.objects.get(candidate=self.candidate).vote_count, 1)
+
+    def test_repeated_delegate_vote_succeeds_and_changed_vote_is_rejected(self):
+        self.set_phase('delegate_voting')
+        for _ in range(2):
+            self.assertEqual(self.post_json(self.student, 'vote_delegate', {'delegate_id': self.delegate.id}).status_code, 200)
+        other = Delegate.objects.create(
+            student=Student.objects.filter(department=self.delegate.department, delegate_profile__isnull=True)
+            .exclude(id=self.student.id).first(),
+            party=Party.objects.create(name='Independent Candidates', acronym='IND'),
+            department=self.delegate.department,
+            is_approved=True,
+        )
+        self.assertEqual(self.post_json(self.student, 'vote_delegate', {'delegate_id': other.id}).status_code, 400)
+        self.assertEqual(DelegateVote.objects.filter(voter=self.student).count(), 1)
+
+    def test_idempotency_key_replays_the_first_response(self):
+        self.set_phase('main_voting')
+        first = self.post_json(
+            self.delegate.student, 'vote_candidate', {'candidate_id': self.candidate.id}, **{'Idempotency-Key': 'ballot-1'}
+        )
+        self.assertEqual(first.status_code, 200)
+        # A retry of the same request is answered from the stored response
+        with self.assertNumQueries(1):
+            replay = self.client.post(
+                reverse('vote_candidate'), {'candidate_id': self.candidate.id},
+                content_type='application/json', headers={'Idempotency-Key': 'ballot-1'}
+            )
+        self.assertEqual((replay.status_code, replay.json()), (first.status_code, first.json()))
+        self.assertEqual(MainVote.objects.filter(delegate=self.delegate).count(), 1)
+
+        # The key is bound to the request: a different vote under it is checked, not replayed
+        other = self.post_json(
+            self.delegate.student, 'vote_candidate', {'candidate_id': self.rival.id}, **{'Idempotency-Key': 'ballot-1'}
+        )
+        self.assertEqual(other.status_code, 400)
+        self.assertIn('already voted', other.json()['error'])
+
+    def test_idempotency_key_does_not_keep_transient_errors(self):
+        self.set_phase('registration')
+        data = {'delegate_id': self.delegate.id}
+        closed = self.post_json(self.student, 'vote_delegate', data, **{'Idempotency-Key': 'retry-1'})
+        self.assertEqual(closed.status_code, 400)
+        self.set_phase('delegate_voting')
+        self.assertEqual(self.post_json(self.student, 'vote_delegate', data, **{'Idempotency-Key': 'retry-1'}).status_code, 200)
+        # Nor is a stored success replayed on another endpoint
+        other = self.post_json(self.student, 'vote_candidate', {'candidate_id': self.candidate.id}, **{'Idempotency-Key': 'retry-1'})
+        self.assertEqual(other.json()['error'], 'Main voting is not currently active.')
+
+
+class SlidingWindowTests(SimpleTestCase):
+    """The limiter counts every hit, even concurrent ones, and lets old windows fade out"""
+
+    def setUp(self):
+        cache.clear()
+
+    def test_previous_window_is_weighted_by_overlap(self):
+        window = ratelimit.SlidingWindow('test', limit=10, window=60)
+        with mock.patch('voting.ratelimit.time.time', return_value=6000.0):
+            for _ in range(6):
+                window.hit('client')
+        # Half way through the next window, half of the previous count still applies
+        with mock.patch('voting.ratelimit.time.time', return_value=6090.0):
+            self.assertEqual(window.count('client'), 3)
+            self.assertEqual(window.hit('client'), 4)
+        with mock.patch('voting.ratelimit.time.time', return_value=6240.0):
+            self.assertEqual(window.count('client'), 0)
+
+    def test_concurrent_hits_are_not_lost(self):
+        window = ratelimit.SlidingWindow('test', limit=1000, window=3600)
+
+        def hammer():
+            for _ in range(50):
+                window.hit('shared')
+        threads = [threading.Thread(target=hammer) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(window.count('shared'), 400)
+        self.assertFalse(window.exceeded('shared'))
+
+
+@inline_voting(MAX_LOGIN_ATTEMPTS=3, VOTE_RATE_LIMIT=(2, 60))
+class LoginThrottleTests(SeededElectionMixin, TestCase):
+    """Failed logins lock an account out; a success clears its count"""
+    STUDENTS = 80
+
+    def setUp(self):
+        cache.clear()
+
+    def login(self, password):
+        return self.client.post(reverse('login'), {
+            'registration_number': self.student.registration_number,
+            'birth_certificate_number': password,
+        })
+
+    def test_lockout_after_failures(self):
+        for _ in range(3):
+            self.assertEqual(self.login('00000000').status_code, 200)
+        # Even the right password is refused until the window passes
+        response = self.login(self.student.birth_certificate_number)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotIn('_auth_user_id', self.client.session)
+        self.assertIn(
+            'Too many failed login attempts. Please try again later.',
+            [str(message) for message in get_messages(response.wsgi_request)]
+        )
+
+    def test_success_clears_failures(self):
+        for _ in range(2):
+            self.login('00000000')
+        self.assertEqual(self.login(self.student.birth_certificate_number).status_code, 302)
+        self.client.logout()
+        for _ in range(2):
+            self.login('00000000')
+        self.assertEqual(self.login(self.student.birth_certificate_number).status_code, 302)
+
+    def test_concurrent_guesses_stop_at_the_limit(self):
+        checked = []
+
+        def slow_authenticate(request, username=None, password=None):
+            # As long as a real password hash, so every guess is in flight at once
+            checked.append(password)
+            time.sleep(0.05)
+            return None
+
+        def guess():
+            Client().post(reverse('login'), {
+                'registration_number': self.student.registration_number,
+                'birth_certificate_number': '00000000',
+            })
+        with mock.patch('voting.views.authenticate', slow_authenticate), \
+                mock.patch('voting.views.create_audit_log'):
+            threads = [threading.Thread(target=guess) for _ in range(10)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+        self.assertEqual(len(checked), 3)
+
+    def test_vote_rate_limit(self):
+        self.set_phase('delegate_voting')
+        statuses = [
+            self.post_json(self.student, 'vote_delegate', {'delegate_id': self.delegate.id}).status_code
+            for _ in range(3)
+        ]
+        self.assertEqual(statuses, [200, 200, 429])
+
+
+@override_settings(PASSWORD_HASHERS=FAST_HASHERS)
+class ExportTests(SeededElectionMixin, TestCase):
+    """Exports stream without buffering and cannot smuggle formulas into a spreadsheet"""
+    STUDENTS = 80
+
+    def test_csv_cells_cannot_run_formulas(self):
+        entry = VoteAuditLog.objects.create(
+            action_type='login_attempt',
+            description='+cmd|/C calc',
+            ip_address='127.0.0.1',
+            user_agent='=HYPERLINK("http://example.com")',
+            success=False,
+        )
+        rows = list(csv.reader(b''.join(exports.stream('audit_log', 'csv')).decode().splitlines()))
+        row = dict(zip(rows[0], next(row for row in rows[1:] if row[0] == str(entry.id))))
+        self.assertEqual(row['description'], "'+cmd|/C calc")
+        self.assertEqual(row['user_agent'], """'=HYPERLINK("http://example.com")""")
+        self.assertEqual(row['ip_address'], '127.0.0.1')
+
+    async def test_asgi_export_streams_asynchronously(self):
+        await self.async_client.aforce_login(self.admin)
+        response = await self.async_client.get(f"{reverse('export', args=['main_votes'])}?format=ndjson")
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.is_async)
+        body = b''.join([block async for block in response.streaming_content])
+        self.assertEqual(len(body.splitlines()), await MainVote.objects.acount())
+
+
+@inline_voting(VOTE_COMMIT_TIMEOUT=0)
+class ComputeResultsTests(TransactionTestCase):
+    """Threaded and incremental recounts write the same tallies as a full one"""
+
+    def setUp(self):
+        random.seed(2024)
+        call_command('seed_data', students=60, votes=True, stdout=StringIO())
+        self.election = Election.objects.get()
+
+    def tallies(self):
+        return dict(ElectionResult.objects.filter(election=self.election).values_list('candidate_id', 'vote_count'))
+
+    def exact(self):
+        return {
+            candidate_id: votes
+            for contestants in tally.position_counts(self.election).values()
+            for candidate_id, votes in contestants
+        }
+
+    def test_workers_match_a_full_recount(self):
+        ElectionResult.objects.all().delete()
+        DelegateResult.objects.all().delete()
+        call_command('compute_results', workers=4, stdout=StringIO())
+        threaded = (self.tallies(), dict(DelegateResult.objects.values_list('delegate_id', 'vote_count')))
+        call_command('compute_results', stdout=StringIO())
+        self.assertEqual(threaded, (self.tallies(), dict(DelegateResult.objects.values_list('delegate_id', 'vote_count'))))
+        self.assertEqual(self.tallies(), self.exact())
+
+    def test_incremental_recounts_only_changed_positions(self):
+        vote = MainVote.objects.filter(election=self.election).select_related('candidate').first()
+        other = ElectionResult.objects.filter(election=self.election).exclude(candidate__position=vote.position_id).first()
+        vote.delete()
+        call_command('compute_results', stdout=StringIO())
+
+        # A vote arrives without touching the tallies, and an untouched position drifts
+        vote.pk = None
+        vote.save()
+        ElectionResult.objects.filter(pk=other.pk).update(vote_count=999)
+        out = StringIO()
+        call_command('compute_results', incremental=True, workers=2, stdout=out)
+        self.assertIn('1 positions', out.getvalue())
+
+        tallies = self.tallies()
+        self.assertEqual(tallies[vote.candidate_id], self.exact()[vote.candidate_id])
+        self.assertEqual(tallies[other.candidate_id], 999)
+
+
+@override_settings(VOTING_SETTINGS={**settings.VOTING_SETTINGS, 'TRUSTED_PROXIES': ['10.0.0.0/24']})
+class ClientIpTests(SimpleTestCase):
+    """X-Forwarded-For is believed only as far as trusted proxies and valid addresses go"""
+
+    def resolve(self, remote_addr, forwarded=None):
+        meta = {'REMOTE_ADDR': remote_addr}
+        if forwarded is not None:
+            meta['HTTP_X_FORWARDED_FOR'] = forwarded
+        return resolve_client_ip(meta)
+
+    def test_header_ignored_from_untrusted_peer(self):
+        self.assertEqual(self.resolve('203.0.113.9', '198.51.100.1'), '203.0.113.9')
+
+    def test_walks_back_through_trusted_proxies(self):
+        self.assertEqual(self.resolve('10.0.0.1', '1.2.3.4, 198.51.100.7, 10.0.0.2'), '198.51.100.7')
+
+    def test_malformed_hop_falls_back_to_last_valid_hop(self):
+        self.assertEqual(self.resolve('10.0.0.1', 'not-an-ip'), '10.0.0.1')
+        self.assertEqual(self.resolve('10.0.0.1', '198.51.100.7, garbage, 10.0.0.2'), '10.0.0.2')
+        self.assertEqual(self.resolve('10.0.0.1', '198.51.100.7<script>'), '10.0.0.1')
+
+    def test_ipv6_hop(self):
+        self.assertEqual(self.resolve('10.0.0.1', '2001:db8::1'), '2001:db8::1')
+
+
+class AllowListTests(SimpleTestCase):
+    """Addresses are matched against CIDR networks of either IP version"""
+
+    def test_ipv4_networks_and_addresses(self):
+        allowed = allowlist.AllowList(['10.12.0.0/16', '192.168.1.7', '10.13.0.0/16'])
+        self.assertIn('10.12.255.1', allowed)
+        self.assertIn('10.13.0.0', allowed)
+        self.assertIn('192.168.1.7', allowed)
+        self.assertNotIn('192.168.1.8', allowed)
+        self.assertNotIn('10.14.0.1', allowed)
+        self.assertNotIn('10.11.255.255', allowed)
+
+    def test_ipv6_networks(self):
+        allowed = allowlist.AllowList(['2001:db8:42::/48', '10.0.0.0/8'])
+        self.assertIn('2001:db8:42::1', allowed)
+        self.assertIn('2001:db8:42:ffff::9', allowed)
+        self.assertNotIn('2001:db8:43::1', allowed)
+        # Versions are kept apart: an IPv6 address with the same integer value is not a match
+        self.assertNotIn('::a00:1', allowed)
+
+    def test_ipv4_mapped_addresses_match_ipv4_networks(self):
+        allowed = allowlist.AllowList(['10.0.0.0/8'])
+        self.assertIn('::ffff:10.1.2.3', allowed)
+        self.assertNotIn('::ffff:11.1.2.3', allowed)
+
+    def test_invalid_entries_and_addresses_are_ignored(self):
+        with self.assertLogs('voting', 'ERROR'):
+            allowed = allowlist.AllowList(['not-a-network', '', '10.0.0.0/33', '10.0.0.1'])
+        self.assertTrue(allowed)
+        self.assertIn('10.0.0.1', allowed)
+        self.assertNotIn('garbage', allowed)
+        self.assertNotIn('', allowed)
+        self.assertFalse(allowlist.AllowList([]))
+        self.assertFalse(allowlist.AllowList(['', ' ']))
+
+    def test_only_invalid_entries_match_nothing(self):
+        with self.assertLogs('voting', 'ERROR'):
+            allowed = allowlist.AllowList(['10.0.0.0/33'])
+        # Still in force: a typo must not open the system to every address
+        self.assertTrue(allowed)
+        self.assertNotIn('10.0.0.1', allowed)
+        self.assertNotIn('::1', allowed)
+
+
+@inline_voting(ALLOWED_VOTING_IPS=['10.12.0.0/16', '2001:db8::/32'])
+class AllowedIpMiddlewareTests(TestCase):
+    """Requests from outside ALLOWED_VOTING_IPS are refused and audited once per interval"""
+
+    def setUp(self):
+        cache.clear()
+
+    def test_requests_inside_the_networks_pass(self):
+        self.assertEqual(self.client.get(reverse('login'), REMOTE_ADDR='10.12.3.4').status_code, 200)
+        self.assertEqual(self.client.get(reverse('login'), REMOTE_ADDR='2001:db8:1::5').status_code, 200)
+
+    def test_requests_outside_are_refused_and_logged_once(self):
+        for _ in range(3):
+            self.assertEqual(self.client.get(reverse('login'), REMOTE_ADDR='10.13.0.1').status_code, 403)
+        self.assertEqual(self.client.get(reverse('login'), REMOTE_ADDR='2001:db9::1').status_code, 403)
+        self.assertEqual(
+            sorted(VoteAuditLog.objects.filter(action_type='security_violation').values_list('ip_address', flat=True)),
+            ['10.13.0.1', '2001:db9::1'],
+        )
+
+    def test_misconfigured_list_refuses_everyone(self):
+        with self.settings(VOTING_SETTINGS={**settings.VOTING_SETTINGS, 'ALLOWED_VOTING_IPS': ['10.12.0.0/33']}):
+            with self.assertLogs('voting', 'ERROR'):
+                response = self.client.get(reverse('login'), REMOTE_ADDR='10.12.3.4')
+            self.assertEqual(response.status_code, 403)
+
+
+@inline_voting()
+class AsyncVoteViewTests(SeededElectionMixin, TestCase):
+    """The async vote views answer exactly as the sync ones, from the same validation"""
+    STUDENTS = 80
+
+    async def apost(self, view, user, data):
+        request = AsyncRequestFactory().post('/vote/', data, content_type='application/json')
+        request._dont_enforce_csrf_checks = True
+        request.user = user
+
+        async def auser():
+            return user
+        request.auser = auser
+        return await view(request)
+
+    async def test_delegate_vote(self):
+        await sync_to_async(self.set_phase)('delegate_voting')
+        data = {'delegate_id': self.delegate.id}
+        response = await self.apost(async_views.vote_for_delegate, self.student, data)
+        self.assertEqual(response.status_code, 200, response.content)
+        self.assertTrue(json.loads(response.content)['success'])
+        self.assertTrue(await DelegateVote.objects.filter(voter=self.student, delegate=self.delegate).aexists())
+        # A retry of the same vote still succeeds
+        response = await self.apost(async_views.vote_for_delegate, self.student, data)
+        self.assertEqual(response.status_code, 200)
+
+    async def test_errors_match_the_sync_view(self):
+        await sync_to_async(self.set_phase)('delegate_voting')
+        outsider = await Delegate.objects.exclude(department_id=self.student.department_id).filter(is_approved=True).afirst()
+        for data, status in (({'delegate_id': 999999}, 404), ({'delegate_id': outsider.id}, 403), ({}, 400)):
+            response = await self.apost(async_views.vote_for_delegate, self.student, data)
+            expected = await sync_to_async(self.post_json)(self.student, 'vote_delegate', data)
+            self.assertEqual(response.status_code, status)
+            self.assertEqual(expected.status_code, status)
+            self.assertEqual(json.loads(response.content), expected.json())
+
+    async def test_candidate_vote(self):
+        await sync_to_async(self.set_phase)('main_voting')
+        response = await self.apost(async_views.vote_for_candidate, self.student, {'candidate_id': self.candidate.id})
+        self.assertEqual(response.status_code, 403)
+        response = await self.apost(async_views.vote_for_candidate, self.delegate.student, {'candidate_id': self.candidate.id})
+        self.assertEqual(response.status_code, 200, response.content)
+        self.assertTrue(await MainVote.objects.filter(delegate=self.delegate, candidate=self.candidate).aexists())
+
+
+@inline_voting()
+class SchedulerTests(SeededElectionMixin, TestCase):
+    """Phases move forward on schedule, once, and every worker hears about it"""
+    STUDENTS = 80
+
+    def schedule(self, phase, delegate_voting_in):
+        now = timezone.now()
+        start = now + timedelta(seconds=delegate_voting_in)
+        Election.objects.filter(pk=self.election.pk).update(
+            current_phase=phase,
+            delegate_voting_start=start,
+            delegate_voting_end=start + timedelta(hours=1),
+            main_voting_start=start + timedelta(hours=1),
+            main_voting_end=start + timedelta(hours=2),
+        )
+        self.election.refresh_from_db()
+        return now
+
+    def test_tick_warms_then_advances(self):
+        now = self.schedule('registration', 60)
+        self.assertEqual(election_cache.get_active_election().current_phase, 'registration')
+        messages = [message for _, message in scheduler.tick(now)]
+        self.assertTrue(any('ahead of delegate_voting' in message for message in messages), messages)
+        self.assertTrue(VoterRoll.objects.filter(election=self.election).exists())
+        self.assertEqual(Election.objects.get().current_phase, 'registration')
+
+        messages = [message for _, message in scheduler.tick(now + timedelta(seconds=61))]
+        self.assertIn('moved to delegate_voting', messages)
+        self.assertEqual(Election.objects.get().current_phase, 'delegate_voting')
+        # The compare-and-set update sends post_save, so cached copies are dropped at once
+        self.assertEqual(election_cache.get_active_election().current_phase, 'delegate_voting')
+
+    def test_phase_set_by_hand_is_never_undone(self):
+        now = self.schedule('main_voting', -60)
+        self.assertEqual(scheduler.tick(now), [])
+        self.assertEqual(Election.objects.get().current_phase, 'main_voting')
+
+    def test_only_one_scheduler_moves_a_phase(self):
+        self.schedule('registration', -60)
+        first, second = Election.objects.get(), Election.objects.get()
+        with mock.patch('voting.signals.election_cache.invalidate') as invalidate:
+            self.assertTrue(scheduler.advance(first, 'delegate_voting'))
+            # The second scheduler read the old phase; its compare-and-set finds it gone
+            self.assertFalse(scheduler.advance(second, 'delegate_voting'))
+            self.assertFalse(scheduler.advance(second, 'main_voting'))
+        invalidate.assert_called_once_with()
+        self.assertEqual(Election.objects.get().current_phase, 'delegate_voting')
+
+    def test_results_are_recounted_when_voting_closes(self):
+        now = self.schedule('main_voting', -7200)
+        scheduler.tick(now + timedelta(seconds=1))
+        self.assertEqual(Election.objects.get().current_phase, 'results')
+        self.assertEqual(
+            ElectionResult.objects.filter(election=self.election).count(),
+            Candidate.objects.filter(is_approved=True).count(),
+        )
+
+    def test_command_refuses_a_per_process_cache(self):
+        with self.assertRaisesMessage(CommandError, 'REDIS_URL'):
+            call_command('run_scheduler', '--once', stdout=StringIO())
+        with tempfile.TemporaryDirectory() as location:
+            with override_settings(CACHES={'default': {
+                'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache', 'LOCATION': location,
+            }}):
+                call_command('run_scheduler', '--once', stdout=StringIO())
+
+
+@inline_voting()
+class TurnoutCounterTests(SeededElectionMixin, TestCase):
+    """Counters run only in a shared cache and never save a count that lost entries"""
+    STUDENTS = 80
+
+    def vote(self):
+        self.set_phase('delegate_voting')
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.post_json(self.student, 'vote_delegate', {'delegate_id': self.delegate.id})
+        self.assertEqual(response.status_code, 200)
+
+    def saved(self):
+        return DepartmentTurnout.objects.get(election=self.election, department_id=self.student.department_id)
+
+    def test_per_process_cache_counts_the_vote_tables(self):
+        self.vote()
+        keys = [
+            turnout._key(self.election.id, 'delegate_votes', self.student.department_id, shard)
+            for shard in range(turnout._shards())
+        ]
+        self.assertEqual(cache.get_many(keys), {})
+        self.assertEqual(
+            turnout.totals(self.election)['delegate_votes'],
+            DelegateVote.objects.filter(election=self.election).count(),
+        )
+        # The count is shared for LIVE_INTERVAL rather than repeated on every refresh
+        with self.assertNumQueries(0):
+            turnout.totals(self.election)
+        turnout.persist(self.election)
+        self.assertEqual(self.saved().delegate_votes, 1)
+
+    @mock.patch('voting.sharedcache.is_shared', return_value=True)
+    def test_lost_counters_are_not_saved(self, is_shared):
+        self.vote()
+        turnout.persist(self.election)
+        self.assertEqual(self.saved().delegate_votes, 1)
+
+        # Evicted counters, while the seeded flag survives
+        cache.delete_many([
+            turnout._key(self.election.id, kind, department.id, shard)
+            for department in self.student.faculty.departments.all()
+            for kind in turnout.KINDS for shard in range(turnout._shards())
+        ])
+        with self.assertLogs('voting', 'WARNING'):
+            turnout.persist(self.election)
+        self.assertEqual(self.saved().delegate_votes, 1)
+
+        self.assertEqual(len(turnout.reconcile(self.election)), 1)
+        self.assertEqual(self.saved().delegate_votes, 1)
+        self.assertEqual(turnout.counts(self.election)[self.student.department_id]['delegate_votes'], 1)
+
+
+@override_settings(PASSWORD_HASHERS=FAST_HASHERS)
+class ImportStudentsTests(SeededElectionMixin, TestCase):
+    """The roster import rejects bad rows, hashes only changed passwords and keeps the roll in step"""
+    STUDENTS = 80
+    COLUMNS = ['registration_number', 'birth_certificate_number', 'programme_code', 'first_name', 'year_of_study']
+
+    def setUp(self):
+        super().setUp()
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.path = f"{directory.name}/roster.csv"
+
+    def run_import(self, rows, *args):
+        with open(self.path, 'w', newline='') as roster:
+            writer = csv.writer(roster)
+            writer.writerow(self.COLUMNS)
+            writer.writerows(rows)
+        out, err = StringIO(), StringIO()
+        call_command('import_students', self.path, '--workers', '1', *args, stdout=out, stderr=err)
+        return out.getvalue(), err.getvalue()
+
+    def row(self, student, **values):
+        return [
+            values.get('registration_number', student.registration_number),
+            values.get('birth_certificate_number', student.birth_certificate_number),
+            values.get('programme_code', student.programme.code),
+            values.get('first_name', student.first_name),
+            values.get('year_of_study', '2'),
+        ]
+
+    def test_invalid_rows_are_rejected(self):
+        out, err = self.run_import([
+            self.row(self.student, registration_number='bad-number'),
+            self.row(self.student, registration_number='ZZ999/0001/2024', programme_code='NO-SUCH-CODE'),
+            self.row(self.student, registration_number='ZZ999/0002/2024', year_of_study='9'),
+            self.row(self.student, registration_number='ZZ999/0003/2024'),
+        ])
+        self.assertIn("invalid registration number 'bad-number'", err)
+        self.assertIn("programme code 'NO-SUCH-CODE' does not exist", err)
+        self.assertIn("invalid year of study '9'", err)
+        self.assertIn('1 created, 0 updated, 1 passwords hashed, 3 rows with errors', out)
+        self.assertEqual(
+            list(Student.objects.filter(registration_number__startswith='ZZ999').values_list('registration_number', flat=True)),
+            ['ZZ999/0003/2024'],
+        )
+
+    def test_repeated_row_in_a_batch(self):
+        out, err = self.run_import([
+            self.row(self.student, registration_number='ZZ999/0001/2024', first_name='First'),
+            self.row(self.student, registration_number='ZZ999/0001/2024', first_name='Second'),
+        ])
+        self.assertIn('repeats an earlier row', err)
+        self.assertIn('1 created', out)
+        self.assertEqual(Student.objects.get(registration_number='ZZ999/0001/2024').first_name, 'Second')
+
+    def test_unchanged_birth_certificate_keeps_the_hash(self):
+        password = self.student.password
+        out, _ = self.run_import([self.row(self.student, first_name='Renamed')])
+        self.assertIn('0 created, 1 updated, 0 passwords hashed', out)
+        self.student.refresh_from_db()
+        self.assertEqual(self.student.first_name, 'Renamed')
+        self.assertEqual(self.student.password, password)
+
+    def test_changed_birth_certificate_is_rehashed(self):
+        out, _ = self.run_import([self.row(self.student, birth_certificate_number='87654321')])
+        self.assertIn('1 passwords hashed', out)
+        self.student.refresh_from_db()
+        self.assertTrue(self.student.check_password('87654321'))
+
+    def test_dry_run_writes_nothing(self):
+        password = self.student.password
+        out, _ = self.run_import([
+            self.row(self.student, birth_certificate_number='87654321'),
+            self.row(self.student, registration_number='ZZ999/0001/2024'),
+        ], '--dry-run')
+        self.assertIn('Validated roster', out)
+        self.assertFalse(Student.objects.filter(registration_number='ZZ999/0001/2024').exists())
+        self.student.refresh_from_db()
+        self.assertEqual(self.student.password, password)
+
+    def test_programme_move_updates_the_voter_roll(self):
+        roll.build(self.election)
+        programme = Programme.objects.exclude(department_id=self.student.department_id).first()
+        self.run_import([self.row(self.student, programme_code=programme.code)])
+        entry = VoterRoll.objects.get(election=self.election, student=self.student)
+        self.assertEqual(entry.department_id, programme.department_id)
+
+
+@override_settings(
+    VOTING_SETTINGS={**settings.VOTING_SETTINGS, 'AUDIT_WRITER': 'sync', 'STUDENT_HASH_ITERATIONS': 2000}
+)
+class BulkSeedTests(TestCase):
+    """seed_data --bulk --fast-hashing produces the same loginable dataset as the default path"""
+    STUDENTS = 40
+
+    @classmethod
+    def setUpTestData(cls):
+        random.seed(2024)
+        call_command(
+            'seed_data', students=cls.STUDENTS, bulk=True, fast_hashing=True, chunk_size=15,
+            stdout=StringIO()
+        )
+
+    def setUp(self):
+        cache.clear()
+
+    def test_counts(self):
+        election = Election.objects.get()
+        self.assertEqual(Student.objects.count(), self.STUDENTS)
+        self.assertEqual(VoterRoll.objects.filter(election=election).count(), self.STUDENTS)
+        self.assertTrue(Delegate.objects.exists())
+        self.assertEqual(
+            Delegate.objects.exclude(department_id=F('student__department_id')).count(), 0
+        )
+        self.assertTrue(Candidate.objects.exists())
+
+    def test_students_carry_their_programme_department(self):
+        self.assertFalse(Student.objects.filter(department__isnull=True).exists())
+        self.assertFalse(Student.objects.exclude(department_id=F('programme__department_id')).exists())
+
+    def test_first_login_upgrades_the_fast_hash(self):
+        student = Student.objects.first()
+        self.assertTrue(student.password.startswith('pbkdf2_sha256$1000$'), student.password)
+        response = self.client.post(reverse('login'), {
+            'registration_number': student.registration_number,
+            'birth_certificate_number': student.birth_certificate_number,
+        })
+        self.assertRedirects(response, reverse('dashboard'), fetch_redirect_response=False)
+        student.refresh_from_db()
+        self.assertTrue(student.password.startswith('pbkdf2_sha256$2000$'), student.password)
+
+
+@override_settings(VOTING_SETTINGS={**settings.VOTING_SETTINGS, 'STUDENT_HASH_ITERATIONS': 1000})
+class StudentBackendTests(TestCase):
+    """Recently verified logins skip the hasher until the password, hash or TTL says otherwise"""
+    PASSWORD = '11112222'
+
+    def setUp(self):
+        credentials.clear()
+        self.addCleanup(credentials.clear)
+        self.student = Student.objects.create_user(
+            'SC100/0001/2024', self.PASSWORD, first_name='Test', last_name='Student'
+        )
+
+    def authenticate(self, password=PASSWORD):
+        return authenticate(None, username=self.student.registration_number, password=password)
+
+    def checks(self):
+        """Count check_password calls while still running the real hasher"""
+        return mock.patch.object(Student, 'check_password', autospec=True, side_effect=Student.check_password)
+
+    def test_cache_hit_skips_the_hasher(self):
+        self.assertEqual(self.authenticate(), self.student)
+        with self.checks() as check_password:
+            self.assertEqual(self.authenticate(), self.student)
+        check_password.assert_not_called()
+
+    def test_wrong_password_drops_the_entry(self):
+        self.authenticate()
+        self.assertIsNone(self.authenticate('00000000'))
+        with self.checks() as check_password:
+            self.assertEqual(self.authenticate(), self.student)
+        check_password.assert_called_once()
+
+    def test_password_change_invalidates_the_entry(self):
+        self.authenticate()
+        self.student.set_password('33334444')
+        self.student.save()
+        self.assertIsNone(self.authenticate())
+        self.assertEqual(self.authenticate('33334444'), self.student)
+
+    def test_rehash_invalidates_the_entry(self):
+        self.authenticate()
+        # Same password, new salt: the entry was bound to the old hash
+        self.student.set_password(self.PASSWORD)
+        self.student.save()
+        with self.checks() as check_password:
+            self.assertEqual(self.authenticate(), self.student)
+        check_password.assert_called_once()
+
+    def test_entries_expire(self):
+        self.authenticate()
+        later = time.monotonic() + settings.VOTING_SETTINGS['CREDENTIAL_CACHE_TTL'] + 1
+        with self.checks() as check_password, mock.patch('voting.backends.time.monotonic', return_value=later):
+            self.assertEqual(self.authenticate(), self.student)
+        check_password.assert_called_once()
+
+    def test_zero_ttl_disables_the_cache(self):
+        with self.settings(VOTING_SETTINGS={**settings.VOTING_SETTINGS, 'CREDENTIAL_CACHE_TTL': 0}):
+            self.authenticate()
+            with self.checks() as check_password:
+                self.assertEqual(self.authenticate(), self.student)
+        check_password.assert_called_once()
+
+    def test_login_rehashes_to_the_configured_work_factor(self):
+        self.assertTrue(self.student.password.startswith('pbkdf2_sha256$1000$'))
+        for iterations in (2000, 500):
+            credentials.clear()
+            with self.settings(VOTING_SETTINGS={**settings.VOTING_SETTINGS, 'STUDENT_HASH_ITERATIONS': iterations}):
+                self.assertEqual(self.authenticate(), self.student)
+            self.student.refresh_from_db()
+            self.assertTrue(self.student.password.startswith(f'pbkdf2_sha256${iterations}$'), self.student.password)
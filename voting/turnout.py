@@ -0,0 +1,268 @@
+# voting/turnout.py
+import logging
+import random
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Count
+
+from . import sharedcache
+from .models import Department, DelegateVote, DepartmentTurnout, MainVote, Student, VoterRoll
+
+logger = logging.getLogger('voting')
+
+KINDS = ('delegate_votes', 'main_votes')
+
+# Seconds the department list and eligible counts are reused
+LAYOUT_TIMEOUT = 300
+
+
+def counting():
+    """Whether votes are counted in the cache; per-process counters would disagree between workers"""
+    return sharedcache.is_shared()
+
+
+def _shards():
+    return max(settings.VOTING_SETTINGS.get('TURNOUT_SHARDS', 8), 1)
+
+
+def _key(election_id, kind, department_id, shard):
+    return f"turnout_{election_id}_{kind}_{department_id}_{shard}"
+
+
+def _add(election_id, kind, department_id, amount, shard=None):
+    """Add to one shard of a counter; concurrent voters in a department mostly hit different keys"""
+    if shard is None:
+        shard = random.randrange(_shards())
+    key = _key(election_id, kind, department_id, shard)
+    try:
+        try:
+            cache.incr(key, amount)
+        except ValueError:
+            # First vote on this shard; another worker may create it at the same moment
+            if not cache.add(key, amount, None):
+                cache.incr(key, amount)
+    except Exception as e:
+        # The vote is saved; reconcile_turnout corrects the counter
+        logger.error(f"Failed to update turnout counter {key}: {str(e)}")
+
+
+def record_delegate_vote(election, department_id):
+    """Count a delegate vote once the transaction that saves it commits"""
+    if department_id and counting():
+        transaction.on_commit(lambda: _add(election.id, 'delegate_votes', department_id, 1))
+
+
+def record_main_votes(election, department_id, count=1):
+    """Count main votes once the transaction that saves them commits"""
+    if department_id and count and counting():
+        transaction.on_commit(lambda: _add(election.id, 'main_votes', department_id, count))
+
+
+def _seed(election):
+    """Load the persisted counts into a cache that has lost them, e.g. after a restart
+
+    Seeding adds to whatever votes were counted since, so it never races
+    with them; votes after the last persist are restored by reconcile_turnout.
+    """
+    if not cache.add(f"turnout_seeded_{election.id}", True, None):
+        return
+    for row in DepartmentTurnout.objects.filter(election=election):
+        for kind in KINDS:
+            if getattr(row, kind):
+                _add(election.id, kind, row.department_id, getattr(row, kind), shard=0)
+
+
+def layout(election):
+    """Departments with their faculty and eligible voters, from the roll once it is built"""
+    key = f"turnout_layout_{election.id}"
+    departments = cache.get(key)
+    if departments is None:
+        eligible = dict(
+            VoterRoll.objects.filter(election=election, is_eligible=True)
+            .values('department_id').annotate(count=Count('id')).values_list('department_id', 'count')
+        ) or dict(
+            Student.objects.filter(is_active=True, is_staff=False)
+            .values('department_id').annotate(count=Count('id')).values_list('department_id', 'count')
+        )
+        departments = [
+            {
+                'id': department_id,
+                'name': name,
+                'faculty_id': faculty_id,
+                'faculty': faculty,
+                'eligible': eligible.get(department_id, 0),
+            }
+            for department_id, name, faculty_id, faculty in Department.objects.order_by(
+                'faculty__name', 'name'
+            ).values_list('id', 'name', 'faculty_id', 'faculty__name')
+        ]
+        cache.set(key, departments, LAYOUT_TIMEOUT)
+    return departments
+
+
+def counts(election, departments=None):
+    """Live counts per department, summed over the shards in one cache read"""
+    if departments is None:
+        departments = layout(election)
+    if not counting():
+        # Without a shared cache the vote tables are the only count every process agrees on;
+        # like the live snapshot, one count serves every request for LIVE_INTERVAL seconds
+        key = f"turnout_exact_{election.id}"
+        exact = cache.get(key)
+        if exact is None:
+            exact = exact_counts(election)
+            cache.set(key, exact, settings.VOTING_SETTINGS.get('LIVE_INTERVAL', 2))
+        return {
+            department['id']: exact.get(department['id'], dict.fromkeys(KINDS, 0))
+            for department in departments
+        }
+    _seed(election)
+    shards = range(_shards())
+    keys = [
+        _key(election.id, kind, department['id'], shard)
+        for department in departments for kind in KINDS for shard in shards
+    ]
+    values = cache.get_many(keys)
+    return {
+        department['id']: {
+            kind: sum(values.get(_key(election.id, kind, department['id'], shard), 0) for shard in shards)
+            for kind in KINDS
+        }
+        for department in departments
+    }
+
+
+def _percentage(voted, eligible):
+    return round(voted * 100 / eligible, 2) if eligible else 0
+
+
+def board(election):
+    """Turnout per faculty and department for the turnout board, read from the counters alone"""
+    departments = layout(election)
+    live = counts(election, departments)
+    faculties = {}
+    overall = {'eligible': 0, 'delegate_votes': 0, 'main_votes': 0}
+    for department in departments:
+        row = {'id': department['id'], 'name': department['name'], 'eligible': department['eligible'], **live[department['id']]}
+        row['percentage'] = _percentage(row['delegate_votes'], row['eligible'])
+        faculty = faculties.setdefault(department['faculty_id'], {
+            'id': department['faculty_id'],
+            'name': department['faculty'],
+            'eligible': 0,
+            'delegate_votes': 0,
+            'main_votes': 0,
+            'departments': [],
+        })
+        faculty['departments'].append(row)
+        for field in overall:
+            faculty[field] += row[field]
+            overall[field] += row[field]
+    for faculty in faculties.values():
+        faculty['percentage'] = _percentage(faculty['delegate_votes'], faculty['eligible'])
+    overall['percentage'] = _percentage(overall['delegate_votes'], overall['eligible'])
+    return {
+        'election': {
+            'id': election.id,
+            'name': election.name,
+            'current_phase': election.current_phase,
+        },
+        **overall,
+        'faculties': list(faculties.values()),
+    }
+
+
+def totals(election):
+    """Election-wide eligible voters and vote counts from the counters"""
+    departments = layout(election)
+    live = counts(election, departments)
+    return {
+        'eligible': sum(department['eligible'] for department in departments),
+        **{kind: sum(row[kind] for row in live.values()) for kind in KINDS},
+    }
+
+
+def persist(election, live=None):
+    """Write the live counters to DepartmentTurnout; returns the number of departments written
+
+    A counter below its saved value has lost cache entries rather than votes,
+    so that department keeps its saved row until reconcile passes exact counts.
+    """
+    departments = layout(election)
+    if live is None:
+        live = counts(election, departments)
+        saved = {
+            row['department_id']: row
+            for row in DepartmentTurnout.objects.filter(election=election).values('department_id', *KINDS)
+        }
+        lost = [
+            department for department in departments
+            if any(live[department['id']][kind] < saved.get(department['id'], {}).get(kind, 0) for kind in KINDS)
+        ]
+        if lost:
+            logger.warning(
+                f"Turnout counters for {len(lost)} departments of {election.name} are below their saved "
+                f"values; not saving them until reconcile_turnout runs"
+            )
+            departments = [department for department in departments if department not in lost]
+    DepartmentTurnout.objects.bulk_create(
+        [
+            DepartmentTurnout(election=election, department_id=department['id'], eligible=department['eligible'], **live[department['id']])
+            for department in departments
+        ],
+        update_conflicts=True,
+        unique_fields=['election', 'department'],
+        update_fields=['eligible', 'delegate_votes', 'main_votes', 'last_updated'],
+    )
+    return len(departments)
+
+
+def exact_counts(election):
+    """Counts per department from the vote tables"""
+    exact = {}
+    delegate_votes = (
+        DelegateVote.objects.filter(election=election)
+        .values('voter__department_id').annotate(count=Count('id'))
+        .values_list('voter__department_id', 'count')
+    )
+    main_votes = (
+        MainVote.objects.filter(election=election)
+        .values('delegate__department_id').annotate(count=Count('id'))
+        .values_list('delegate__department_id', 'count')
+    )
+    for kind, rows in (('delegate_votes', delegate_votes), ('main_votes', main_votes)):
+        for department_id, count in rows:
+            if department_id:
+                exact.setdefault(department_id, dict.fromkeys(KINDS, 0))[kind] = count
+    return exact
+
+
+def reconcile(election, apply=True):
+    """Compare the counters with the vote tables and correct any drift
+
+    Corrections are added rather than set, so votes counted while this runs
+    are kept; a vote committed mid-run can still leave a difference of one,
+    which the next run fixes. Returns (department id, kind, live, exact) for
+    each counter that was off.
+    """
+    departments = layout(election)
+    exact = exact_counts(election)
+    # Compare with the counters, not with an exact count reused from earlier
+    cache.delete(f"turnout_exact_{election.id}")
+    live = counts(election, departments)
+    drift = []
+    for department in departments:
+        for kind in KINDS:
+            counted = live[department['id']][kind]
+            actual = exact.get(department['id'], {}).get(kind, 0)
+            if counted != actual:
+                drift.append((department['id'], kind, counted, actual))
+                if apply and counting():
+                    _add(election.id, kind, department['id'], actual - counted, shard=0)
+    if apply:
+        persist(election, {
+            department['id']: {kind: exact.get(department['id'], {}).get(kind, 0) for kind in KINDS}
+            for department in departments
+        })
+        logger.info(f"Reconciled turnout for {election.name}: {len(drift)} counters corrected")
+    return drift
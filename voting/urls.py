@@ -1,7 +1,13 @@
 # Voting app URLs (voting/urls.py)
+from django.conf import settings
 from django.urls import path
 from . import views
 
+if settings.VOTING_SETTINGS.get('ASYNC_VIEWS'):
+    from . import async_views as api_views
+else:
+    api_views = views
+
 
 urlpatterns = [
     # Authentication URLs
@@ -14,11 +20,17 @@ urlpatterns = [
     path('results/', views.election_results_view, name='results'),
     
     # Voting URLs
-    path('vote/delegate/', views.vote_for_delegate, name='vote_delegate'),
-    path('vote/candidate/', views.vote_for_candidate, name='vote_candidate'),
+    path('vote/delegate/', api_views.vote_for_delegate, name='vote_delegate'),
+    path('vote/candidate/', api_views.vote_for_candidate, name='vote_candidate'),
 
     # Status and information APIs
-    path('status/', views.voting_status_api, name='voting_status'),
-    path('candidates/', views.candidates_api, name='candidates'),
-    path('delegates/', views.delegates_api, name='delegates'),
+    path('status/', api_views.voting_status_api, name='voting_status'),
+    path('candidates/', api_views.candidates_api, name='candidates'),
+    path('delegates/', api_views.delegates_api, name='delegates'),
+    path('ballot/', views.ballot_view, name='ballot'),
+    path('live/', views.live_events, name='live_events'),
+    path('turnout/', views.turnout_view, name='turnout'),
+
+    # Returning officer exports
+    path('export/<str:name>/', views.export_view, name='export'),
 ]
@@ -1,37 +1,94 @@
 # voting/utils.py
+import ipaddress
 import logging
+from concurrent.futures import ProcessPoolExecutor
+import django
 from django.conf import settings
+from django.contrib.auth.hashers import PBKDF2PasswordHasher, make_password
 from .models import VoteAuditLog
+from . import allowlist, audit, roll
+
+def resolve_client_ip(meta):
+    """Client address from REMOTE_ADDR and the X-Forwarded-For hops added by trusted proxies
+
+    X-Forwarded-For is read right to left and only while each hop was added
+    by a trusted proxy, so a client cannot choose its own address by
+    sending the header itself. A hop that is not an IP address ends the walk
+    at the last address a trusted proxy reported.
+    """
+    ip = (meta.get('REMOTE_ADDR') or '').strip()
+    trusted = allowlist.trusted_proxies()
+    if not trusted or ip not in trusted:
+        return ip
+    forwarded = [hop.strip() for hop in meta.get('HTTP_X_FORWARDED_FOR', '').split(',') if hop.strip()]
+    for hop in reversed(forwarded):
+        try:
+            ipaddress.ip_address(hop)
+        except ValueError:
+            break
+        ip = hop
+        if hop not in trusted:
+            break
+    return ip
 
 def get_client_ip(request):
-    """Get client IP address from request"""
-    x_forwarded_for = request.META.get('HTTP_X_FORWARDED_FOR')
-    if x_forwarded_for:
-        ip = x_forwarded_for.split(',')[0]
-    else:
-        ip = request.META.get('REMOTE_ADDR')
+    """Get client IP address from request, resolving it once per request"""
+    ip = getattr(request, 'client_ip', None)
+    if ip is None:
+        ip = request.client_ip = resolve_client_ip(request.META)
     return ip
 
-def create_audit_log(action_type, description, ip_address, user_agent='', student=None, success=True):
-    """Create an audit log entry"""
+def create_audit_log(action_type, description, ip_address, user_agent='', student=None, success=True, durable=False):
+    """Create an audit log entry; durable entries are written before returning"""
     try:
-        VoteAuditLog.objects.create(
+        audit.record(VoteAuditLog(
             student=student,
             action_type=action_type,
             description=description,
             ip_address=ip_address,
             user_agent=user_agent,
             success=success
-        )
+        ), durable=durable)
     except Exception as e:
         logging.getLogger('voting').error(f"Failed to create audit log: {str(e)}")
+        if durable:
+            # A vote must not commit without its audit entry; let its transaction roll back
+            raise
 
-def check_voting_eligibility(student, election_type='delegate'):
-    """Check if student is eligible to vote"""
+def check_voting_eligibility(student, election_type='delegate', election=None, roll_entry=None):
+    """Check if student is eligible to vote, against the election's voter roll when given"""
     if not student.is_active:
         return False, "Your account is inactive"
     
-    # Add additional eligibility checks here
-    # e.g., check if student is in good academic standing, has paid fees, etc.
+    # Further rules (academic standing, fees) are applied when the roll is built
+    if roll_entry is None and election is not None:
+        roll_entry = roll.entry(election, student)
+    if roll_entry is not None and not roll_entry.is_eligible:
+        return False, "You are not on the voter roll for this election"
     
-    return True, "Eligible to vote"
\ No newline at end of file
+    return True, "Eligible to vote"
+
+# Work factor for hash_passwords(fast=True); such hashes are upgraded to the
+# configured hasher the first time the student logs in
+FAST_HASH_ITERATIONS = 1000
+
+def hash_passwords(passwords, workers=None, fast=False, chunksize=64, executor=None):
+    """Hash many passwords, in parallel across processes or with a cheap test-only work factor
+
+    Pass an executor from password_pool() to reuse one pool across batches.
+    """
+    passwords = list(passwords)
+    if fast:
+        hasher = PBKDF2PasswordHasher()
+        return [hasher.encode(password, hasher.salt(), FAST_HASH_ITERATIONS) for password in passwords]
+    if executor is not None:
+        return list(executor.map(make_password, passwords, chunksize=chunksize))
+    if workers == 1 or len(passwords) <= chunksize:
+        return [make_password(password) for password in passwords]
+    with password_pool(workers) as pool:
+        return list(pool.map(make_password, passwords, chunksize=chunksize))
+
+def password_pool(workers=None):
+    """Process pool for hash_passwords"""
+    # Workers set Django up themselves in case they are spawned rather than forked
+    return ProcessPoolExecutor(max_workers=workers, initializer=django.setup)
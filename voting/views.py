@@ -1,28 +1,33 @@
-from django.shortcuts import render, redirect, get_object_or_404
+from django.shortcuts import render, redirect
 from django.contrib.auth import authenticate, login, logout
 from django.contrib.auth.decorators import login_required
 from django.contrib import messages
-from django.http import JsonResponse, HttpResponseForbidden
+from django.http import HttpResponse, HttpResponseNotModified, JsonResponse, HttpResponseForbidden, StreamingHttpResponse
+from django.contrib.admin.views.decorators import staff_member_required
+from django.core.serializers.json import DjangoJSONEncoder
+from django.core.handlers.asgi import ASGIRequest
 from django.views.decorators.http import require_http_methods, require_POST
 from django.views.decorators.csrf import csrf_protect
 from django.utils import timezone
-from django.db import transaction
-from django.db.models import Count, Q
 from django.core.exceptions import ValidationError
 from django.utils.decorators import method_decorator
 from django.views.generic import TemplateView
 from django.core.cache import cache
 from django.conf import settings
+import hashlib
 import logging
 import json
 from datetime import datetime, timedelta
+from functools import wraps
+from asgiref.sync import iscoroutinefunction, sync_to_async
 
 from .models import (
-    Student, Election, Party, Delegate, Candidate, Position,
+    Student, Party, Delegate, Candidate, Position,
     DelegateVote, MainVote, VoteAuditLog, ElectionResult
 )
 from .forms import LoginForm, DelegateVoteForm, MainVoteForm
 from .utils import get_client_ip, create_audit_log, check_voting_eligibility
+from . import ballots, election_cache, exports, ingest, live, ratelimit, roll, tally, turnout
 
 # Set up logging
 logger = logging.getLogger('voting')
@@ -30,7 +35,81 @@ security_logger = logging.getLogger('security')
 
 def get_current_election():
     """Get the currently active election"""
-    return Election.objects.filter(is_active=True).first()
+    return election_cache.get_active_election()
+
+def ballot_response(request, ballot):
+    """Serve a cached ballot's pre-encoded JSON, honouring If-None-Match"""
+    if request.META.get('HTTP_IF_NONE_MATCH') == ballot['etag']:
+        response = HttpResponseNotModified()
+    else:
+        response = HttpResponse(ballot['json'], content_type='application/json')
+    response['ETag'] = ballot['etag']
+    return response
+
+def _idempotency_key(request):
+    key = request.META.get('HTTP_IDEMPOTENCY_KEY')
+    if not key:
+        try:
+            key = json.loads(request.body).get('idempotency_key')
+        except (ValueError, AttributeError):
+            key = None
+    return key
+
+def _idempotency_cache_key(request, view_func, user_pk, key):
+    # Bound to the endpoint and the exact request, so a reused key never replays another vote
+    body = hashlib.sha256(request.body).hexdigest()[:32]
+    return f"vote_idempotency_{view_func.__name__}_{user_pk}_{str(key)[:64]}_{body}"
+
+def _storable(response):
+    # Only final outcomes; a refusal such as a closed phase or a 429 may clear on retry
+    return response.status_code == 200 or getattr(response, 'duplicate_vote', False)
+
+def _replay(stored):
+    return JsonResponse(stored['payload'], status=stored['status'])
+
+def _stored(response):
+    return {'status': response.status_code, 'payload': json.loads(response.content)}
+
+def _idempotency_timeout():
+    return settings.VOTING_SETTINGS.get('IDEMPOTENCY_KEY_TIMEOUT', 86400)
+
+def idempotent_vote(view_func):
+    """Replay the stored response when a client retries with the same idempotency key"""
+    if iscoroutinefunction(view_func):
+        @wraps(view_func)
+        async def async_wrapper(request, *args, **kwargs):
+            key = _idempotency_key(request)
+            if not key:
+                return await view_func(request, *args, **kwargs)
+            
+            user = await request.auser()
+            cache_key = _idempotency_cache_key(request, view_func, user.pk, key)
+            stored = await cache.aget(cache_key)
+            if stored is not None:
+                return _replay(stored)
+            
+            response = await view_func(request, *args, **kwargs)
+            if _storable(response):
+                await cache.aset(cache_key, _stored(response), _idempotency_timeout())
+            return response
+        return async_wrapper
+    
+    @wraps(view_func)
+    def wrapper(request, *args, **kwargs):
+        key = _idempotency_key(request)
+        if not key:
+            return view_func(request, *args, **kwargs)
+        
+        cache_key = _idempotency_cache_key(request, view_func, request.user.pk, key)
+        stored = cache.get(cache_key)
+        if stored is not None:
+            return _replay(stored)
+        
+        response = view_func(request, *args, **kwargs)
+        if _storable(response):
+            cache.set(cache_key, _stored(response), _idempotency_timeout())
+        return response
+    return wrapper
 
 class LoginView(TemplateView):
     template_name = 'login.html'
@@ -49,20 +128,23 @@ class LoginView(TemplateView):
     def post(self, request, *args, **kwargs):
         form = LoginForm(request.POST)
         ip_address = get_client_ip(request)
-        
-        # Check for too many failed attempts
-        cache_key = f"login_attempts_{ip_address}"
-        attempts = cache.get(cache_key, 0)
-        
-        if attempts >= settings.VOTING_SETTINGS['MAX_LOGIN_ATTEMPTS']:
-            security_logger.warning(f"Too many login attempts from {ip_address}")
-            messages.error(request, "Too many failed login attempts. Please try again later.")
-            return render(request, self.template_name, {'form': form})
+        ip_attempts, student_attempts = ratelimit.login_limiters()
         
         if form.is_valid():
             registration_number = form.cleaned_data['registration_number']
             birth_certificate_number = form.cleaned_data['birth_certificate_number']
             
+            # Reserve the attempt before checking the password, so concurrent guesses
+            # cannot all pass the limit while the hasher runs; it is handed back below
+            # unless the password turns out wrong
+            if ip_attempts.hit(ip_address) > ip_attempts.limit:
+                ip_attempts.release(ip_address)
+                return self.throttled(request, form, ip_address)
+            if student_attempts.hit(registration_number) > student_attempts.limit:
+                ip_attempts.release(ip_address)
+                student_attempts.release(registration_number)
+                return self.throttled(request, form, f"{registration_number} from {ip_address}")
+            
             # Authenticate user
             user = authenticate(
                 request,
@@ -71,10 +153,11 @@ class LoginView(TemplateView):
             )
             
             if user is not None:
+                # Not a failed guess; the IP's earlier failures are shared and left to expire
+                ip_attempts.release(ip_address)
                 if user.is_active:
                     login(request, user)
-                    # Clear failed attempts
-                    cache.delete(cache_key)
+                    student_attempts.reset(registration_number)
                     
                     # Update last login IP
                     user.last_login_ip = ip_address
@@ -93,15 +176,10 @@ class LoginView(TemplateView):
                     logger.info(f"Student {registration_number} logged in successfully")
                     return redirect('dashboard')
                 else:
+                    student_attempts.release(registration_number)
                     messages.error(request, "Your account has been deactivated.")
             else:
-                # Increment failed attempts
-                cache.set(
-                    cache_key, 
-                    attempts + 1, 
-                    settings.VOTING_SETTINGS['LOGIN_LOCKOUT_TIME']
-                )
-                
+                # The reserved attempts stay counted as failures
                 create_audit_log(
                     action_type='login_attempt',
                     description=f"Failed login attempt for {registration_number} from {ip_address}",
@@ -114,6 +192,11 @@ class LoginView(TemplateView):
                 messages.error(request, "Invalid registration number or birth certificate number.")
         
         return render(request, self.template_name, {'form': form})
+    
+    def throttled(self, request, form, source):
+        security_logger.warning(f"Too many login attempts for {source}")
+        messages.error(request, "Too many failed login attempts. Please try again later.")
+        return render(request, self.template_name, {'form': form})
 
 @login_required
 def logout_view(request):
@@ -141,7 +224,7 @@ def dashboard_view(request):
     
     if not current_election:
         messages.warning(request, "No active election at the moment.")
-        return render(request, 'no_election.html')
+        return render(request, 'no_election.html', {'live_stream': isinstance(request, ASGIRequest)})
     
     context = {
         'election': current_election,
@@ -160,12 +243,8 @@ def dashboard_view(request):
     context['delegate_vote'] = delegate_vote
     
     # Get available delegates in student's department
-    available_delegates = Delegate.objects.filter(
-        department=request.user.department,
-        is_approved=True
-    ).select_related('student', 'party')
-    
-    context['available_delegates'] = available_delegates
+    ballot = ballots.department_ballot(request.user.department_id)
+    context['available_delegates'] = ballot['entries']
     
     # Check if student is a delegate
     try:
@@ -176,7 +255,15 @@ def dashboard_view(request):
         # If delegate, show voting options for main positions
         if current_election.is_main_voting_active:
             positions = Position.objects.all().order_by('order')
-            candidates = Candidate.objects.filter(is_approved=True).select_related('student', 'party', 'position')
+            position_ballots = ballots.candidate_ballots(
+                current_election.id,
+                [position.id for position in positions]
+            )
+            candidates = [
+                candidate
+                for position in positions
+                for candidate in position_ballots[position.id]['entries']
+            ]
             
             # Get delegate's votes for each position
             delegate_votes = MainVote.objects.filter(
@@ -184,13 +271,13 @@ def dashboard_view(request):
                 delegate=delegate_profile
             ).select_related('candidate__position')
             
-            voted_positions = {vote.candidate.position.id for vote in delegate_votes}
+            voted_positions = {vote.position_id for vote in delegate_votes}
             
             context.update({
                 'positions': positions,
                 'candidates': candidates,
                 'voted_positions': voted_positions,
-                'delegate_votes': {vote.candidate.position.id: vote for vote in delegate_votes}
+                'delegate_votes': {vote.position_id: vote for vote in delegate_votes}
             })
     
     except Student.delegate_profile.RelatedObjectDoesNotExist:
@@ -198,199 +285,228 @@ def dashboard_view(request):
     
     return render(request, 'dashboard.html', context)
 
-@login_required
-@require_POST
-@csrf_protect
-def vote_for_delegate(request):
-    """Students vote for delegates in their department"""
+def vote_error(message, status):
+    return JsonResponse({
+        'success': False,
+        'error': message
+    }, status=status)
+
+def duplicate_vote(message):
+    """A vote refused because a different one is already recorded; final, so idempotent retries replay it"""
+    response = vote_error(message, 400)
+    response.duplicate_vote = True
+    return response
+
+class PreparedVote:
+    """A validated vote: the committer job, how to tell it is saved and the replies to send"""
+    
+    def __init__(self, cast, saved, duplicate_error, log_message, success_message):
+        self.cast = cast
+        self.saved = saved
+        self.duplicate_error = duplicate_error
+        self.log_message = log_message
+        self.success_message = success_message
+    
+    def succeeded(self):
+        logger.info(self.log_message)
+        return JsonResponse({
+            'success': True,
+            'message': self.success_message
+        })
+
+def prepare_delegate_vote(request, user):
+    """Validate a delegate vote, returning a PreparedVote or the error response"""
     current_election = get_current_election()
     
     if not current_election or not current_election.is_delegate_voting_active:
-        return JsonResponse({
-            'success': False,
-            'error': 'Delegate voting is not currently active.'
-        }, status=400)
+        return vote_error('Delegate voting is not currently active.', 400)
     
-    # Check if student has already voted
-    existing_vote = DelegateVote.objects.filter(
-        election=current_election,
-        voter=request.user
-    ).exists()
+    eligible, reason = check_voting_eligibility(user, 'delegate', current_election)
+    if not eligible:
+        return vote_error(reason, 403)
     
-    if existing_vote:
-        return JsonResponse({
-            'success': False,
-            'error': 'You have already voted for a delegate.'
-        }, status=400)
+    data = json.loads(request.body)
+    delegate_id = data.get('delegate_id')
     
-    try:
-        data = json.loads(request.body)
-        delegate_id = data.get('delegate_id')
-        
-        if not delegate_id:
-            return JsonResponse({
-                'success': False,
-                'error': 'Delegate ID is required.'
-            }, status=400)
-        
-        delegate = get_object_or_404(
-            Delegate.objects.select_related('student', 'party', 'department'),
-            id=delegate_id,
-            is_approved=True
+    if not delegate_id:
+        return vote_error('Delegate ID is required.', 400)
+    
+    delegate = Delegate.objects.select_related('student', 'party', 'department').filter(
+        id=delegate_id,
+        is_approved=True
+    ).first()
+    if delegate is None:
+        return vote_error('Delegate not found.', 404)
+    
+    # Verify delegate is in voter's department
+    if delegate.department_id != user.department_id:
+        security_logger.warning(
+            f"Student {user.registration_number} attempted to vote for delegate "
+            f"outside their department: {delegate.department.name}"
         )
-        
-        # Verify delegate is in voter's department
-        if delegate.department != request.user.department:
-            security_logger.warning(
-                f"Student {request.user.registration_number} attempted to vote for delegate "
-                f"outside their department: {delegate.department.name}"
-            )
-            return JsonResponse({
-                'success': False,
-                'error': 'You can only vote for delegates in your own department.'
-            }, status=403)
-        
-        ip_address = get_client_ip(request)
-        
-        with transaction.atomic():
-            # Create the vote
-            vote = DelegateVote.objects.create(
-                election=current_election,
-                voter=request.user,
-                delegate=delegate,
-                voter_ip=ip_address
-            )
-            
-            # Create audit log
-            create_audit_log(
-                student=request.user,
-                action_type='delegate_vote',
-                description=f"Voted for delegate {delegate.student.full_name} ({delegate.party.acronym})",
-                ip_address=ip_address,
-                user_agent=request.META.get('HTTP_USER_AGENT', ''),
-                success=True
-            )
-        
-        logger.info(
-            f"Student {request.user.registration_number} voted for delegate "
-            f"{delegate.student.registration_number} ({delegate.party.acronym})"
+        return vote_error('You can only vote for delegates in your own department.', 403)
+    
+    ip_address = get_client_ip(request)
+    user_agent = request.META.get('HTTP_USER_AGENT', '')
+    
+    def cast_vote():
+        # Runs on the vote committer, batched with other voters' transactions
+        DelegateVote.objects.create(
+            election=current_election,
+            voter=user,
+            delegate=delegate,
+            voter_ip=ip_address
         )
+        tally.record_delegate_vote(current_election, delegate)
+        roll.record_delegate_vote(current_election, user)
+        turnout.record_delegate_vote(current_election, user.department_id)
         
-        return JsonResponse({
-            'success': True,
-            'message': f'Successfully voted for {delegate.student.full_name} ({delegate.party.acronym})'
-        })
+        # Create audit log
+        create_audit_log(
+            student=user,
+            action_type='delegate_vote',
+            description=f"Voted for delegate {delegate.student.full_name} ({delegate.party.acronym})",
+            ip_address=ip_address,
+            user_agent=user_agent,
+            success=True,
+            durable=True
+        )
     
-    except json.JSONDecodeError:
-        return JsonResponse({
-            'success': False,
-            'error': 'Invalid JSON data.'
-        }, status=400)
-    except Exception as e:
-        logger.error(f"Error in delegate voting: {str(e)}")
-        return JsonResponse({
-            'success': False,
-            'error': 'An error occurred while processing your vote.'
-        }, status=500)
+    def vote_saved():
+        return DelegateVote.objects.filter(
+            election=current_election,
+            voter=user,
+            delegate=delegate
+        ).exists()
+    
+    return PreparedVote(
+        cast_vote,
+        vote_saved,
+        duplicate_error='You have already voted for a delegate.',
+        log_message=(
+            f"Student {user.registration_number} voted for delegate "
+            f"{delegate.student.registration_number} ({delegate.party.acronym})"
+        ),
+        success_message=f'Successfully voted for {delegate.student.full_name} ({delegate.party.acronym})'
+    )
 
-@login_required
-@require_POST
-@csrf_protect
-def vote_for_candidate(request):
-    """Delegates vote for candidates in main positions"""
+def prepare_candidate_vote(request, user):
+    """Validate a delegate's vote for a candidate, returning a PreparedVote or the error response"""
     current_election = get_current_election()
     
     if not current_election or not current_election.is_main_voting_active:
-        return JsonResponse({
-            'success': False,
-            'error': 'Main voting is not currently active.'
-        }, status=400)
+        return vote_error('Main voting is not currently active.', 400)
+    
+    eligible, reason = check_voting_eligibility(user, 'main', current_election)
+    if not eligible:
+        return vote_error(reason, 403)
     
     # Check if user is a delegate
     try:
-        delegate = request.user.delegate_profile
+        delegate = user.delegate_profile
         if not delegate.is_approved:
-            return JsonResponse({
-                'success': False,
-                'error': 'You are not an approved delegate.'
-            }, status=403)
+            return vote_error('You are not an approved delegate.', 403)
     except Student.delegate_profile.RelatedObjectDoesNotExist:
-        return JsonResponse({
-            'success': False,
-            'error': 'You are not registered as a delegate.'
-        }, status=403)
+        return vote_error('You are not registered as a delegate.', 403)
     
-    try:
-        data = json.loads(request.body)
-        candidate_id = data.get('candidate_id')
-        
-        if not candidate_id:
-            return JsonResponse({
-                'success': False,
-                'error': 'Candidate ID is required.'
-            }, status=400)
-        
-        candidate = get_object_or_404(
-            Candidate.objects.select_related('student', 'party', 'position'),
-            id=candidate_id,
-            is_approved=True
+    data = json.loads(request.body)
+    candidate_id = data.get('candidate_id')
+    
+    if not candidate_id:
+        return vote_error('Candidate ID is required.', 400)
+    
+    candidate = Candidate.objects.select_related('student', 'party', 'position').filter(
+        id=candidate_id,
+        is_approved=True
+    ).first()
+    if candidate is None:
+        return vote_error('Candidate not found.', 404)
+    
+    ip_address = get_client_ip(request)
+    user_agent = request.META.get('HTTP_USER_AGENT', '')
+    
+    def cast_vote():
+        # Runs on the vote committer, batched with other voters' transactions
+        MainVote.objects.create(
+            election=current_election,
+            delegate=delegate,
+            candidate=candidate,
+            position=candidate.position,
+            voter_ip=ip_address
         )
+        tally.record_main_vote(current_election, candidate)
+        roll.record_main_votes(current_election, user)
+        turnout.record_main_votes(current_election, delegate.department_id)
         
-        # Check if delegate has already voted for this position
-        existing_vote = MainVote.objects.filter(
+        # Create audit log
+        create_audit_log(
+            student=user,
+            action_type='main_vote',
+            description=f"Voted for {candidate.student.full_name} for {candidate.position.get_name_display()} ({candidate.party.acronym})",
+            ip_address=ip_address,
+            user_agent=user_agent,
+            success=True,
+            durable=True
+        )
+    
+    def vote_saved():
+        return MainVote.objects.filter(
             election=current_election,
             delegate=delegate,
-            candidate__position=candidate.position
+            position=candidate.position,
+            candidate=candidate
         ).exists()
-        
-        if existing_vote:
-            return JsonResponse({
-                'success': False,
-                'error': f'You have already voted for {candidate.position.get_name_display()}.'
-            }, status=400)
-        
-        ip_address = get_client_ip(request)
-        
-        with transaction.atomic():
-            # Create the vote
-            vote = MainVote.objects.create(
-                election=current_election,
-                delegate=delegate,
-                candidate=candidate,
-                voter_ip=ip_address
-            )
-            
-            # Create audit log
-            create_audit_log(
-                student=request.user,
-                action_type='main_vote',
-                description=f"Voted for {candidate.student.full_name} for {candidate.position.get_name_display()} ({candidate.party.acronym})",
-                ip_address=ip_address,
-                user_agent=request.META.get('HTTP_USER_AGENT', ''),
-                success=True
-            )
-        
-        logger.info(
-            f"Delegate {request.user.registration_number} voted for candidate "
+    
+    return PreparedVote(
+        cast_vote,
+        vote_saved,
+        duplicate_error=f'You have already voted for {candidate.position.get_name_display()}.',
+        log_message=(
+            f"Delegate {user.registration_number} voted for candidate "
             f"{candidate.student.registration_number} for {candidate.position.name}"
-        )
+        ),
+        success_message=f'Successfully voted for {candidate.student.full_name} for {candidate.position.get_name_display()}'
+    )
+
+def handle_vote(prepare, request, user, kind):
+    """Validate a vote with prepare() and hand it to the vote committer"""
+    try:
+        vote = prepare(request, user)
+        if isinstance(vote, HttpResponse):
+            return vote
         
-        return JsonResponse({
-            'success': True,
-            'message': f'Successfully voted for {candidate.student.full_name} for {candidate.position.get_name_display()}'
-        })
+        try:
+            ingest.commit(vote.cast, committed=vote.saved)
+        except ingest.DuplicateVote:
+            # The unique constraint is the duplicate check; a retry of the same vote still succeeds
+            if not vote.saved():
+                return duplicate_vote(vote.duplicate_error)
+        
+        return vote.succeeded()
     
     except json.JSONDecodeError:
-        return JsonResponse({
-            'success': False,
-            'error': 'Invalid JSON data.'
-        }, status=400)
+        return vote_error('Invalid JSON data.', 400)
     except Exception as e:
-        logger.error(f"Error in candidate voting: {str(e)}")
-        return JsonResponse({
-            'success': False,
-            'error': 'An error occurred while processing your vote.'
-        }, status=500)
+        logger.error(f"Error in {kind} voting: {str(e)}")
+        return vote_error('An error occurred while processing your vote.', 500)
+
+@login_required
+@require_POST
+@csrf_protect
+@ratelimit.rate_limited('vote', 'VOTE_RATE_LIMIT')
+@idempotent_vote
+def vote_for_delegate(request):
+    """Students vote for delegates in their department"""
+    return handle_vote(prepare_delegate_vote, request, request.user, 'delegate')
+
+@login_required
+@require_POST
+@csrf_protect
+@ratelimit.rate_limited('vote', 'VOTE_RATE_LIMIT')
+@idempotent_vote
+def vote_for_candidate(request):
+    """Delegates vote for candidates in main positions"""
+    return handle_vote(prepare_candidate_vote, request, request.user, 'candidate')
 
 @login_required
 def election_results_view(request):
@@ -405,61 +521,24 @@ def election_results_view(request):
         messages.warning(request, "Election results are not yet available.")
         return redirect('dashboard')
     
-    # Get results grouped by position
+    # Results are read from the live tally instead of counting votes here; the
+    # recount runs when the election enters the results phase, never on a page view
     positions = Position.objects.all().order_by('order')
-    results = {}
-    
-    for position in positions:
-        candidates = Candidate.objects.filter(
-            position=position,
-            is_approved=True
-        ).select_related('student', 'party').annotate(
-            vote_count=Count('votes_received', filter=Q(votes_received__election=current_election))
-        ).order_by('-vote_count')
-        
-        total_votes = sum(candidate.vote_count for candidate in candidates)
-        
-        for candidate in candidates:
-            if total_votes > 0:
-                candidate.percentage = (candidate.vote_count / total_votes) * 100
-            else:
-                candidate.percentage = 0
-        
-        results[position] = {
-            'candidates': candidates,
-            'total_votes': total_votes
-        }
+    results = tally.candidate_results(current_election, positions)
     
     # Get delegate voting results
-    delegate_results = {}
-    departments = request.user.faculty.departments.all()
-    
-    for department in departments:
-        delegates = Delegate.objects.filter(
-            department=department,
-            is_approved=True
-        ).select_related('student', 'party').annotate(
-            vote_count=Count('votes_received', filter=Q(votes_received__election=current_election))
-        ).order_by('-vote_count')
-        
-        total_votes = sum(delegate.vote_count for delegate in delegates)
-        
-        for delegate in delegates:
-            if total_votes > 0:
-                delegate.percentage = (delegate.vote_count / total_votes) * 100
-            else:
-                delegate.percentage = 0
-        
-        delegate_results[department] = {
-            'delegates': delegates,
-            'total_votes': total_votes
-        }
+    delegate_results = tally.delegate_results(
+        current_election,
+        request.user.faculty.departments.all()
+    )
     
     context = {
         'election': current_election,
         'results': results,
         'delegate_results': delegate_results,
         'positions': positions,
+        # Pages subscribe to /live/ only where it can hold a stream open
+        'live_stream': isinstance(request, ASGIRequest),
     }
     
     return render(request, 'results.html', context)
@@ -472,27 +551,9 @@ def voting_status_api(request):
     if not current_election:
         return JsonResponse({'error': 'No active election'}, status=404)
     
-    # Get user's voting status
-    delegate_vote_exists = DelegateVote.objects.filter(
-        election=current_election,
-        voter=request.user
-    ).exists()
-    
-    # Check if user is delegate and their main voting status
-    main_votes_cast = 0
+    # The voter roll holds the user's voting and delegate status
+    entry = roll.entry(current_election, request.user)
     total_positions = Position.objects.count()
-    is_delegate = False
-    
-    try:
-        delegate = request.user.delegate_profile
-        if delegate.is_approved:
-            is_delegate = True
-            main_votes_cast = MainVote.objects.filter(
-                election=current_election,
-                delegate=delegate
-            ).count()
-    except Student.delegate_profile.RelatedObjectDoesNotExist:
-        pass
     
     return JsonResponse({
         'election': {
@@ -502,9 +563,9 @@ def voting_status_api(request):
             'main_voting_active': current_election.is_main_voting_active,
         },
         'user_status': {
-            'has_voted_for_delegate': delegate_vote_exists,
-            'is_delegate': is_delegate,
-            'main_votes_cast': main_votes_cast,
+            'has_voted_for_delegate': entry.has_voted_for_delegate,
+            'is_delegate': entry.delegate_id is not None,
+            'main_votes_cast': entry.main_votes_cast,
             'total_positions': total_positions,
             'department': request.user.department.name,
             'faculty': request.user.faculty.name,
@@ -519,39 +580,318 @@ def candidates_api(request):
     if not position_id:
         return JsonResponse({'error': 'Position ID required'}, status=400)
     
-    candidates = Candidate.objects.filter(
-        position_id=position_id,
-        is_approved=True
-    ).select_related('student', 'party').values(
-        'id',
-        'student__first_name',
-        'student__last_name',
-        'student__registration_number',
-        'party__name',
-        'party__acronym',
-        'party__color_code',
-        'manifesto'
-    )
+    try:
+        position_id = int(position_id)
+    except ValueError:
+        return JsonResponse({'error': 'Invalid position ID'}, status=400)
     
-    return JsonResponse({'candidates': list(candidates)})
+    current_election = get_current_election()
+    ballot = ballots.candidate_ballot(current_election.id if current_election else None, position_id)
+    return ballot_response(request, ballot)
 
 @login_required
 def delegates_api(request):
     """API endpoint to get delegates in user's department"""
-    delegates = Delegate.objects.filter(
-        department=request.user.department,
-        is_approved=True
-    ).select_related('student', 'party').values(
-        'id',
-        'student__first_name',
-        'student__last_name',
-        'student__registration_number',
-        'party__name',
-        'party__acronym',
-        'party__color_code'
-    )
+    ballot = ballots.department_ballot(request.user.department_id)
+    return ballot_response(request, ballot)
+
+def _ballot_etag(state, component_etags):
+    """ETag over the student's own state and the cached ballots it embeds"""
+    digest = hashlib.md5(json.dumps(state, cls=DjangoJSONEncoder, sort_keys=True).encode())
+    for etag in component_etags:
+        digest.update(etag.encode())
+    return f'"{digest.hexdigest()}"'
+
+@login_required
+@require_http_methods(['GET', 'POST'])
+@csrf_protect
+def ballot_view(request):
+    """Everything a student's ballot page needs in one response; POST casts a delegate's main votes"""
+    if request.method == 'POST':
+        return submit_ballot(request)
+    
+    current_election = get_current_election()
+    if not current_election:
+        return JsonResponse({'error': 'No active election'}, status=404)
+    
+    student = request.user
+    entry = roll.entry(current_election, student)
+    eligible, reason = check_voting_eligibility(student, 'delegate', current_election, roll_entry=entry)
+    delegate_vote = None
+    if entry.has_voted_for_delegate:
+        delegate_vote = DelegateVote.objects.filter(
+            election=current_election,
+            voter=student
+        ).values_list('delegate_id', flat=True).first()
+    # The roll only points at approved delegate profiles
+    delegate = entry.delegate_id
+    positions = list(Position.objects.order_by('order', 'name').values_list('id', 'name'))
+    voted = {}
+    if delegate is not None:
+        voted = dict(MainVote.objects.filter(
+            election=current_election,
+            delegate_id=delegate
+        ).values_list('position_id', 'candidate_id'))
+    
+    # Ballots come from the shared cache; only delegates are sent the candidates
+    department_ballot = ballots.department_ballot(student.department_id)
+    position_ballots = {}
+    if delegate is not None:
+        position_ballots = ballots.candidate_ballots(current_election.id, [position_id for position_id, _ in positions])
+    
+    state = {
+        'election': {
+            'id': current_election.id,
+            'name': current_election.name,
+            'current_phase': current_election.current_phase,
+            'delegate_voting_active': current_election.is_delegate_voting_active,
+            'main_voting_active': current_election.is_main_voting_active,
+        },
+        'department': student.department.name,
+        'faculty': student.faculty.name,
+        'eligibility': {
+            'eligible': eligible,
+            'reason': reason,
+            'is_delegate': delegate is not None,
+            'can_vote_for_delegate': eligible and current_election.is_delegate_voting_active and delegate_vote is None,
+            'can_vote_for_candidates': (
+                eligible and delegate is not None and current_election.is_main_voting_active
+                and len(voted) < len(positions)
+            ),
+        },
+        'delegate_vote': delegate_vote,
+        'voted_positions': {str(position_id): candidate_id for position_id, candidate_id in voted.items()},
+        'positions': positions,
+    }
+    etag = _ballot_etag(state, [department_ballot['etag']] + [ballot['etag'] for ballot in position_ballots.values()])
+    if request.META.get('HTTP_IF_NONE_MATCH') == etag:
+        response = HttpResponseNotModified()
+        response['ETag'] = etag
+        return response
+    
+    titles = dict(Position.POSITION_TYPES)
+    payload = dict(state)
+    payload['delegates'] = json.loads(department_ballot['json'])['delegates']
+    payload['positions'] = [
+        {
+            'id': position_id,
+            'name': name,
+            'title': titles.get(name, name),
+            'voted_candidate_id': voted.get(position_id),
+            'candidates': json.loads(position_ballots[position_id]['json'])['candidates'] if position_ballots else [],
+        }
+        for position_id, name in positions
+    ]
+    del payload['voted_positions']
+    response = JsonResponse(payload)
+    response['ETag'] = etag
+    return response
+
+@ratelimit.rate_limited('vote', 'VOTE_RATE_LIMIT')
+@idempotent_vote
+def submit_ballot(request):
+    """Cast a delegate's votes for several positions in one committer transaction"""
+    current_election = get_current_election()
     
-    return JsonResponse({'delegates': list(delegates)})
+    if not current_election or not current_election.is_main_voting_active:
+        return JsonResponse({
+            'success': False,
+            'error': 'Main voting is not currently active.'
+        }, status=400)
+    
+    eligible, reason = check_voting_eligibility(request.user, 'main', current_election)
+    if not eligible:
+        return JsonResponse({
+            'success': False,
+            'error': reason
+        }, status=403)
+    
+    try:
+        delegate = request.user.delegate_profile
+        if not delegate.is_approved:
+            return JsonResponse({
+                'success': False,
+                'error': 'You are not an approved delegate.'
+            }, status=403)
+    except Student.delegate_profile.RelatedObjectDoesNotExist:
+        return JsonResponse({
+            'success': False,
+            'error': 'You are not registered as a delegate.'
+        }, status=403)
+    
+    try:
+        data = json.loads(request.body)
+        candidate_ids = data.get('candidate_ids')
+        
+        if not candidate_ids or not isinstance(candidate_ids, list):
+            return JsonResponse({
+                'success': False,
+                'error': 'A list of candidate IDs is required.'
+            }, status=400)
+        
+        try:
+            candidate_ids = {int(candidate_id) for candidate_id in candidate_ids}
+        except (TypeError, ValueError):
+            return JsonResponse({
+                'success': False,
+                'error': 'Invalid candidate ID.'
+            }, status=400)
+        
+        candidates = list(
+            Candidate.objects.select_related('student', 'party', 'position')
+            .filter(id__in=candidate_ids, is_approved=True)
+        )
+        if len(candidates) != len(candidate_ids):
+            return JsonResponse({
+                'success': False,
+                'error': 'Candidate not found.'
+            }, status=404)
+        
+        by_position = {}
+        for candidate in candidates:
+            if candidate.position_id in by_position:
+                return JsonResponse({
+                    'success': False,
+                    'error': f'Choose one candidate for {candidate.position.get_name_display()}.'
+                }, status=400)
+            by_position[candidate.position_id] = candidate
+        
+        def conflicts(existing):
+            # Positions already voted for someone else; repeating a recorded vote is fine
+            return [
+                candidate.position.get_name_display()
+                for position_id, candidate in by_position.items()
+                if position_id in existing and existing[position_id] != candidate.id
+            ]
+        
+        def recorded_votes():
+            return dict(MainVote.objects.filter(
+                election=current_election,
+                delegate=delegate
+            ).values_list('position_id', 'candidate_id'))
+        
+        existing = recorded_votes()
+        already_voted = conflicts(existing)
+        if already_voted:
+            return duplicate_vote(f'You have already voted for {", ".join(already_voted)}.')
+        
+        pending = [candidate for position_id, candidate in by_position.items() if position_id not in existing]
+        ip_address = get_client_ip(request)
+        user_agent = request.META.get('HTTP_USER_AGENT', '')
+        
+        def cast_votes():
+            # One committer job, so the whole ballot is saved or none of it is
+            MainVote.objects.bulk_create([
+                MainVote(
+                    election=current_election,
+                    delegate=delegate,
+                    candidate=candidate,
+                    position=candidate.position,
+                    voter_ip=ip_address
+                )
+                for candidate in pending
+            ])
+            tally.record_main_votes(current_election, pending)
+            roll.record_main_votes(current_election, request.user, len(pending))
+            turnout.record_main_votes(current_election, delegate.department_id, len(pending))
+            for candidate in pending:
+                create_audit_log(
+                    student=request.user,
+                    action_type='main_vote',
+                    description=f"Voted for {candidate.student.full_name} for {candidate.position.get_name_display()} ({candidate.party.acronym})",
+                    ip_address=ip_address,
+                    user_agent=user_agent,
+                    success=True,
+                    durable=True
+                )
+        
+        def ballot_saved():
+            recorded = recorded_votes()
+            return all(recorded.get(position_id) == candidate.id for position_id, candidate in by_position.items())
+        
+        if pending:
+            try:
+                ingest.commit(cast_votes, committed=ballot_saved)
+            except ingest.DuplicateVote:
+                # Another request voted meanwhile; succeed only if it recorded the same choices
+                already_voted = conflicts(recorded_votes())
+                if already_voted:
+                    return duplicate_vote(f'You have already voted for {", ".join(already_voted)}.')
+        
+        logger.info(
+            f"Delegate {request.user.registration_number} cast a ballot of {len(pending)} votes "
+            f"({len(by_position) - len(pending)} already recorded)"
+        )
+        
+        return JsonResponse({
+            'success': True,
+            'message': f'Successfully voted for {len(by_position)} positions',
+            'voted_positions': sorted(by_position),
+        })
+    
+    except json.JSONDecodeError:
+        return JsonResponse({
+            'success': False,
+            'error': 'Invalid JSON data.'
+        }, status=400)
+    except Exception as e:
+        logger.error(f"Error in ballot submission: {str(e)}")
+        return JsonResponse({
+            'success': False,
+            'error': 'An error occurred while processing your ballot.'
+        }, status=500)
+
+@login_required
+async def live_events(request):
+    """Server-sent turnout and results updates from the per-process broadcaster"""
+    if not isinstance(request, ASGIRequest):
+        # A WSGI worker cannot be held open per client; answer once and have EventSource
+        # come back no sooner than the pages used to poll
+        body = await sync_to_async(live.single_response_body)()
+        return HttpResponse(body, content_type='text/event-stream')
+    
+    response = StreamingHttpResponse(live.stream(), content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'
+    return response
+
+@login_required
+@require_http_methods(['GET'])
+def turnout_view(request):
+    """Turnout per faculty and department, read from the live counters without touching the vote tables"""
+    current_election = get_current_election()
+    if not current_election:
+        return JsonResponse({'error': 'No active election'}, status=404)
+    
+    return JsonResponse(turnout.board(current_election))
+
+@staff_member_required
+def export_view(request, name):
+    """Stream votes or the audit log as CSV or NDJSON, optionally gzipped"""
+    fmt = request.GET.get('format', 'csv')
+    compress = request.GET.get('gzip') in ('1', 'true')
+    
+    try:
+        chunks = exports.stream(
+            name, fmt, compress,
+            election_id=request.GET.get('election') or None,
+            since=exports.parse_bound(request.GET.get('since')),
+            until=exports.parse_bound(request.GET.get('until'), end=True),
+        )
+    except ValueError as e:
+        return JsonResponse({'error': str(e)}, status=400)
+    
+    if compress:
+        content_type = 'application/gzip'
+    else:
+        content_type = 'text/csv' if fmt == 'csv' else 'application/x-ndjson'
+    if isinstance(request, ASGIRequest):
+        chunks = exports.aiterate(chunks)
+    response = StreamingHttpResponse(chunks, content_type=content_type)
+    response['Content-Disposition'] = f'attachment; filename="{exports.filename(name, fmt, compress)}"'
+    
+    security_logger.info(f"{request.user.registration_number} exported {name} ({request.GET.urlencode()})")
+    return response
 
 def health_check(request):
     """Health check endpoint for monitoring"""